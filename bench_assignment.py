@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark for batch order-to-bot assignment in utils/assignment.py.
+
+Scatters idle bots and pending orders (1-3 bins each) over a grid and compares
+the previous greedy dispatch (orders in arrival order, each taking the idle bot
+nearest its first bin by Euclidean distance) with one Hungarian batch over the
+true-distance cost matrix, both over the same orders greedy served and over the
+dispatcher's wider window of pending orders. Reports the total grid distance
+bots must drive to reach their orders and the time to build and solve one
+dispatch cycle.
+
+Usage: python bench_assignment.py [--grid 32] [--fleets 10 50 100 200] [--rounds 5]
+"""
+
+import argparse
+import random
+import time
+
+from utils.assignment import assign, build_cost_matrix
+from utils.grid_layout import GridLayout
+
+
+def greedy(bot_cells, order_bins):
+    """Old behaviour: each order in turn takes the Euclidean-nearest remaining bot."""
+    free = list(range(len(bot_cells)))
+    pairs = []
+    for j, cells in enumerate(order_bins):
+        if not free:
+            break
+        bx, by = cells[0]
+        i = min(free, key=lambda k: (bot_cells[k][0] - bx) ** 2 + (bot_cells[k][1] - by) ** 2)
+        free.remove(i)
+        pairs.append((i, j))
+    return pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--grid", type=int, default=32)
+    parser.add_argument("--fleets", type=int, nargs="+", default=[10, 50, 100, 200])
+    parser.add_argument("--orders-per-bot", type=float, default=2.0, help="pending window, as in dispatch_pending_orders")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    size = args.grid
+    layout = GridLayout(size, size, blocked=[(size // 2, y) for y in range(size - 4)])
+    cells = [(x, y) for x in range(size) for y in range(size) if layout.is_free(x, y)]
+    print(f"{'bots':>6}{'orders':>8}{'greedy':>9}{'batch same':>12}{'batch window':>14}{'saved':>8}{'solve ms':>10}")
+    for bots in args.fleets:
+        rng = random.Random(args.seed)
+        totals = {"greedy": 0.0, "same": 0.0, "batch": 0.0}
+        elapsed = 0.0
+        orders = int(bots * args.orders_per_bot)
+        for _ in range(args.rounds):
+            bot_cells = [rng.choice(cells) for _ in range(bots)]
+            order_bins = [rng.sample(cells, rng.randint(1, 3)) for _ in range(orders)]
+            cost = build_cost_matrix(bot_cells, order_bins, layout)
+            served = greedy(bot_cells, order_bins)
+            totals["greedy"] += sum(cost[i, j] for i, j in served)
+            totals["same"] += sum(c for _, _, c in assign(bot_cells, order_bins[:len(served)], layout))
+            started = time.perf_counter()
+            pairs = assign(bot_cells, order_bins, layout)
+            elapsed += time.perf_counter() - started
+            totals["batch"] += sum(c for _, _, c in pairs)
+        saved = 1 - totals["same"] / totals["greedy"]
+        print(f"{bots:>6}{orders:>8}{totals['greedy'] / args.rounds:>9.0f}{totals['same'] / args.rounds:>12.0f}"
+              f"{totals['batch'] / args.rounds:>14.0f}{saved:>8.1%}{elapsed / args.rounds * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark for request latency and event-loop stalls under concurrent orders.
+
+Runs the app in-process (ASGI transport, real-time clock) on a scratch copy of
+the database. --orders orders are posted at once while --readers clients keep
+polling the database-backed list endpoints (GET /orders/, GET /products/) and
+a probe task measures how late the event loop wakes it up. Any synchronous
+database call on the loop (a request handler, a fleet tick commit) shows up as
+probe lag and as latency of every other request. Reports latency percentiles
+per endpoint and the loop lag; run it on two commits to compare them.
+
+Usage: python bench_async_db.py [--orders 20] [--readers 4] [--seconds 10] [--tick 0.05] [--backend sqlite]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+async def run(args):
+    # Imported here: the singletons read their AUTOSTORE_* settings at import time
+    import httpx
+    import main
+    from db.database import SessionLocal
+    from models.products import Product
+
+    db = SessionLocal()
+    products = [product_id for (product_id,) in db.query(Product.id).filter(Product.bin_id != None)]
+    db.close()
+    rng = random.Random(args.seed)
+    latencies = {"POST /orders/": [], "GET /orders/": [], "GET /products/": []}
+    lags = []
+    done = asyncio.Event()
+
+    await main.startup_event()
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def timed(name, method, url, **kwargs):
+            started = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies[name].append((time.perf_counter() - started) * 1000)
+            response.raise_for_status()
+
+        async def reader():
+            while not done.is_set():
+                await timed("GET /orders/", "GET", "/orders/")
+                await timed("GET /products/", "GET", "/products/")
+
+        async def probe():
+            interval = args.probe_ms / 1000
+            while not done.is_set():
+                started = time.perf_counter()
+                await asyncio.sleep(interval)
+                lags.append((time.perf_counter() - started - interval) * 1000)
+
+        background = [asyncio.create_task(reader()) for _ in range(args.readers)]
+        background.append(asyncio.create_task(probe()))
+        orders = [{"items": [{"product_id": rng.choice(products), "quantity": 1}
+                             for _ in range(rng.randint(1, 2))]} for _ in range(args.orders)]
+        await asyncio.gather(*(timed("POST /orders/", "POST", "/orders/", json=order) for order in orders))
+        await asyncio.sleep(args.seconds)
+        done.set()
+        await asyncio.gather(*background)
+    await main.shutdown_event()
+    return latencies, lags
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--orders", type=int, default=20, help="orders posted concurrently")
+    parser.add_argument("--readers", type=int, default=4, help="clients polling the list endpoints")
+    parser.add_argument("--seconds", type=float, default=10.0, help="how long to keep polling after posting")
+    parser.add_argument("--tick", type=float, default=0.05, help="fleet tick in seconds")
+    parser.add_argument("--probe-ms", type=float, default=5.0, help="loop lag probe interval")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--backend", choices=("sqlite", "postgres"), default="sqlite",
+                        help="run on the SQLite copy or on a local PostgreSQL server loaded from it")
+    parser.add_argument("--db", default=os.path.join(ROOT, "autostore.db"), help="database to copy and run against")
+    args = parser.parse_args()
+
+    os.environ.update({"AUTOSTORE_CLOCK": "realtime", "AUTOSTORE_TICK_SECONDS": str(args.tick)})
+    # The scratch copy can take the WAL profile; AUTOSTORE_SQLITE_PROFILE still overrides it
+    os.environ.setdefault("AUTOSTORE_SQLITE_PROFILE", "wal")
+    workdir = tempfile.mkdtemp(prefix="autostore-bench-")
+    try:
+        # The app opens ./autostore.db and serves ./static, so run it in a scratch copy
+        shutil.copy(args.db, os.path.join(workdir, "autostore.db"))
+        os.makedirs(os.path.join(workdir, "static"))
+        os.chdir(workdir)
+        logging.disable(logging.WARNING)
+        with contextlib.ExitStack() as stack:
+            if args.backend == "postgres":
+                # A local PostgreSQL server loaded from the copy stands in for the database
+                from db.postgres import postgres_from_sqlite
+                stack.enter_context(postgres_from_sqlite("sqlite:///autostore.db", os.path.join(workdir, "postgres")))
+            with contextlib.redirect_stdout(sys.stderr):
+                latencies, lags = asyncio.run(run(args))
+    finally:
+        os.chdir(ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{'':<16}{'count':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for name, values in [*latencies.items(), ("loop lag", lags)]:
+        print(f"{name:<16}{len(values):>7}{percentile(values, 50):>9.1f}{percentile(values, 95):>9.1f}"
+              f"{percentile(values, 99):>9.1f}{max(values, default=0.0):>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the joint CBS/ECBS planner in utils/cbs.py against WHCA*.
+
+For each fleet size, random instances are generated on a grid with scattered
+obstacles: every bot gets a distinct start and a distinct goal. WHCA* plans
+the bots one after another against the shared reservation table, with the
+window widened to cover the whole route as in bench_planners.py; CBS plans
+them jointly (suboptimality 1.0) and ECBS with a focal bound (> 1.0), both
+within --max-nodes high-level expansions. An instance counts as solved when
+every bot got a path and the paths are free of vertex and following conflicts,
+bots waiting on their goal afterwards. Reports the success rate, how many
+instances failed for lack of a plan or with conflicting paths, the mean
+makespan and sum of costs over the instances each planner solved, and the mean
+planning time.
+
+Usage: python bench_cbs.py [--grid 32] [--bots 10 50 100] [--instances 5] [--weights 1.0 1.2]
+"""
+
+import argparse
+import random
+import time
+
+from utils.astar import reservation_table, whca_star
+from utils.cbs import cbs, find_conflicts
+from utils.grid_layout import GridLayout
+
+
+def make_instance(layout, bots, rng):
+    cells = [(x, y) for x in range(layout.width) for y in range(layout.depth) if layout.is_free(x, y)]
+    return list(zip(rng.sample(cells, bots), rng.sample(cells, bots)))
+
+
+def plan_whca(agents, layout):
+    paths = []
+    try:
+        for bot_id, (start, goal) in enumerate(agents):
+            path = whca_star(start, goal, layout, bot_id, 0)
+            if path is None:
+                return None
+            paths.append(path)
+        return paths
+    finally:
+        for bot_id in range(len(agents)):
+            reservation_table.release_bot(bot_id)
+
+
+def run(planner, instances, layout):
+    """(success rate, instances without a full plan, conflicting plans, mean makespan, mean cost, mean ms)."""
+    solved = []
+    no_plan = conflicting = 0
+    elapsed = 0.0
+    for agents in instances:
+        started = time.perf_counter()
+        paths = planner(agents, layout)
+        elapsed += time.perf_counter() - started
+        if paths is None:
+            no_plan += 1
+        elif find_conflicts(paths, first_only=True):
+            conflicting += 1
+        else:
+            solved.append(paths)
+    makespan = sum(max(len(p) - 1 for p in paths) for paths in solved) / len(solved) if solved else float("nan")
+    cost = sum(sum(len(p) - 1 for p in paths) for paths in solved) / len(solved) if solved else float("nan")
+    return len(solved) / len(instances), no_plan, conflicting, makespan, cost, elapsed * 1000 / len(instances)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--grid", type=int, default=32)
+    parser.add_argument("--obstacles", type=float, default=0.1, help="obstacle density")
+    parser.add_argument("--bots", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument("--instances", type=int, default=5, help="random instances per fleet size")
+    parser.add_argument("--weights", type=float, nargs="+", default=[1.0, 1.2],
+                        help="CBS suboptimality bounds (1.0 is plain CBS, above is ECBS)")
+    parser.add_argument("--max-nodes", type=int, default=300, help="CBS high-level expansion budget")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    layout = GridLayout(args.grid, args.grid)
+    layout.set_blocked([(x, y) for x in range(args.grid) for y in range(args.grid) if rng.random() < args.obstacles])
+
+    planners = [("whca*", plan_whca)]
+    for weight in args.weights:
+        name = "cbs" if weight == 1.0 else f"ecbs w={weight:g}"
+        planners.append((name, lambda agents, layout, w=weight: cbs(agents, layout, max_nodes=args.max_nodes,
+                                                                      suboptimality=w)))
+
+    original_window = reservation_table.window_size
+    reservation_table.window_size = 4 * args.grid
+    print(f"{'planner':<12}{'bots':>6}{'success':>9}{'no plan':>9}{'conflict':>10}{'makespan':>10}"
+          f"{'sum cost':>10}{'ms':>10}")
+    try:
+        for bots in args.bots:
+            instances = [make_instance(layout, bots, rng) for _ in range(args.instances)]
+            for name, planner in planners:
+                success, no_plan, conflicting, makespan, cost, ms = run(planner, instances, layout)
+                print(f"{name:<12}{bots:>6}{success:>9.0%}{no_plan:>9}{conflicting:>10}{makespan:>10.1f}"
+                      f"{cost:>10.1f}{ms:>10.1f}")
+    finally:
+        reservation_table.window_size = original_window
+
+
+if __name__ == "__main__":
+    main()
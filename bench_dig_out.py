@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark for dig-out (rehandling) planning in utils/stacks.py.
+
+Fills a grid of stacks to a given fraction of capacity, then replays a stream
+of bin retrievals with Zipf-skewed popularity. Each retrieval digs the bin out
+with plan_dig_out, relocating its blockers, and the bin goes back on top of its
+column afterwards, as in the order mission. Reports rehandles per retrieval and
+the grid steps spent rehandling for several height weights (0 relocates to the
+nearest column with room, higher values prefer lower stacks).
+
+Usage: python bench_dig_out.py [--grid 12] [--height 8] [--fill 0.6 0.75 0.9] [--weights 0 1 3]
+"""
+
+import argparse
+import random
+import time
+
+from utils.grid_layout import GridLayout
+from utils.occupancy import OccupancyIndex
+from utils.stacks import plan_dig_out
+
+
+def stock(layout, fill, rng):
+    """Occupancy index with bins 0..n-1 spread over the columns, ~fill of total capacity."""
+    occupancy = OccupancyIndex(layout)
+    cells = [(x, y) for x in range(layout.width) for y in range(layout.depth)
+             if layout.is_free(x, y) and (x, y) not in layout.ports]
+    bins = int(len(cells) * layout.stack_height * fill)
+    positions = {}
+    for bin_id in range(bins):
+        cell = rng.choice([c for c in cells if occupancy.stack_height(*c) < layout.stack_height])
+        occupancy.add_bin(bin_id, *cell)
+        positions[bin_id] = cell
+    return occupancy, positions
+
+
+def replay(occupancy, positions, retrievals, skew, weight, rng):
+    bins = list(positions)
+    rng.shuffle(bins)
+    weights = [1.0 / (rank + 1) ** skew for rank in range(len(bins))]
+    totals = {"rehandles": 0, "steps": 0, "failed": 0, "max": 0}
+    for bin_id in rng.choices(bins, weights=weights, k=retrievals):
+        cell = positions[bin_id]
+        plan = plan_dig_out(occupancy, bin_id, cell, height_weight=weight)
+        if plan is None:
+            totals["failed"] += 1
+            continue
+        for relocation in plan.relocations:
+            occupancy.remove_bin(relocation.bin_id, *cell)
+            occupancy.add_bin(relocation.bin_id, *relocation.target)
+            positions[relocation.bin_id] = relocation.target
+        totals["rehandles"] += plan.rehandles
+        totals["steps"] += plan.steps
+        totals["max"] = max(totals["max"], plan.rehandles)
+        # Picked at the port, then returned on top of its column
+        occupancy.remove_bin(bin_id, *cell)
+        occupancy.add_bin(bin_id, *cell)
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--grid", type=int, default=12)
+    parser.add_argument("--height", type=int, default=8, help="stack capacity")
+    parser.add_argument("--fill", type=float, nargs="+", default=[0.6, 0.75, 0.9])
+    parser.add_argument("--weights", type=float, nargs="+", default=[0.0, 1.0, 3.0])
+    parser.add_argument("--retrievals", type=int, default=2000)
+    parser.add_argument("--skew", type=float, default=1.0, help="Zipf exponent of bin popularity")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    layout = GridLayout(args.grid, args.grid, stack_height=args.height, ports=[(args.grid - 1, 0)])
+    print(f"{'fill':>6}{'weight':>8}{'rehandles/retr':>16}{'max':>5}{'steps/retr':>12}{'failed':>8}{'ms/plan':>9}")
+    for fill in args.fill:
+        for weight in args.weights:
+            rng = random.Random(args.seed)
+            occupancy, positions = stock(layout, fill, rng)
+            started = time.perf_counter()
+            totals = replay(occupancy, positions, args.retrievals, args.skew, weight, rng)
+            elapsed = time.perf_counter() - started
+            n = args.retrievals
+            print(f"{fill:>6.2f}{weight:>8.1f}{totals['rehandles'] / n:>16.2f}{totals['max']:>5}"
+                  f"{totals['steps'] / n:>12.1f}{totals['failed']:>8}{elapsed / n * 1000:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
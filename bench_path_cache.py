@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the path cache in utils/path_cache.py.
+
+Bots shuttle between a few hotspots (parking, a port, popular bins) on a grid
+with scattered obstacles. Trips are planned as in drive(): all bots
+replan from their current cells every half reservation window, against each
+other's reserved windows. Every plan is made twice from the same
+reservation state: uncached with whca_star and with cached_whca_star, which
+reuses the static route and repairs only its reserved steps. Reports the mean
+planning time of each, the path cache hit rate, the share of clean (unrepaired)
+plans, and the mean path length of both, to check that the repairs cost little
+or no route length.
+
+Usage: python bench_path_cache.py [--grid 32] [--bots 8] [--hotspots 6] [--trips 400]
+"""
+
+import argparse
+import random
+import time
+
+from utils.astar import cached_whca_star, reservation_table, whca_star
+from utils.grid_layout import GridLayout
+from utils.path_cache import path_cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--grid", type=int, default=32)
+    parser.add_argument("--obstacles", type=float, default=0.1, help="obstacle density")
+    parser.add_argument("--bots", type=int, default=8)
+    parser.add_argument("--hotspots", type=int, default=6, help="cells the bots shuttle between")
+    parser.add_argument("--trips", type=int, default=400)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    layout = GridLayout(args.grid, args.grid)
+    layout.set_blocked([(x, y) for x in range(args.grid) for y in range(args.grid) if rng.random() < args.obstacles])
+    free = [(x, y) for x in range(args.grid) for y in range(args.grid) if layout.is_free(x, y)]
+    hotspots = rng.sample(free, args.hotspots)
+    positions = {bot_id: rng.choice(hotspots) for bot_id in range(args.bots)}
+    step = max(1, reservation_table.window_size // 2)
+
+    timings = {"whca_star": 0.0, "cached": 0.0}
+    lengths = {"whca_star": 0, "cached": 0}
+    goals = {}
+    plans = trips = 0
+    now = 0
+    while trips < args.trips:
+        # Every half window all bots replan at once, as drive() does tick by tick
+        for bot_id, cell in positions.items():
+            if goals.get(bot_id, cell) == cell:
+                goals[bot_id] = rng.choice([h for h in hotspots if h != cell])
+                trips += 1
+            started = time.perf_counter()
+            path = whca_star(cell, goals[bot_id], layout, bot_id, now)
+            timings["whca_star"] += time.perf_counter() - started
+            lengths["whca_star"] += len(path) - 1 if path else 0
+            started = time.perf_counter()
+            path = cached_whca_star(cell, goals[bot_id], layout, bot_id, now)
+            timings["cached"] += time.perf_counter() - started
+            lengths["cached"] += len(path) - 1 if path else 0
+            plans += 1
+            if path:
+                positions[bot_id] = path[min(step, len(path) - 1)]
+        now += step
+
+    status = path_cache.status()
+    print(f"{'planner':<12}{'plans':>8}{'mean ms':>10}{'mean length':>13}")
+    for name in ("whca_star", "cached"):
+        print(f"{name:<12}{plans:>8}{timings[name] * 1000 / plans:>10.3f}{lengths[name] / plans:>13.1f}")
+    print(f"hit rate {status['hit_rate']:.1%}, clean plans "
+          f"{status['clean_plans'] / max(1, status['clean_plans'] + status['repaired_plans']):.1%}, "
+          f"speedup {timings['whca_star'] / timings['cached']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
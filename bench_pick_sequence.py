@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the pick-sequence optimizer in utils/pick_sequence.py.
+
+Generates random orders over a grid whose products are spread across bins with
+a skewed (Zipf-like) distribution, so popular bins often appear several times
+in one order, and reports the mean grid steps per order for three routes:
+one trip per order line in database order, one trip per bin in database
+order, and the optimised bin sequence. Every route starts at the bot's parking
+cell, carries each bin to the port and back, and ends at the parking cell.
+
+Usage: python bench_pick_sequence.py [--grids 6 12 24] [--orders 200] [--lines 1 3 6 12 20]
+"""
+
+import argparse
+import random
+import time
+
+from utils.grid_layout import GridLayout
+from utils.pick_sequence import EXACT_LIMIT, sequence_metrics
+
+
+def make_catalogue(layout, products, rng):
+    """Map product id -> (bin id, bin cell); several products share each bin."""
+    cells = [(x, y) for x in range(layout.width) for y in range(layout.depth) if layout.is_free(x, y)]
+    bins = rng.sample(cells, min(len(cells), max(1, products // 3)))
+    return {p: (b, bins[b]) for p in range(products) for b in [rng.randrange(len(bins))]}
+
+
+def make_order(catalogue, lines, rng, skew):
+    products = list(catalogue)
+    weights = [1.0 / (rank + 1) ** skew for rank in range(len(products))]
+    picked = rng.choices(products, weights=weights, k=lines)
+    return [(p, catalogue[p][0], catalogue[p][1]) for p in picked]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--grids", type=int, nargs="+", default=[6, 12, 24])
+    parser.add_argument("--orders", type=int, default=200, help="orders per (grid, lines) case")
+    parser.add_argument("--lines", type=int, nargs="+", default=[1, 3, 6, 12, 20])
+    parser.add_argument("--skew", type=float, default=1.0, help="Zipf exponent of product popularity")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"exact sequencing up to {EXACT_LIMIT} bins, 2-opt heuristic above")
+    print(f"{'grid':>5}{'lines':>6}{'bins':>6}{'per line':>10}{'per bin':>10}{'optimized':>10}"
+          f"{'saved':>8}{'ms/order':>10}")
+    for size in args.grids:
+        rng = random.Random(args.seed)
+        layout = GridLayout(size, size, ports=[(size - 1, 0)])
+        catalogue = make_catalogue(layout, products=size * size, rng=rng)
+        parking = (size - 1, size - 1)
+        port = layout.delivery_station
+        for lines in args.lines:
+            totals = {"bins": 0, "per_line_steps": 0, "grouped_steps": 0, "optimized_steps": 0}
+            elapsed = 0.0
+            for _ in range(args.orders):
+                order = make_order(catalogue, lines, rng, args.skew)
+                started = time.perf_counter()
+                metrics = sequence_metrics(parking, order, port, parking, layout)
+                elapsed += time.perf_counter() - started
+                for key in totals:
+                    totals[key] += metrics[key]
+            n = args.orders
+            saved = 1 - totals["optimized_steps"] / totals["per_line_steps"]
+            print(f"{size:>5}{lines:>6}{totals['bins'] / n:>6.1f}{totals['per_line_steps'] / n:>10.1f}"
+                  f"{totals['grouped_steps'] / n:>10.1f}{totals['optimized_steps'] / n:>10.1f}"
+                  f"{saved:>8.1%}{elapsed / n * 1000:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the grid planners in utils/astar.py.
+
+Runs astar_grid and whca_star on 64x64 and 256x256 grids and reports
+expansions per second and peak memory, next to the previous implementation
+that copied the whole path onto the heap for every push. WHCA* is run with
+the reservation window widened to cover the whole route, so both versions
+search it with reservations (the legacy one gives up at the window's end).
+
+Usage: python bench_planners.py [--sizes 64 256] [--queries 5] [--obstacles 0.15]
+"""
+
+import argparse
+import heapq
+import random
+import time
+import tracemalloc
+
+from utils import astar
+from utils.astar import astar_grid, whca_star, reservation_table
+
+
+def legacy_astar_grid(start, goal, obstacles, grid_size, stats=None):
+    """Path-copying A* as it was before parent pointers."""
+    width, height = grid_size
+    open_set = [(0, 0, start, [start])]
+    visited = set()
+    expanded = 0
+    while open_set:
+        f_score, g_score, current_pos, path = heapq.heappop(open_set)
+        if current_pos == goal:
+            if stats is not None:
+                stats['expanded'] = expanded
+            return path
+        if current_pos in visited:
+            continue
+        visited.add(current_pos)
+        expanded += 1
+        x, y = current_pos
+        for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < width and 0 <= ny < height and (nx, ny) not in obstacles and (nx, ny) not in visited:
+                g = g_score + 1
+                h = abs(nx - goal[0]) + abs(ny - goal[1])
+                heapq.heappush(open_set, (g + h, g, (nx, ny), path + [(nx, ny)]))
+    if stats is not None:
+        stats['expanded'] = expanded
+    return None
+
+
+def legacy_whca_star(start, goal, grid_size, bot_id, current_time=0, stats=None):
+    """Path-copying WHCA* as it was before parent pointers."""
+    width, height = grid_size
+    reservation_table.clear_expired_reservations(current_time)
+    open_set = [(0, 0, start, current_time, [start])]
+    visited = set()
+    expanded = 0
+    while open_set:
+        f_score, g_score, current_pos, current_t, path = heapq.heappop(open_set)
+        if current_pos == goal:
+            astar._reserve_path(path, bot_id, current_time)
+            if stats is not None:
+                stats['expanded'] = expanded
+            return path
+        if (current_pos, current_t) in visited:
+            continue
+        visited.add((current_pos, current_t))
+        expanded += 1
+        x, y = current_pos
+        t = current_t + 1
+        if t > current_time + reservation_table.window_size:
+            continue
+        if reservation_table.is_reserved(x, y, t, bot_id):
+            continue
+        for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0), (0, 0)]:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < width and 0 <= ny < height and not reservation_table.is_reserved(nx, ny, t, bot_id):
+                if ((nx, ny), t) not in visited:
+                    g = g_score + 1
+                    h = abs(nx - goal[0]) + abs(ny - goal[1])
+                    heapq.heappush(open_set, (g + h, g, (nx, ny), t, path + [(nx, ny)]))
+    if stats is not None:
+        stats['expanded'] = expanded
+    return None
+
+
+def make_queries(size, n_queries, rng):
+    """Start/goal pairs at least half the grid apart."""
+    queries = []
+    while len(queries) < n_queries:
+        start = (rng.randrange(size), rng.randrange(size))
+        goal = (rng.randrange(size), rng.randrange(size))
+        if abs(start[0] - goal[0]) + abs(start[1] - goal[1]) >= size // 2:
+            queries.append((start, goal))
+    return queries
+
+
+def make_obstacles(size, density, queries, rng):
+    endpoints = {cell for query in queries for cell in query}
+    return {(x, y) for x in range(size) for y in range(size)
+            if rng.random() < density and (x, y) not in endpoints}
+
+
+def run(planner, queries, call):
+    """Run every query once for timing and once under tracemalloc for peak memory."""
+    expanded = 0
+    start = time.perf_counter()
+    for query in queries:
+        reservation_table.release_bot(1)
+        stats = {}
+        call(planner, query, stats)
+        expanded += stats.get('expanded', 0)
+    elapsed = time.perf_counter() - start
+
+    peak = 0
+    for query in queries:
+        reservation_table.release_bot(1)
+        tracemalloc.start()
+        call(planner, query, None)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return expanded, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[64, 256])
+    parser.add_argument("--queries", type=int, default=5)
+    parser.add_argument("--obstacles", type=float, default=0.15, help="obstacle density for astar_grid")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    original_window = reservation_table.window_size
+    print(f"{'planner':<12}{'impl':<10}{'grid':>6}{'expanded':>10}{'exp/s':>12}{'peak MiB':>10}")
+    try:
+        for size in args.sizes:
+            rng = random.Random(args.seed)
+            queries = make_queries(size, args.queries, rng)
+            obstacles = make_obstacles(size, args.obstacles, queries, rng)
+            reservation_table.window_size = 2 * size
+
+            cases = [
+                ("astar_grid", lambda p, q, s: p(q[0], q[1], obstacles, (size, size), stats=s),
+                 (("parent", astar_grid), ("legacy", legacy_astar_grid))),
+                ("whca_star", lambda p, q, s: p(q[0], q[1], (size, size), 1, 0, stats=s),
+                 (("parent", whca_star), ("legacy", legacy_whca_star))),
+            ]
+            for name, call, impls in cases:
+                for impl, planner in impls:
+                    expanded, elapsed, peak = run(planner, queries, call)
+                    rate = expanded / elapsed if elapsed else 0.0
+                    print(f"{name:<12}{impl:<10}{size:>6}{expanded:>10}{rate:>12,.0f}{peak / 2**20:>10.2f}")
+    finally:
+        reservation_table.window_size = original_window
+        reservation_table.release_bot(1)
+
+
+if __name__ == "__main__":
+    main()
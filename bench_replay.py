@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Headless order-replay benchmark: the full order engine in-process, on the simulation clock.
+
+Orders arrive from a synthetic stream (Poisson arrivals at --rate orders per
+hour over --hours, products drawn with a Zipf skew of --skew over their
+sale_count rank, 1 to --max-items lines each) or from a recorded one
+(--trace, JSON lines {"t": seconds, "items": [{"product_id": ..., "quantity": ...}]};
+--save-trace writes the synthetic stream in that format). Each order goes
+through create_order and the dispatcher exactly as over HTTP, against a copy
+of the database in a temporary directory, with the clock in fast mode
+unless --clock says otherwise. After the last arrival the fleet gets --drain
+simulated seconds to finish.
+
+Prints one JSON document: throughput (orders per simulated hour, from the
+first arrival to the last completion), p50/p95/p99 order cycle time (creation
+to packed, simulated seconds), bot utilization (share of simulated time
+spent on a mission, re-slotting included), planner time per tick and tick
+latency, plus the configuration and git commit so results can be compared
+across commits; --baseline prints the relative change of the headline
+metrics against an earlier result on stderr.
+
+Usage: python bench_replay.py [--rate 30] [--hours 4] [--skew 1.0] [--planner whca] [--backend sqlite] [--seed 42] [--output result.json]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Headline metrics compared by --baseline: (key path, higher is better)
+HEADLINE = [
+    (("orders_per_hour",), True),
+    (("cycle_time_s", "p50"), False),
+    (("cycle_time_s", "p95"), False),
+    (("cycle_time_s", "p99"), False),
+    (("bot_utilization",), None),
+    (("planner_ms_per_tick",), False),
+    (("tick_latency_ms", "p95"), False),
+]
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+def synthetic_stream(products, rate, hours, skew, max_items, rng):
+    """[(t, items)] with Poisson arrivals and Zipf-skewed products (products ranked most popular first)."""
+    weights = [1 / (rank + 1) ** skew for rank in range(len(products))]
+    stream = []
+    t = rng.expovariate(rate / 3600)
+    while t < hours * 3600:
+        lines = min(len(products), rng.randint(1, max_items))
+        chosen = set()
+        while len(chosen) < lines:
+            chosen.add(rng.choices(products, weights)[0])
+        stream.append((t, [{"product_id": product_id, "quantity": 1} for product_id in sorted(chosen)]))
+        t += rng.expovariate(rate / 3600)
+    return stream
+
+
+def load_trace(path):
+    with open(path) as f:
+        stream = [(float(entry["t"]), entry["items"]) for entry in map(json.loads, filter(str.strip, f))]
+    return sorted(stream, key=lambda entry: entry[0])
+
+
+def save_trace(path, stream):
+    with open(path, "w") as f:
+        for t, items in stream:
+            f.write(json.dumps({"t": round(t, 3), "items": items}) + "\n")
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def replay(args):
+    # Imported here: the singletons read their AUTOSTORE_* settings at import time
+    import main
+    from fastapi import BackgroundTasks
+    from db.database import AsyncSessionLocal, SessionLocal
+    from models.bots import Bot
+    from models.products import Product
+    from routers.orders import OrderCreate, create_order, fleet_scheduler
+    from sim_clock import sim_clock
+    from utils.path_cache import path_cache
+    from ws_manager import orders_ws_manager
+
+    db = SessionLocal()
+    products = [product_id for (product_id,) in db.query(Product.id).filter(Product.bin_id != None)
+                .order_by(Product.sale_count.desc(), Product.id)]
+    bots = db.query(Bot).count()
+    db.close()
+    if args.trace:
+        stream = load_trace(args.trace)
+    else:
+        stream = synthetic_stream(products, args.rate, args.hours, args.skew, args.max_items, sim_clock.rng)
+    if args.save_trace:
+        save_trace(args.save_trace, stream)
+
+    # Orders are packed when their status update is broadcast, at the end of that tick;
+    # "partial" and "failed" orders are finished too, with lines left unpicked
+    created, packed, unpicked = {}, {}, {}
+    broadcast = orders_ws_manager.broadcast
+
+    async def record_status(message):
+        if message.get("order_id") in created:
+            if message.get("order_status") == "packed":
+                packed.setdefault(message["order_id"], sim_clock.now())
+            elif message.get("order_status") in ("partial", "failed"):
+                unpicked.setdefault(message["order_id"], sim_clock.now())
+        await broadcast(message)
+
+    orders_ws_manager.broadcast = record_status
+    await main.startup_event()
+    wall_started = time.perf_counter()
+    failed = 0
+    try:
+        for t, items in stream:
+            await sim_clock.sleep_until(t)
+            # The order is created at its arrival time, however long the database takes
+            async with sim_clock.busy(), AsyncSessionLocal() as db:
+                result = await create_order(OrderCreate(items=items), BackgroundTasks(), db)
+            if "order_id" in result:
+                created[result["order_id"]] = sim_clock.now()
+            else:
+                failed += 1
+        deadline = sim_clock.now() + args.drain
+        while len(packed) + len(unpicked) < len(created) and sim_clock.now() < deadline:
+            await sim_clock.sleep(fleet_scheduler.tick_interval)
+        sim_seconds = sim_clock.now()
+        wall_seconds = time.perf_counter() - wall_started
+        scheduler = fleet_scheduler.metrics()
+        paths = path_cache.status()
+    finally:
+        await main.shutdown_event()
+        orders_ws_manager.broadcast = broadcast
+
+    cycle_times = [packed[order_id] - created[order_id] for order_id in packed]
+    span = (max(packed.values()) - min(created.values())) if packed else 0.0
+    planner_ms = paths["plan_ms_total"] + ((scheduler["joint_planner"] or {}).get("total_replan_ms", 0.0))
+    busy_seconds = sum(scheduler["busy_ticks"].values()) * fleet_scheduler.tick_interval
+    return {
+        "commit": git_commit(),
+        "config": {
+            "trace": args.trace,
+            "rate_per_hour": None if args.trace else args.rate,
+            "hours": None if args.trace else args.hours,
+            "skew": None if args.trace else args.skew,
+            "max_items": None if args.trace else args.max_items,
+            "seed": args.seed,
+            "clock": args.clock,
+            "planner": args.planner,
+            "backend": args.backend,
+            "tick_seconds": fleet_scheduler.tick_interval,
+            "bots": bots,
+        },
+        "orders": {"arrived": len(stream), "created": len(created), "failed": failed,
+                   "completed": len(packed), "incomplete": len(unpicked),
+                   "unfinished": len(created) - len(packed) - len(unpicked)},
+        "orders_per_hour": len(packed) / (span / 3600) if span else 0.0,
+        "cycle_time_s": {
+            "mean": sum(cycle_times) / len(cycle_times) if cycle_times else 0.0,
+            "p50": percentile(cycle_times, 50),
+            "p95": percentile(cycle_times, 95),
+            "p99": percentile(cycle_times, 99),
+            "max": max(cycle_times, default=0.0),
+        },
+        "bot_utilization": busy_seconds / (bots * sim_seconds) if bots and sim_seconds else 0.0,
+        "ticks": scheduler["ticks"],
+        "conflicts_held": scheduler["conflicts_held"],
+        "planner_ms_per_tick": planner_ms / scheduler["ticks"] if scheduler["ticks"] else 0.0,
+        "tick_latency_ms": {key: scheduler["tick_latency_ms"][key] for key in ("p50", "p95", "p99", "max")},
+        "path_cache_hit_rate": paths["hit_rate"],
+        "sim_seconds": sim_seconds,
+        "wall_seconds": wall_seconds,
+        "speedup": sim_seconds / wall_seconds if wall_seconds else 0.0,
+    }
+
+
+def compare(result, baseline):
+    """Relative change of the headline metrics against a baseline result, one line per metric."""
+    lines = [f"{'metric':<22}{'baseline':>12}{'now':>12}{'change':>9}"
+             f"  (baseline {baseline.get('commit')}, now {result.get('commit')})"]
+    for path, higher_is_better in HEADLINE:
+        old, new = baseline, result
+        for key in path:
+            old, new = old.get(key, {}), new.get(key, {})
+        if not isinstance(old, (int, float)) or not isinstance(new, (int, float)):
+            continue
+        change = (new - old) / old if old else math.nan
+        verdict = ""
+        if higher_is_better is not None and old and abs(change) >= 0.05:
+            verdict = "  better" if (change > 0) == higher_is_better else "  WORSE"
+        lines.append(f"{'.'.join(path):<22}{old:>12.3f}{new:>12.3f}{change:>+9.1%}{verdict}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rate", type=float, default=30.0, help="synthetic orders per hour (Poisson)")
+    parser.add_argument("--hours", type=float, default=4.0, help="synthetic arrival window")
+    parser.add_argument("--skew", type=float, default=1.0, help="Zipf exponent of product popularity (0 = uniform)")
+    parser.add_argument("--max-items", type=int, default=3, help="most order lines per synthetic order")
+    parser.add_argument("--trace", help="replay a recorded order stream (JSON lines) instead")
+    parser.add_argument("--save-trace", help="write the order stream to this file")
+    parser.add_argument("--drain", type=float, default=1800.0, help="simulated seconds to finish after the last arrival")
+    parser.add_argument("--clock", choices=("realtime", "scaled", "fast"), default="fast")
+    parser.add_argument("--scale", type=float, default=100.0, help="clock scale in scaled mode")
+    parser.add_argument("--planner", choices=("whca", "cbs"), default="whca")
+    parser.add_argument("--tick", type=float, default=1.0, help="fleet tick in simulated seconds")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--backend", choices=("sqlite", "postgres"), default="sqlite",
+                        help="run on the SQLite copy or on a local PostgreSQL server loaded from it")
+    parser.add_argument("--db", default=os.path.join(ROOT, "autostore.db"), help="database to copy and replay against")
+    parser.add_argument("--output", help="write the JSON result here instead of stdout")
+    parser.add_argument("--baseline", help="earlier JSON result to compare against")
+    parser.add_argument("--verbose", action="store_true", help="keep the engine's log output")
+    args = parser.parse_args()
+    for path in ("trace", "save_trace", "output", "baseline"):
+        if getattr(args, path):
+            setattr(args, path, os.path.abspath(getattr(args, path)))
+
+    os.environ.update({
+        "AUTOSTORE_CLOCK": args.clock,
+        "AUTOSTORE_CLOCK_SCALE": str(args.scale),
+        "AUTOSTORE_SEED": str(args.seed),
+        "AUTOSTORE_PLANNER": args.planner,
+        "AUTOSTORE_TICK_SECONDS": str(args.tick),
+    })
+    # The scratch copy can take the WAL profile; AUTOSTORE_SQLITE_PROFILE still overrides it
+    os.environ.setdefault("AUTOSTORE_SQLITE_PROFILE", "wal")
+    workdir = tempfile.mkdtemp(prefix="autostore-replay-")
+    try:
+        # The engine opens ./autostore.db and serves ./static, so run it in a scratch copy
+        shutil.copy(args.db, os.path.join(workdir, "autostore.db"))
+        os.makedirs(os.path.join(workdir, "static"))
+        os.chdir(workdir)
+        if not args.verbose:
+            # The engine configures DEBUG logging on import; keep only errors
+            logging.disable(logging.WARNING)
+        with contextlib.ExitStack() as stack:
+            if args.backend == "postgres":
+                # A local PostgreSQL server loaded from the copy stands in for the database
+                from db.postgres import postgres_from_sqlite
+                stack.enter_context(postgres_from_sqlite("sqlite:///autostore.db", os.path.join(workdir, "postgres")))
+            # The engine prints its startup progress; stdout is for the result only
+            with contextlib.redirect_stdout(sys.stderr):
+                result = asyncio.run(replay(args))
+    finally:
+        os.chdir(ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.baseline:
+        with open(args.baseline) as f:
+            print(compare(result, json.load(f)), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for the WHCA* reservation table.
+
+Fills the table with a growing number of reservations, growing the fleet so
+each bot holds a fixed number of cells (as in a live system, where a bot only
+reserves its planning window), then times the two hot operations the planners run on every call:
+expiring old time steps and releasing a single bot's cells. The bucketed
+table should stay flat as the table grows; the legacy linear scan is timed
+alongside for comparison.
+
+Usage: python bench_reservation_table.py [--per-bot 20] [--sizes 1000 10000 100000]
+"""
+
+import argparse
+import time
+
+from utils.astar import ReservationTable
+
+
+class LinearReservationTable:
+    """The previous flat {(x, y, t): bot_id} table, kept here as the baseline."""
+
+    def __init__(self, window_size=5):
+        self.window_size = window_size
+        self.reservations = {}
+
+    def reserve_cell(self, x, y, t, bot_id, from_cell=None):
+        self.reservations[(x, y, t)] = bot_id
+        return True
+
+    def clear_expired_reservations(self, current_time):
+        expired_keys = [key for key in self.reservations.keys()
+                        if key[2] < current_time - self.window_size]
+        for key in expired_keys:
+            del self.reservations[key]
+
+    def get_bot_reservations(self, bot_id):
+        return [(x, y, t) for (x, y, t), bid in self.reservations.items()
+                if bid == bot_id]
+
+    def release_bot(self, bot_id):
+        for key in self.get_bot_reservations(bot_id):
+            del self.reservations[key]
+
+
+def fill(table, n_reservations, n_bots, grid=256):
+    """Reserve n_reservations cells, one time step per fleet-wide sweep."""
+    for i in range(n_reservations):
+        bot_id = i % n_bots
+        t = i // n_bots
+        table.reserve_cell(bot_id % grid, (bot_id // grid + t) % grid, t, bot_id)
+    return n_reservations // n_bots
+
+
+def time_ops(table_cls, n_reservations, n_bots, rounds=200):
+    table = table_cls(window_size=5)
+    horizon = fill(table, n_reservations, n_bots)
+
+    start = time.perf_counter()
+    for r in range(rounds):
+        table.get_bot_reservations(r % n_bots)
+    lookup_us = (time.perf_counter() - start) / rounds * 1e6
+
+    # Planners call clear_expired_reservations on every search, so most calls
+    # within a tick have nothing to expire; time that no-op path first
+    table.clear_expired_reservations(table.window_size)
+    start = time.perf_counter()
+    for r in range(rounds):
+        table.clear_expired_reservations(table.window_size)
+    noop_us = (time.perf_counter() - start) / rounds * 1e6
+
+    # Then expire one time step per round, stopping at half the horizon so the
+    # table stays populated, and report the cost per dropped reservation
+    expire_rounds = max(1, horizon // 2)
+    before = len(table.reservations)
+    start = time.perf_counter()
+    for r in range(expire_rounds):
+        table.clear_expired_reservations(r + table.window_size + 1)
+    elapsed = time.perf_counter() - start
+    dropped = max(1, before - len(table.reservations))
+    expire_ns = elapsed / dropped * 1e9
+
+    release_rounds = min(rounds, n_bots)
+    start = time.perf_counter()
+    for bot_id in range(release_rounds):
+        table.release_bot(bot_id)
+    release_us = (time.perf_counter() - start) / release_rounds * 1e6
+    return noop_us, expire_ns, lookup_us, release_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--per-bot", type=int, default=20, help="reservations held by each bot")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    args = parser.parse_args()
+
+    print(f"{'table':<10}{'reservations':>14}{'no-op expire us':>17}{'expire ns/res':>15}"
+          f"{'bot lookup us':>15}{'release us':>12}")
+    for n in args.sizes:
+        for name, cls in (("bucketed", ReservationTable), ("linear", LinearReservationTable)):
+            noop_us, expire_ns, lookup_us, release_us = time_ops(cls, n, max(1, n // args.per_bot))
+            print(f"{name:<10}{n:>14}{noop_us:>17.2f}{expire_ns:>15.1f}"
+                  f"{lookup_us:>15.2f}{release_us:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
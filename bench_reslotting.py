@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Benchmark for demand-driven bin placement in utils/reslotting.py.
+
+Stocks a grid of stacks with bins in random slots, then replays a stream of
+orders whose bins follow a Zipf-like popularity, learning demand from the
+stream (BinDemand). Every retrieval costs the trip from the bin's column to the
+port plus the dig-out of the bins above it (plan_dig_out), and the trip from
+the port to wherever the bin is put back. Two return policies are compared:
+"home" puts the bin back on top of the column it came from, "demand" uses
+plan_return. Each can run with idle re-slotting: every --idle-every orders, up
+to --moves migrations from plan_migrations. Reports the mean retrieval time
+(fetch plus return) over the whole stream and over its last quarter, and the
+mean return trip.
+
+Usage: python bench_reslotting.py [--grid 10] [--fill 0.75] [--orders 2000] [--skews 0.8 1.2]
+"""
+
+import argparse
+import random
+
+from utils.grid_layout import GridLayout
+from utils.occupancy import OccupancyIndex
+from utils.reslotting import BinDemand, plan_migrations, plan_return, port_costs
+from utils.stacks import plan_dig_out
+
+
+class Store:
+    """Occupancy index plus bin positions, with the mission's retrieval and migration moves."""
+
+    def __init__(self, layout, fill, rng):
+        self.layout = layout
+        self.port = layout.delivery_station
+        self.occupancy = OccupancyIndex(layout)
+        self.positions = {}
+        cells = [(x, y) for x in range(layout.width) for y in range(layout.depth)
+                 if layout.is_free(x, y) and (x, y) not in layout.ports]
+        for bin_id in range(int(len(cells) * layout.stack_height * fill)):
+            cell = rng.choice([c for c in cells if self.occupancy.stack_height(*c) < layout.stack_height])
+            self.occupancy.add_bin(bin_id, *cell)
+            self.positions[bin_id] = cell
+        self.costs = port_costs(self.occupancy, self.port)
+
+    def dig(self, bin_id, avoid=()):
+        """Relocate the bins above bin_id; returns (rehandles, rehandle steps), or None if stuck."""
+        cell = self.positions[bin_id]
+        plan = plan_dig_out(self.occupancy, bin_id, cell, avoid)
+        if plan is None:
+            return None
+        for relocation in plan.relocations:
+            self.occupancy.remove_bin(relocation.bin_id, *cell)
+            self.occupancy.add_bin(relocation.bin_id, *relocation.target)
+            self.positions[relocation.bin_id] = relocation.target
+        return plan.rehandles, plan.steps
+
+    def retrieve(self, bin_id, policy, demand, step_s, lift_s):
+        """(seconds, return steps) to bring bin_id to the port and put it back, digging it out first."""
+        dug = self.dig(bin_id)
+        if dug is None:
+            return None
+        rehandles, steps = dug
+        cell = self.positions[bin_id]
+        self.occupancy.remove_bin(bin_id, *cell)
+        slot = plan_return(self.occupancy, demand, bin_id, self.port) if policy == "demand" else None
+        slot = slot or cell
+        self.occupancy.add_bin(bin_id, *slot)
+        self.positions[bin_id] = slot
+        fetch = self.costs[cell] / 2 + steps
+        back = self.costs[slot] / 2
+        return (fetch + back) * step_s + (2 * rehandles + 2) * lift_s, back
+
+    def migrate(self, migration):
+        # As the mission does: blockers must not fill up the target column
+        if self.dig(migration.bin_id, avoid=[migration.target]) is None or \
+                not self.occupancy.has_room(*migration.target):
+            return 0
+        self.occupancy.remove_bin(migration.bin_id, *migration.source)
+        self.occupancy.add_bin(migration.bin_id, *migration.target)
+        self.positions[migration.bin_id] = migration.target
+        return 1
+
+
+def replay(args, skew, policy, reslot):
+    rng = random.Random(args.seed)
+    layout = GridLayout(args.grid, args.grid, stack_height=args.height, ports=[(args.grid - 1, 0)])
+    store = Store(layout, args.fill, rng)
+    bins = list(store.positions)
+    rng.shuffle(bins)
+    weights = [1.0 / (rank + 1) ** skew for rank in range(len(bins))]
+    demand = BinDemand(half_life=args.half_life)
+    times = []
+    returns = []
+    migrations = 0
+    for order in range(args.orders):
+        now = order * args.interarrival
+        for bin_id in set(rng.choices(bins, weights=weights, k=rng.randint(1, 3))):
+            demand.record(bin_id, 1, now)
+            retrieved = store.retrieve(bin_id, policy, demand.scores(now), args.step_s, args.lift_s)
+            if retrieved is not None:
+                times.append(retrieved[0])
+                returns.append(retrieved[1])
+        if reslot and order % args.idle_every == args.idle_every - 1:
+            for migration in plan_migrations(store.occupancy, demand.scores(now), store.port, max_moves=args.moves):
+                migrations += store.migrate(migration)
+    tail = times[-len(times) // 4:]
+    return sum(times) / len(times), sum(tail) / len(tail), sum(returns) / len(returns), migrations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--grid", type=int, default=10)
+    parser.add_argument("--height", type=int, default=8, help="stack capacity")
+    parser.add_argument("--fill", type=float, default=0.75)
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--skews", type=float, nargs="+", default=[0.8, 1.2], help="Zipf exponents of bin popularity")
+    parser.add_argument("--idle-every", type=int, default=10, help="orders between idle re-slotting windows")
+    parser.add_argument("--moves", type=int, default=2, help="migrations per idle window")
+    parser.add_argument("--interarrival", type=float, default=30.0, help="seconds between orders")
+    parser.add_argument("--half-life", type=float, default=3600.0, help="demand half-life in seconds")
+    parser.add_argument("--step-s", type=float, default=1.0, help="seconds per grid step")
+    parser.add_argument("--lift-s", type=float, default=2.0, help="seconds to lift or set down a bin")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"{'skew':>6}{'return':>8}{'reslot':>8}{'mean s':>8}{'saved':>8}{'last 1/4 s':>12}{'saved':>8}"
+          f"{'return steps':>14}{'moves':>7}")
+    for skew in args.skews:
+        baseline = None
+        for policy in ("home", "demand"):
+            for reslot in (False, True):
+                mean, tail, back, migrations = replay(args, skew, policy, reslot)
+                baseline = baseline or (mean, tail)
+                print(f"{skew:>6.1f}{policy:>8}{'on' if reslot else 'off':>8}{mean:>8.1f}{1 - mean / baseline[0]:>8.1%}"
+                      f"{tail:>12.1f}{1 - tail / baseline[1]:>8.1%}{back:>14.1f}{migrations:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Write-contention benchmark for the SQLite storage profiles in db/database.py.
+
+Runs the engine's write pattern against a scratch copy of the database, once
+per profile: a tick writer thread bulk-updating bot and bin positions every
+--tick-ms (the fleet scheduler's commit), --sync-writers threads updating bin
+statuses (dispatch cycles, re-slotting), --order-writers asyncio tasks
+inserting orders with their lines and sale counts (POST /orders/) and
+--readers asyncio tasks loading every order with its products and every bin
+(GET /orders/, snapshot reloads). Reports operations per second, latency
+percentiles and "database is locked" errors per workload and profile.
+
+Usage: python bench_sqlite_contention.py [--profiles rollback wal] [--seconds 10] [--order-writers 8] [--readers 4]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import selectinload, sessionmaker
+
+from db.database import create_engines
+from models.bins import Bin
+from models.bots import Bot
+from models.orders import Order, OrderProduct
+from models.products import Product
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+class Workload:
+    """Latencies and lock errors of one kind of database work."""
+
+    def __init__(self):
+        self.latencies_ms = []
+        self.locked = 0
+        self._lock = threading.Lock()
+
+    def record(self, started: float, error: Exception = None):
+        with self._lock:
+            if error is None:
+                self.latencies_ms.append((time.perf_counter() - started) * 1000)
+            elif "locked" in str(error):
+                self.locked += 1
+            else:
+                raise error
+
+
+def tick_writer(Session, stop, workload, bots, bins, tick_s, rng):
+    while not stop.is_set():
+        started = time.perf_counter()
+        db = Session()
+        try:
+            db.bulk_update_mappings(Bot, [{"id": bot_id, "x": rng.randrange(6), "y": rng.randrange(6)}
+                                          for bot_id in bots])
+            db.bulk_update_mappings(Bin, [{"id": bin_id, "x": rng.randrange(6), "y": rng.randrange(6)}
+                                          for bin_id in rng.sample(bins, min(10, len(bins)))])
+            db.commit()
+            workload.record(started)
+        except OperationalError as e:
+            db.rollback()
+            workload.record(started, e)
+        finally:
+            db.close()
+        time.sleep(max(0.0, tick_s - (time.perf_counter() - started)))
+
+
+def sync_writer(Session, stop, workload, bins, rng):
+    while not stop.is_set():
+        started = time.perf_counter()
+        db = Session()
+        try:
+            bin_obj = db.get(Bin, rng.choice(bins))
+            bin_obj.status = rng.choice(("available", "locked"))
+            db.commit()
+            workload.record(started)
+        except OperationalError as e:
+            db.rollback()
+            workload.record(started, e)
+        finally:
+            db.close()
+        time.sleep(0.005)
+
+
+async def order_writer(AsyncSession, stop, workload, products, rng):
+    # The same statements as create_order: the order row, then its lines and sale counts
+    while not stop.is_set():
+        started = time.perf_counter()
+        async with AsyncSession() as db:
+            try:
+                order = Order(status="pending")
+                db.add(order)
+                await db.commit()
+                for product_id in rng.sample(products, rng.randint(1, 3)):
+                    product = await db.get(Product, product_id)
+                    product.sale_count = (product.sale_count or 0) + 1
+                    db.add(OrderProduct(order_id=order.id, product_id=product_id, quantity=1))
+                await db.commit()
+                workload.record(started)
+            except OperationalError as e:
+                await db.rollback()
+                workload.record(started, e)
+
+
+async def reader(AsyncSession, stop, workload):
+    while not stop.is_set():
+        started = time.perf_counter()
+        async with AsyncSession() as db:
+            try:
+                # Only the latest orders, as the table keeps growing during the run
+                await db.scalars(select(Order).order_by(Order.id.desc()).limit(200)
+                                 .options(selectinload(Order.items).selectinload(OrderProduct.product)))
+                (await db.scalars(select(Bin))).all()
+                workload.record(started)
+            except OperationalError as e:
+                workload.record(started, e)
+
+
+async def run_profile(path, profile, args):
+    engine, async_engine = create_engines(f"sqlite:///{path}", profile)
+    Session = sessionmaker(bind=engine)
+    AsyncSession = async_sessionmaker(async_engine, expire_on_commit=False)
+    db = Session()
+    bots = [bot_id for (bot_id,) in db.query(Bot.id)]
+    bins = [bin_id for (bin_id,) in db.query(Bin.id)]
+    products = [product_id for (product_id,) in db.query(Product.id)]
+    db.close()
+
+    rng = random.Random(args.seed)
+    workloads = {"tick commit": Workload(), "sync writer": Workload(),
+                 "order insert": Workload(), "reader": Workload()}
+    stop = threading.Event()
+    threads = [threading.Thread(target=tick_writer, args=(Session, stop, workloads["tick commit"], bots, bins,
+                                                          args.tick_ms / 1000, random.Random(rng.random())))]
+    threads += [threading.Thread(target=sync_writer, args=(Session, stop, workloads["sync writer"], bins,
+                                                           random.Random(rng.random())))
+                for _ in range(args.sync_writers)]
+    for thread in threads:
+        thread.start()
+    tasks = [asyncio.create_task(order_writer(AsyncSession, stop, workloads["order insert"], products,
+                                              random.Random(rng.random())))
+             for _ in range(args.order_writers)]
+    tasks += [asyncio.create_task(reader(AsyncSession, stop, workloads["reader"])) for _ in range(args.readers)]
+    await asyncio.sleep(args.seconds)
+    stop.set()
+    await asyncio.gather(*tasks)
+    for thread in threads:
+        await asyncio.to_thread(thread.join)
+    engine.dispose()
+    await async_engine.dispose()
+    return workloads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--profiles", nargs="+", default=["rollback", "wal"], help="storage profiles to compare")
+    parser.add_argument("--seconds", type=float, default=10.0, help="run time per profile")
+    parser.add_argument("--tick-ms", type=float, default=50.0, help="tick writer commit interval")
+    parser.add_argument("--sync-writers", type=int, default=2, help="threads updating bin statuses")
+    parser.add_argument("--order-writers", type=int, default=8, help="asyncio tasks inserting orders")
+    parser.add_argument("--readers", type=int, default=4, help="asyncio tasks loading orders and bins")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", default=os.path.join(ROOT, "autostore.db"), help="database to copy and run against")
+    args = parser.parse_args()
+
+    print(f"{'profile':<10}{'workload':<14}{'ops':>7}{'ops/s':>9}{'p50 ms':>9}{'p95 ms':>9}"
+          f"{'p99 ms':>9}{'max ms':>9}{'locked':>8}")
+    for profile in args.profiles:
+        workdir = tempfile.mkdtemp(prefix="autostore-contention-")
+        try:
+            # Fresh copy per profile: the journal mode is stored in the file
+            path = os.path.join(workdir, "autostore.db")
+            shutil.copy(args.db, path)
+            workloads = asyncio.run(run_profile(path, profile, args))
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        for name, workload in workloads.items():
+            values = workload.latencies_ms
+            print(f"{profile:<10}{name:<14}{len(values):>7}{len(values) / args.seconds:>9.1f}"
+                  f"{percentile(values, 50):>9.1f}{percentile(values, 95):>9.1f}{percentile(values, 99):>9.1f}"
+                  f"{max(values, default=0.0):>9.1f}{workload.locked:>8}")
+
+
+if __name__ == "__main__":
+    main()
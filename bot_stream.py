@@ -0,0 +1,130 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+from fastapi import WebSocket
+
+from snapshot_cache import snapshot_cache
+from ws_manager import ConnectionManager
+
+logger = logging.getLogger(__name__)
+
+class BotStreamPublisher:
+    """Shared publisher behind /ws/bots.
+
+    Once per fleet tick (or every poll_interval when the fleet is idle) the
+    publisher diffs the cached bot rows against what it last published and fans
+    out a single delta with only the changed fields to every subscriber. New
+    subscribers first get a full snapshot of the last published state. Every
+    message carries a sequence number: a delta's seq is always the previous
+    message's seq + 1, so a client that sees a gap can send {"action": "resync"}
+    for a fresh snapshot.
+    """
+
+    def __init__(self, poll_interval: float = 0.5):
+        self.poll_interval = poll_interval
+        self.manager = ConnectionManager()
+        self.seq = 0
+        self.published: Dict[int, dict] = {}  # {bot_id: row} as of self.seq
+        self._version = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.deltas_sent = 0
+        self.snapshots_sent = 0
+
+    def snapshot_message(self) -> dict:
+        return {
+            "event": "bots_update",
+            "seq": self.seq,
+            "bots": [self.published[bot_id] for bot_id in sorted(self.published)],
+        }
+
+    def diff(self) -> Optional[dict]:
+        """Compute the delta since the last publish, or None if nothing changed."""
+        version, rows = snapshot_cache.rows("bot_status")
+        if version == self._version:
+            return None
+        self._version = version
+        changed: List[dict] = []
+        for bot_id in sorted(rows):
+            row = rows[bot_id]
+            previous = self.published.get(bot_id)
+            if previous is row:
+                continue
+            if previous is None:
+                changed.append(row)
+            else:
+                fields = {k: v for k, v in row.items() if previous.get(k) != v}
+                if fields:
+                    changed.append({"id": bot_id, **fields})
+        removed = [bot_id for bot_id in self.published if bot_id not in rows]
+        self.published = rows
+        if not changed and not removed:
+            return None
+        self.seq += 1
+        return {"event": "bots_delta", "seq": self.seq, "bots": changed, "removed": removed}
+
+    async def publish(self):
+        delta = self.diff()
+        if delta is not None and self.manager.clients:
+            self.deltas_sent += 1
+            await self.manager.broadcast(delta)
+
+    async def subscribe(self, websocket: WebSocket):
+        """Accept a client and queue the last published snapshot; deltas follow it in order."""
+        await websocket.accept()
+        if self._version is None:
+            self.diff()
+        self.manager.register(websocket)
+        await self.send_snapshot(websocket)
+
+    async def send_snapshot(self, websocket: WebSocket):
+        self.snapshots_sent += 1
+        await self.manager.send(websocket, self.snapshot_message())
+
+    def unsubscribe(self, websocket: WebSocket):
+        self.manager.disconnect(websocket)
+
+    def wake(self):
+        """Publish as soon as possible (called by the fleet scheduler after each tick)."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.publish()
+            except Exception as e:
+                logger.error(f"[BOT STREAM] Publish of seq {self.seq} failed: {e}")
+
+    def start(self):
+        """Start the publish loop on the running event loop (idempotent)."""
+        if self._task is not None and not self._task.done():
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def metrics(self) -> dict:
+        return {
+            "seq": self.seq,
+            "subscribers": len(self.manager.clients),
+            "deltas_sent": self.deltas_sent,
+            "snapshots_sent": self.snapshots_sent,
+            "connections": self.manager.metrics(),
+        }
+
+bot_stream = BotStreamPublisher()
@@ -0,0 +1,66 @@
+import contextlib
+import os
+from typing import Dict, Iterator
+
+from sqlalchemy import create_engine, func, inspect, select
+
+def local_postgres(datadir: str):
+    """A throwaway PostgreSQL server in datadir, the stand-in for benchmarks and local runs.
+
+    Uses the pgserver package (PostgreSQL binaries on pip, no system install);
+    use as a context manager, the server stops on exit. Its url is get_uri().
+    """
+    try:
+        import pgserver
+    except ImportError as e:
+        raise RuntimeError("The local PostgreSQL stand-in needs pgserver (pip install pgserver)") from e
+    return pgserver.get_server(datadir, cleanup_mode="stop")
+
+def copy_database(source_url: str, target_url: str) -> Dict[str, int]:
+    """Create the schema in the PostgreSQL target and copy every row of source into it.
+
+    Ids are kept and the target's id sequences moved past them. Returns the
+    number of rows copied per table.
+    """
+    # Imported here: db.database reads AUTOSTORE_DATABASE_URL at import time, which
+    # may point at the server local_postgres() just started
+    from db.database import Base, sync_database_url
+    import models  # noqa: F401 - registers every table on Base.metadata
+
+    source = create_engine(sync_database_url(source_url))
+    target = create_engine(sync_database_url(target_url))
+    Base.metadata.create_all(target)
+    copied = {}
+    try:
+        with source.connect() as src, target.begin() as dst:
+            # orders and bots reference each other; check no foreign keys while copying
+            dst.exec_driver_sql("SET session_replication_role = replica")
+            for table in Base.metadata.tables.values():
+                # Columns added to the models since the source was created stay NULL
+                present = {column["name"] for column in inspect(source).get_columns(table.name)}
+                columns = [column for column in table.columns if column.name in present]
+                rows = [dict(row._mapping) for row in src.execute(select(*columns))]
+                dst.execute(table.delete())
+                if rows:
+                    dst.execute(table.insert(), rows)
+                copied[table.name] = len(rows)
+                if "id" in table.c and table.c.id.autoincrement is not False and rows:
+                    dst.execute(select(func.setval(func.pg_get_serial_sequence(table.name, "id"),
+                                                   func.max(table.c.id))))
+    finally:
+        source.dispose()
+        target.dispose()
+    return copied
+
+@contextlib.contextmanager
+def postgres_from_sqlite(sqlite_url: str, datadir: str) -> Iterator[str]:
+    """Start the stand-in server in datadir loaded with the SQLite database, and select it.
+
+    Sets AUTOSTORE_DATABASE_URL, so call it before db.database is imported.
+    Yields the server's url.
+    """
+    with local_postgres(datadir) as server:
+        url = server.get_uri()
+        os.environ["AUTOSTORE_DATABASE_URL"] = url
+        copy_database(sqlite_url, url)
+        yield url
@@ -0,0 +1,10 @@
+from sqlalchemy import JSON, Integer
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+
+# Column types that are native on PostgreSQL and stored as JSON text on SQLite
+
+# JSON documents (coordinates, paths): JSONB on PostgreSQL
+JsonDocument = JSON().with_variant(JSONB(), "postgresql")
+
+# Lists of ids: integer[] on PostgreSQL
+IntegerList = JSON().with_variant(ARRAY(Integer), "postgresql")
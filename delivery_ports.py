@@ -0,0 +1,187 @@
+import logging
+from collections import deque
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from utils.grid_layout import GridLayout
+from utils.pick_sequence import grid_distance
+
+logger = logging.getLogger(__name__)
+
+Cell = Tuple[int, int]
+
+class DeliveryPort:
+    """One picking station: an arrival queue of bots, served one bin at a time.
+
+    Times are fleet ticks; promised counts the bins of orders routed here
+    that have not been served yet, per bot.
+    """
+
+    def __init__(self, cell: Cell, service_seconds: float):
+        self.cell = cell
+        self.service_seconds = service_seconds
+        self.queue: "deque[int]" = deque()
+        self.promised: Dict[int, int] = {}
+        self._arrived: Dict[int, int] = {}
+        self.orders_routed = 0
+        self.bins_served = 0
+        self.wait_ticks = 0
+        self.max_queue = 0
+        self._queue_ticks = 0  # integral of queue length over time
+        self._last_change = 0
+        self._opened_at: Optional[int] = None
+
+    @property
+    def load(self) -> int:
+        return sum(self.promised.values())
+
+    def expected_wait(self) -> float:
+        """Seconds of picking already promised to this port."""
+        return self.load * self.service_seconds
+
+    def _track(self, now: int):
+        if self._opened_at is None:
+            self._opened_at = now
+        self._queue_ticks += len(self.queue) * (now - self._last_change)
+        self._last_change = now
+
+class DeliveryPorts:
+    """Delivery ports from the grid layout, with order routing and per-port metrics.
+
+    Orders go to the port with the least expected completion: the round trips
+    of their bins to the port plus the picking already promised to it. At the
+    port, bots queue in arrival order and enter the port cell one at a time.
+    """
+
+    def __init__(self):
+        self.ports: Dict[Cell, DeliveryPort] = {}
+        self.tick_interval = 1.0
+
+    def configure(self, layout: GridLayout, tick_interval: float):
+        self.ports = {cell: DeliveryPort(cell, layout.port_service[cell]) for cell in layout.ports}
+        self.tick_interval = tick_interval
+        logger.info(f"[PORTS] {len(self.ports)} delivery ports: "
+                    f"{', '.join(f'{c} {p.service_seconds}s' for c, p in self.ports.items())}")
+
+    def best_port(self, bin_cells: Sequence[Cell], layout: GridLayout, exclude: Sequence[Cell] = ()) -> Optional[Cell]:
+        """Port with the least expected completion for an order fetching bins from bin_cells.
+
+        Ports in exclude are not considered; None when that leaves none.
+        """
+        if not self.ports:
+            return None if layout.delivery_station in exclude else layout.delivery_station
+        candidates = [port for cell, port in self.ports.items() if cell not in exclude]
+        if not candidates:
+            return None
+
+        def completion(port: DeliveryPort) -> float:
+            travel = sum(2 * grid_distance(cell, port.cell, layout) for cell in bin_cells) * self.tick_interval
+            return travel + port.expected_wait() + len(bin_cells) * port.service_seconds
+
+        return min(candidates, key=completion).cell
+
+    def route(self, bot_id: int, bin_cells: Sequence[Cell], layout: GridLayout) -> Cell:
+        """Route an order to the best port and promise it the order's bins."""
+        cell = self.best_port(bin_cells, layout)
+        port = self.ports.get(cell)
+        if port is not None:
+            port.promised[bot_id] = port.promised.get(bot_id, 0) + len(bin_cells)
+            port.orders_routed += 1
+        return cell
+
+    def service_seconds(self, cell: Cell, layout: GridLayout) -> float:
+        port = self.ports.get(cell)
+        return port.service_seconds if port else layout.port_service_seconds
+
+    def arrive(self, cell: Cell, bot_id: int, now: int):
+        """A bot carrying a bin joins the port's queue."""
+        port = self.ports.get(cell)
+        if port is None or bot_id in port.queue:
+            return
+        port._track(now)
+        port.queue.append(bot_id)
+        port._arrived[bot_id] = now
+        port.max_queue = max(port.max_queue, len(port.queue))
+
+    def may_enter(self, cell: Cell, bot_id: int, occupancy) -> bool:
+        """True when bot_id heads the queue and the port cell is clear."""
+        port = self.ports.get(cell)
+        if port is None:
+            return True
+        return bool(port.queue) and port.queue[0] == bot_id and occupancy.bot_at(*cell) in (None, bot_id)
+
+    def begin_service(self, cell: Cell, bot_id: int, now: int):
+        port = self.ports.get(cell)
+        if port is not None:
+            port.wait_ticks += now - port._arrived.pop(bot_id, now)
+
+    def finish(self, cell: Cell, bot_id: int, now: int):
+        """The bot's bin has been picked; the next bot in the queue may enter."""
+        port = self.ports.get(cell)
+        if port is None:
+            return
+        port._track(now)
+        if bot_id in port.queue:
+            port.queue.remove(bot_id)
+        if port.promised.get(bot_id, 0) > 1:
+            port.promised[bot_id] -= 1
+        else:
+            port.promised.pop(bot_id, None)
+        port.bins_served += 1
+
+    def leave(self, cell: Cell, bot_id: int, now: int) -> int:
+        """The bot gives up on the port unserved: it leaves the queue; returns the bins it had promised."""
+        port = self.ports.get(cell)
+        if port is None:
+            return 0
+        port._track(now)
+        if bot_id in port.queue:
+            port.queue.remove(bot_id)
+        port._arrived.pop(bot_id, None)
+        return port.promised.pop(bot_id, 0)
+
+    def reroute(self, cell: Cell, bot_id: int, bin_cells: Sequence[Cell], layout: GridLayout, now: int,
+                exclude: Sequence[Cell] = ()) -> Optional[Cell]:
+        """Send a bot that cannot get into port cell to the best other port, with its promised bins.
+
+        bin_cells are the bins it still has to deliver. Returns the new port,
+        or None (and the bot stays where it was queued) if every port other
+        than cell is in exclude.
+        """
+        other = self.best_port(bin_cells, layout, exclude=[cell, *exclude])
+        if other is None:
+            return None
+        promised = self.leave(cell, bot_id, now) or len(bin_cells)
+        port = self.ports.get(other)
+        if port is not None:
+            port.promised[bot_id] = port.promised.get(bot_id, 0) + promised
+            port.orders_routed += 1
+        return other
+
+    def release_bot(self, bot_id: int):
+        """Drop whatever a bot still holds at any port (fleet idle listener)."""
+        for port in self.ports.values():
+            port.promised.pop(bot_id, None)
+            port._arrived.pop(bot_id, None)
+            if bot_id in port.queue:
+                port.queue.remove(bot_id)
+
+    def metrics(self, now: int) -> List[dict]:
+        ports = []
+        for port in self.ports.values():
+            port._track(now)
+            elapsed = max(1, now - port._opened_at) * self.tick_interval if port._opened_at is not None else 0.0
+            ports.append({
+                "port": list(port.cell),
+                "service_s": port.service_seconds,
+                "queue_length": len(port.queue),
+                "max_queue": port.max_queue,
+                "mean_queue": port._queue_ticks * self.tick_interval / elapsed if elapsed else 0.0,
+                "orders_routed": port.orders_routed,
+                "bins_served": port.bins_served,
+                "bins_per_min": port.bins_served * 60 / elapsed if elapsed else 0.0,
+                "mean_wait_s": port.wait_ticks * self.tick_interval / port.bins_served if port.bins_served else 0.0,
+                "expected_wait_s": port.expected_wait(),
+            })
+        return ports
+
+delivery_ports = DeliveryPorts()
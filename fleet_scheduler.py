@@ -0,0 +1,519 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Deque, Dict, FrozenSet, Generator, List, Optional, Set, Tuple
+
+from sqlalchemy import inspect
+from sqlalchemy.orm.attributes import set_committed_value
+
+from db.database import SessionLocal
+from models.bins import Bin
+from models.bots import Bot
+from snapshot_cache import snapshot_cache
+from bot_stream import bot_stream
+from joint_planner import JointPlanner
+from sim_clock import sim_clock
+from utils.astar import hold_position, update_bot_reservations
+from utils.grid_layout import get_grid_layout
+from utils.occupancy import OccupancyIndex
+from ws_manager import bots_ws_manager
+
+logger = logging.getLogger(__name__)
+
+# A mission is a generator that performs one step of a bot's work per tick and
+# yields to hand control back to the scheduler
+Mission = Generator[None, None, None]
+
+# How often bot/bin positions reach the database:
+#   step  - commit after every single move (slowest, nothing is ever lost)
+#   tick  - one bulk update per tick, or per flush_interval_ms if set
+#   state - only when a bot/bin/order state changes (status, carried bin, ...)
+DURABILITY_MODES = ("step", "tick", "state")
+
+# How bots find their paths:
+#   whca - each bot plans alone against the shared reservation table (WHCA*)
+#   cbs  - every driving bot is planned jointly each tick something changes (CBS/ECBS)
+PLANNERS = ("whca", "cbs")
+
+class PositionBuffer:
+    """In-memory bot and bin positions waiting to be written in bulk.
+
+    Positions are set on the ORM objects with set_committed_value, so missions
+    see them immediately but the session does not track them as changes; the
+    snapshot cache is told directly so polls see them too. flush() writes every pending row with one executemany UPDATE per table.
+    Flushed rows are kept until the commit succeeds, so restore() can put them back when it fails.
+    """
+
+    def __init__(self):
+        self.bots: Dict[int, dict] = {}
+        self.bins: Dict[int, dict] = {}
+        self._flushed: Tuple[Dict[int, dict], Dict[int, dict]] = ({}, {})
+
+    def __len__(self) -> int:
+        return len(self.bots) + len(self.bins)
+
+    def set_bot(self, bot, x: int, y: int, z: int):
+        set_committed_value(bot, "x", x)
+        set_committed_value(bot, "y", y)
+        set_committed_value(bot, "current_location_z", z)
+        snapshot_cache.bot_moved(bot.id, x, y, z)
+        self.bots[bot.id] = {"id": bot.id, "x": x, "y": y, "current_location_z": z}
+
+    def set_bin(self, bin_obj, x: int, y: int, z: int):
+        set_committed_value(bin_obj, "x", x)
+        set_committed_value(bin_obj, "y", y)
+        set_committed_value(bin_obj, "z_location", z)
+        snapshot_cache.bin_moved(bin_obj.id, x, y, z)
+        self.bins[bin_obj.id] = {"id": bin_obj.id, "x": x, "y": y, "z_location": z}
+
+    def flush(self, db) -> int:
+        """Stage all pending positions on db; returns the number of rows written."""
+        rows = len(self)
+        if self.bots:
+            db.bulk_update_mappings(Bot, list(self.bots.values()))
+        if self.bins:
+            db.bulk_update_mappings(Bin, list(self.bins.values()))
+        self._flushed = (self.bots, self.bins)
+        self.bots, self.bins = {}, {}
+        return rows
+
+    def committed(self):
+        """The rows of the last flush() are in the database."""
+        self._flushed = ({}, {})
+
+    def restore(self, db):
+        """Re-stage the rows of a failed commit after db was rolled back; newer positions win.
+
+        The rollback expired the ORM objects, so the positions are set on them
+        again: missions must keep seeing where their bots and bins really are.
+        """
+        bots, bins = self._flushed
+        self._flushed = ({}, {})
+        for pending, flushed in ((self.bots, bots), (self.bins, bins)):
+            for obj_id, row in flushed.items():
+                pending.setdefault(obj_id, row)
+        for model, pending in ((Bot, self.bots), (Bin, self.bins)):
+            for row in pending.values():
+                obj = db.get(model, row["id"])
+                if obj is not None:
+                    for key, value in row.items():
+                        set_committed_value(obj, key, value)
+
+def _pending_changes(db):
+    """Column changes, new and deleted objects pending on db, to re-stage after a rollback."""
+    dirty = []
+    for obj in db.dirty:
+        state = inspect(obj)
+        changed = {key: getattr(obj, key) for key in state.mapper.column_attrs.keys()
+                   if state.attrs[key].history.has_changes()}
+        if changed:
+            dirty.append((obj, changed))
+    return dirty, list(db.new), list(db.deleted)
+
+def _restage_changes(db, changes):
+    dirty, new, deleted = changes
+    for obj, changed in dirty:
+        for key, value in changed.items():
+            setattr(obj, key, value)
+    db.add_all(new)
+    for obj in deleted:
+        db.delete(obj)
+
+class FleetView:
+    """Copy of the scheduler's live state for work offloaded to the worker thread.
+
+    Taken on the event loop between ticks (see FleetScheduler.view), so
+    dispatch and re-slotting never iterate the occupancy index or the mission
+    table while missions change them. extra holds state the caller adds.
+    """
+
+    def __init__(self, occupancy: Optional[OccupancyIndex], missions: FrozenSet[int], now: int, **extra):
+        self.occupancy = occupancy
+        self.missions = missions
+        self.now = now
+        self.__dict__.update(extra)
+
+class FleetScheduler:
+    """Single simulation/dispatch loop for the whole fleet.
+
+    Every tick the scheduler advances each bot's mission by one step. Missions
+    stage their moves and WebSocket events instead of committing and
+    broadcasting themselves; at the end of the tick all moves are applied and
+    reserved against the shared tick counter, positions are persisted according
+    to the durability mode, and the queued events are broadcast.
+    """
+
+    def __init__(self, tick_interval: float = 1.0, latency_window: int = 1000,
+                 durability: str = "tick", flush_interval_ms: float = 0.0,
+                 planner: str = "whca", cbs_suboptimality: float = 1.2):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown durability mode {durability!r}, expected one of {DURABILITY_MODES}")
+        if planner not in PLANNERS:
+            raise ValueError(f"Unknown planner {planner!r}, expected one of {PLANNERS}")
+        self.tick_interval = tick_interval
+        self.durability = durability
+        self.planner = planner
+        # Joint planner in cbs mode; missions drive with it instead of planning alone
+        self.joint_planner: Optional[JointPlanner] = (
+            JointPlanner(suboptimality=cbs_suboptimality) if planner == "cbs" else None)
+        self.flush_interval_ms = flush_interval_ms
+        self.positions = PositionBuffer()
+        self._last_flush = 0.0
+        self._state_changed = False
+        self.commits = 0
+        self.position_rows_flushed = 0
+        self.now = 0  # global tick counter, also the reservation time base
+        self.missions: Dict[int, Mission] = {}  # {bot_id: mission}
+        self._preemptible: Set[int] = set()  # bots whose mission may be replaced without a warning
+        self.idle_listeners: List[Callable[[int], None]] = []  # called with the bot id when a mission ends
+        self.db = None
+        self.occupancy: Optional[OccupancyIndex] = None  # built from the database in start()
+        self._moves: List[Tuple[object, int, int, int]] = []  # (bot, x, y, z)
+        self._events: List[Tuple[object, dict]] = []  # (ws manager, message)
+        self._task: Optional[asyncio.Task] = None
+        # Blocking database work (tick commits, dispatch, re-slotting) runs here, one job at a time
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fleet-db")
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self.tick_latencies_ms: Deque[float] = deque(maxlen=latency_window)
+        self.ticks = 0
+        self.overruns = 0
+        self.busy_ticks: Dict[int, int] = {}  # {bot_id: ticks spent on a mission}, for utilization
+        self.conflicts_held = 0  # staged moves refused because they collided with another bot
+
+    # --- Mission API ---
+
+    def _defer_to_loop(self, fn, *args) -> bool:
+        """Re-schedule fn on the scheduler's loop when called from another thread (e.g. a worker thread)."""
+        loop = self._loop
+        if loop is None or not loop.is_running():
+            return False
+        try:
+            if asyncio.get_running_loop() is loop:
+                return False
+        except RuntimeError:
+            pass
+        loop.call_soon_threadsafe(fn, *args)
+        return True
+
+    def submit(self, bot_id: int, mission: Mission, preemptible: bool = False):
+        """Hand a bot's mission to the scheduler; it starts on the next tick. Safe from any thread.
+
+        A mission the bot already has is closed and replaced; preemptible
+        missions (e.g. making way for another bot) expect that.
+        """
+        if self._defer_to_loop(self.submit, bot_id, mission, preemptible):
+            return
+        current = self.missions.get(bot_id)
+        if current is not None:
+            if bot_id not in self._preemptible:
+                logger.warning(f"[SCHEDULER] Bot {bot_id} already has a mission, replacing it")
+            current.close()
+        self.missions[bot_id] = mission
+        if preemptible:
+            self._preemptible.add(bot_id)
+        else:
+            self._preemptible.discard(bot_id)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def move_bot(self, bot, x: int, y: int, z: Optional[int] = None):
+        """Stage a one-cell move for bot, applied with every other move at the end of the tick."""
+        self._moves.append((bot, x, y, bot.current_location_z if z is None else z))
+
+    def broadcast(self, manager, message: dict):
+        """Queue a WebSocket message, sent after this tick's commit. Safe from any thread."""
+        if self._defer_to_loop(self.broadcast, manager, message):
+            return
+        self._events.append((manager, message))
+
+    def wait(self, seconds: float) -> Generator[None, None, None]:
+        """Idle a mission for the number of ticks closest to seconds (zero for sub-tick pauses)."""
+        for _ in range(round(seconds / self.tick_interval)):
+            yield
+
+    def view(self, **extra) -> FleetView:
+        """Snapshot of occupancy and missions for offloaded work; call it on the event loop."""
+        occupancy = self.occupancy.copy() if self.occupancy is not None else None
+        return FleetView(occupancy, frozenset(self.missions), self.now, **extra)
+
+    async def offload(self, fn: Callable, *args):
+        """Run blocking database work fn(*args) on the scheduler's worker thread and return its result.
+
+        Tick commits, dispatch cycles and re-slotting passes share the one
+        thread, so they never wait on each other's locks while holding the
+        event loop. Missions keep running on the loop meanwhile, so fn must not
+        read live fleet state: pass it a view() instead. In fast clock mode
+        simulated time is held still until fn returns, so the jump to the next
+        sleeper never overtakes it.
+        """
+        loop = asyncio.get_running_loop()
+        if sim_clock.fast:
+            async with sim_clock.busy():
+                return await loop.run_in_executor(self._executor, fn, *args)
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    # --- Tick loop ---
+
+    def _advance_missions(self):
+        for bot_id, mission in list(self.missions.items()):
+            if self.missions.get(bot_id) is not mission:
+                continue  # replaced by a mission submitted earlier this tick
+            self.busy_ticks[bot_id] = self.busy_ticks.get(bot_id, 0) + 1
+            try:
+                next(mission)
+            except StopIteration:
+                del self.missions[bot_id]
+                self._preemptible.discard(bot_id)
+                self._state_changed = True  # make sure the final positions are persisted
+                logger.debug(f"[SCHEDULER] Mission for bot {bot_id} finished at tick {self.now}")
+                self._notify_idle(bot_id)
+            except Exception as e:
+                del self.missions[bot_id]
+                self._preemptible.discard(bot_id)
+                logger.error(f"[SCHEDULER] Mission for bot {bot_id} failed at tick {self.now}: {e}")
+                self._notify_idle(bot_id)
+
+    def _notify_idle(self, bot_id: int):
+        # Listeners only schedule work (e.g. wake the dispatcher), which runs after this tick commits
+        for listener in self.idle_listeners:
+            try:
+                listener(bot_id)
+            except Exception as e:
+                logger.error(f"[SCHEDULER] Idle listener failed for bot {bot_id}: {e}")
+
+    def _resolve_conflicts(self, moves: List[Tuple[object, int, int, int]]) -> List[Tuple[object, int, int, int]]:
+        """The staged moves that collide with no other bot; the rest are held in place.
+
+        A move is refused if its cell is taken by a bot that stays put (or was
+        itself held) or by an earlier bot's move (vertex conflict), or if it
+        swaps cells with another bot's move (edge conflict). Holding a bot can
+        create new conflicts, so the check repeats until nothing changes; held
+        bots keep their cell reserved like any other bot standing still.
+        """
+        latest = {bot.id: (bot, x, y, z) for bot, x, y, z in moves}  # a bot moves once per tick
+        accepted = dict(latest)
+        changed = True
+        while changed:
+            changed = False
+            staying = {cell for bot_id, cell in self.occupancy.bot_cells.items()
+                       if bot_id not in accepted or accepted[bot_id][1:3] == cell}
+            claimed: Dict[Tuple[int, int], int] = {}
+            for bot_id, (bot, x, y, _) in list(accepted.items()):
+                target, source = (x, y), (bot.x, bot.y)
+                swap = any(other_id != bot_id and (other.x, other.y) == target and (ox, oy) == source
+                           for other_id, (other, ox, oy, _) in accepted.items())
+                if target != source and (target in staying or target in claimed or swap):
+                    logger.debug(f"[SCHEDULER] Bot {bot_id} held at {source}: {target} is taken at tick {self.now + 1}")
+                    del accepted[bot_id]
+                    changed = True
+                    break
+                claimed[target] = bot_id
+        self.conflicts_held += len(latest) - len(accepted)
+        return list(accepted.values())
+
+    def _apply_moves(self):
+        moves, self._moves = self._moves, []
+        moves = self._resolve_conflicts(moves)
+        if self.joint_planner is None:
+            # Bots that stay put this tick keep their cell reserved for WHCA*
+            moving = {bot.id for bot, _, _, _ in moves}
+            for bot_id, cell in self.occupancy.bot_cells.items():
+                if bot_id not in moving:
+                    hold_position(bot_id, cell, self.now + 1)
+        for bot, x, y, z in moves:
+            update_bot_reservations(bot.id, (bot.x, bot.y), (x, y), self.now + 1)
+            self.occupancy.place_bot(bot.id, x, y)
+            self.positions.set_bot(bot, x, y, z)
+            self.broadcast(bots_ws_manager, {
+                "event": "status_update",
+                "bot_id": bot.id,
+                "bot_status": bot.status,
+                "assigned_order_id": bot.assigned_order_id,
+                "carried_bin_id": bot.carried_bin_id
+            })
+            # If bot is carrying a bin, the bin moves with it
+            if bot.carried_bin_id:
+                bin_obj = self.db.get(Bin, bot.carried_bin_id)
+                if bin_obj:
+                    self.positions.set_bin(bin_obj, x, y, z)
+                    self.broadcast(bots_ws_manager, {
+                        'event': 'bin_move',
+                        'bin_id': bin_obj.id,
+                        'x': bin_obj.x,
+                        'y': bin_obj.y,
+                        'z': bin_obj.z_location,
+                        'bin_status': bin_obj.status
+                    })
+            self.broadcast(bots_ws_manager, {
+                "event": "bot_move",
+                "bot_id": bot.id,
+                "x": x,
+                "y": y,
+                "z": z,
+                "assigned_order_id": bot.assigned_order_id
+            })
+            if self.durability == "step":
+                self._commit(flush_positions=True)
+
+    def _commit(self, flush_positions: bool):
+        """Commit the tick's changes; on failure keep them staged and retry on the next commit.
+
+        SQLAlchemy needs a rollback after a failed commit, and that expires every
+        ORM object the missions hold. The pending attribute changes and the
+        flushed positions are re-applied afterwards, so missions, occupancy and
+        reservations carry on with the state they already act on.
+        """
+        db = self.db
+        changes = _pending_changes(db)
+        try:
+            rows = self.positions.flush(db) if flush_positions else 0
+            db.commit()
+        except Exception as e:
+            logger.error(f"[SCHEDULER] Commit failed at tick {self.now}, retrying next tick: {e}")
+            db.rollback()
+            _restage_changes(db, changes)
+            self.positions.restore(db)
+            self._state_changed = True
+            return
+        self.positions.committed()
+        if flush_positions:
+            self.position_rows_flushed += rows
+            self._last_flush = sim_clock.now()
+        self.commits += 1
+
+    def _persist(self):
+        """Write this tick's changes according to the durability mode."""
+        db = self.db
+        state_changed = self._state_changed or bool(db.new or db.dirty or db.deleted)
+        self._state_changed = False
+        if self.durability == "state":
+            flush_positions = state_changed and len(self.positions) > 0
+        else:
+            elapsed_ms = (sim_clock.now() - self._last_flush) * 1000
+            flush_positions = len(self.positions) > 0 and elapsed_ms >= self.flush_interval_ms
+        if flush_positions or state_changed:
+            self._commit(flush_positions)
+
+    def rebuild_occupancy(self):
+        """Reload the occupancy index from the database (e.g. after positions were edited outside missions)."""
+        self.occupancy = OccupancyIndex(get_grid_layout())
+        self.occupancy.rebuild(self.db.query(Bot).all(), self.db.query(Bin).all())
+
+    def flush(self):
+        """Persist every buffered position now, whatever the durability mode."""
+        if self.db is not None:
+            self._commit(flush_positions=True)
+
+    async def step(self):
+        """Advance every mission by one tick, then commit and broadcast once.
+
+        Missions plan from positions at time self.now; their staged moves arrive
+        (and are reserved) at self.now + 1, which becomes the new time. In cbs
+        mode the joint plan is brought up to date before any mission runs.
+        """
+        if self.joint_planner is not None:
+            self.joint_planner.replan(self.now, self.occupancy, get_grid_layout())
+        self._advance_missions()
+        self._apply_moves()
+        self.now += 1
+        await self.offload(self._persist)
+        events, self._events = self._events, []
+        for manager, message in events:
+            await manager.broadcast(message)
+        bot_stream.wake()
+
+    async def _run(self):
+        # Ticks are paced on the simulation clock, in simulated seconds
+        budget = sim_clock.wall_seconds(self.tick_interval)
+        next_tick = sim_clock.now()
+        while True:
+            if not self.missions and not self._state_changed:
+                # Nothing to simulate or to retry committing: sleep until a mission is submitted
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                next_tick = sim_clock.now()
+            started = time.perf_counter()
+            try:
+                await self.step()
+            except Exception as e:
+                logger.error(f"[SCHEDULER] Tick {self.now} failed: {e}")
+            elapsed = time.perf_counter() - started
+            self.ticks += 1
+            self.tick_latencies_ms.append(elapsed * 1000)
+            if budget and elapsed > budget:
+                self.overruns += 1
+            next_tick += self.tick_interval
+            await sim_clock.sleep_until(next_tick)
+
+    def start(self):
+        """Start the tick loop on the running event loop (idempotent)."""
+        if self._task is not None and not self._task.done():
+            return
+        # Long-lived session shared by all missions; objects stay usable across commits
+        self.db = SessionLocal(expire_on_commit=False)
+        self.rebuild_occupancy()
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        if self.missions:
+            self._wakeup.set()
+        self._task = self._loop.create_task(self._run())
+        logger.info(f"[SCHEDULER] Fleet scheduler started (tick={self.tick_interval}s, durability={self.durability}, "
+                    f"planner={self.planner}, clock={sim_clock.mode})")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.db is not None:
+            # Queued behind a commit the cancelled tick may have left running
+            await self.offload(self.flush)
+            self.db.close()
+            self.db = None
+
+    def metrics(self) -> dict:
+        latencies = sorted(self.tick_latencies_ms)
+
+        def percentile(p):
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))]
+
+        return {
+            "tick": self.now,
+            "ticks": self.ticks,
+            "tick_interval_s": self.tick_interval,
+            "active_missions": len(self.missions),
+            "busy_ticks": self.busy_ticks,
+            "conflicts_held": self.conflicts_held,
+            "overruns": self.overruns,
+            "durability": self.durability,
+            "planner": self.planner,
+            "clock": sim_clock.status(),
+            "joint_planner": self.joint_planner.metrics() if self.joint_planner is not None else None,
+            "commits": self.commits,
+            "position_rows_flushed": self.position_rows_flushed,
+            "positions_pending": len(self.positions),
+            "tick_latency_ms": {
+                "last": self.tick_latencies_ms[-1] if self.tick_latencies_ms else 0.0,
+                "p50": percentile(50),
+                "p95": percentile(95),
+                "p99": percentile(99),
+                "max": latencies[-1] if latencies else 0.0,
+            },
+        }
+
+fleet_scheduler = FleetScheduler(
+    tick_interval=float(os.environ.get("AUTOSTORE_TICK_SECONDS", "1.0")),
+    durability=os.environ.get("AUTOSTORE_DURABILITY", "tick"),
+    flush_interval_ms=float(os.environ.get("AUTOSTORE_FLUSH_MS", "0")),
+    planner=os.environ.get("AUTOSTORE_PLANNER", "whca"),
+    cbs_suboptimality=float(os.environ.get("AUTOSTORE_CBS_SUBOPTIMALITY", "1.2")),
+)
@@ -0,0 +1,138 @@
+import logging
+import time
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from utils.cbs import at, cbs, space_time_astar, Traffic
+from utils.grid_layout import GridLayout
+from utils.occupancy import OccupancyIndex
+from utils.pick_sequence import grid_distance
+
+logger = logging.getLogger(__name__)
+
+Cell = Tuple[int, int]
+
+class JointPlanner:
+    """Joint CBS/ECBS paths for every bot that is currently driving somewhere.
+
+    Missions register a goal with request() and take one cell per tick from
+    next_cell(). At the start of a tick, before any mission runs, the fleet
+    scheduler calls replan(): if a goal was added or dropped, a bot fell behind
+    its plan, or a bot that is standing still moved, all driving bots are
+    planned together from their current cells. Bots standing still are
+    obstacles. A bot whose goal is taken (by a standing bot, or by a driving
+    bot closer to it) waits in place until the next replan.
+    """
+
+    def __init__(self, suboptimality: float = 1.2, max_nodes: int = 200):
+        self.suboptimality = suboptimality
+        self.max_nodes = max_nodes
+        self.goals: Dict[int, Cell] = {}
+        self.plans: Dict[int, List[Cell]] = {}
+        self.plan_time = 0
+        self._static: FrozenSet[Cell] = frozenset()
+        self._dirty = False
+        self.replans = 0
+        self.failures = 0  # replans where CBS found no joint solution within max_nodes
+        self.nodes = 0
+        self.held = 0
+        self.last_ms = 0.0
+        self.total_ms = 0.0
+
+    def request(self, bot_id: int, goal: Cell):
+        """Plan bot_id towards goal from the next tick on."""
+        if self.goals.get(bot_id) != goal:
+            self.goals[bot_id] = goal
+            self.plans.pop(bot_id, None)
+            self._dirty = True
+
+    def release(self, bot_id: int):
+        """The bot stopped driving; it is an obstacle from the next replan on."""
+        if self.goals.pop(bot_id, None) is not None:
+            self.plans.pop(bot_id, None)
+            self._dirty = True
+
+    def next_cell(self, bot_id: int, now: int) -> Optional[Cell]:
+        """Where the plan has bot_id at now + 1, or None if it has no plan yet."""
+        plan = self.plans.get(bot_id)
+        if plan is None:
+            return None
+        return at(plan, now - self.plan_time + 1)
+
+    def remaining(self, bot_id: int, now: int) -> List[Cell]:
+        plan = self.plans.get(bot_id)
+        return plan[now - self.plan_time:] if plan else []
+
+    def replan(self, now: int, occupancy: OccupancyIndex, layout: GridLayout):
+        """Plan all driving bots jointly if anything changed since the last plan."""
+        static = frozenset(cell for bot_id, cell in occupancy.bot_cells.items() if bot_id not in self.goals)
+        dirty = self._dirty or static != self._static
+        for bot_id, plan in self.plans.items():
+            if occupancy.bot_cells.get(bot_id) != at(plan, now - self.plan_time):
+                dirty = True  # the bot waited (port queue, obstacle) instead of following its plan
+        if not dirty or not self.goals:
+            self._static = static
+            self._dirty = False
+            return
+        started = time.perf_counter()
+
+        # One bot per goal: the closest one drives, the others wait where they are
+        claimed: Dict[Cell, Tuple[int, int]] = {}
+        held = set()
+        for bot_id, goal in self.goals.items():
+            start = occupancy.bot_cells.get(bot_id)
+            if start is None:
+                continue
+            if goal in static and start != goal:
+                held.add(bot_id)
+                continue
+            distance = grid_distance(start, goal, layout)
+            other = claimed.get(goal)
+            if other is not None and other[1] <= distance:
+                held.add(bot_id)
+                continue
+            if other is not None:
+                held.add(other[0])
+            claimed[goal] = (bot_id, distance)
+        agents = [bot_id for bot_id, _ in claimed.values()]
+        obstacles = static | {occupancy.bot_cells[bot_id] for bot_id in held}
+        blocked = frozenset(layout.ports)
+        pairs = [(occupancy.bot_cells[bot_id], self.goals[bot_id]) for bot_id in agents]
+
+        stats: dict = {}
+        paths = cbs(pairs, layout, blocked, obstacles, max_nodes=self.max_nodes,
+                    suboptimality=self.suboptimality, stats=stats)
+        if paths is None:
+            # No joint solution in budget: plan bots one by one around the paths so far
+            self.failures += 1
+            paths = []
+            traffic = Traffic()
+            for start, goal in pairs:
+                path = space_time_astar(start, goal, layout, blocked=blocked, obstacles=obstacles,
+                                        traffic=traffic) or [start]
+                paths.append(path)
+                traffic.add(path)
+        self.plans = dict(zip(agents, paths))
+        self.plan_time = now
+        self._static = static
+        self._dirty = False
+        self.replans += 1
+        self.nodes += stats.get("nodes", 0)
+        self.held = len(held)
+        self.last_ms = (time.perf_counter() - started) * 1000
+        self.total_ms += self.last_ms
+        logger.debug(f"[CBS] Tick {now}: planned {len(agents)} bots jointly ({len(held)} waiting), "
+                     f"{stats.get('nodes', 0)} nodes, {'solved' if stats.get('solved') else 'fallback'}, "
+                     f"{self.last_ms:.1f} ms")
+
+    def metrics(self) -> dict:
+        return {
+            "suboptimality": self.suboptimality,
+            "max_nodes": self.max_nodes,
+            "driving": len(self.goals),
+            "waiting_for_goal": self.held,
+            "replans": self.replans,
+            "failures": self.failures,
+            "nodes": self.nodes,
+            "last_replan_ms": self.last_ms,
+            "total_replan_ms": self.total_ms,
+        }
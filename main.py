@@ -1,22 +1,23 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from routers import orders, products, bins, bots
-from db.database import Base, engine
+from routers import orders, products, bins, bots, metrics
+from db.database import Base, add_missing_columns, async_engine, engine
 from fastapi import WebSocket, WebSocketDisconnect
-from typing import List, Dict
 import asyncio
 from db.database import SessionLocal
-from models.orders import Order, OrderProduct
 from models.bots import Bot
-from models.bins import Bin
-from models.products import Product
 from ws_manager import orders_ws_manager, bots_ws_manager
-import datetime
-import threading
+from utils.grid_layout import load_grid_layout
+from fleet_scheduler import fleet_scheduler
+from bot_stream import bot_stream
+from delivery_ports import delivery_ports
+from sim_clock import sim_clock
 
 print("About to create tables")
 Base.metadata.create_all(bind=engine)
+for column in add_missing_columns(engine):
+    print(f"Added column {column}")
 print("Tables created")
 
 # Reset stuck bots on startup
@@ -37,7 +38,7 @@ def reset_stuck_bots():
         db.close()
 
 # Now that tables are created, reset bins
-from routers.orders import reset_all_bins_available
+from routers.orders import reset_all_bins_available, order_dispatcher, bin_reslotter, seed_bin_demand, run_orphan_check
 
 app = FastAPI()
 
@@ -46,14 +47,44 @@ async def startup_event():
     """Initialize application on startup"""
     print("[STARTUP] Initializing application...")
     
+    # Load the grid layout shared by all planners and routers
+    layout = load_grid_layout()
+    print(f"[STARTUP] Grid layout: {layout}")
+    delivery_ports.configure(layout, fleet_scheduler.tick_interval)
+    
     # Reset stuck bots
     reset_stuck_bots()
     
     # Reset all bins to available
     reset_all_bins_available()
     
+    # Start the fleet scheduler tick loop
+    fleet_scheduler.start()
+    
+    # Start the shared /ws/bots delta publisher
+    bot_stream.start()
+    
+    # Start the event-driven order dispatcher (also picks up orders left pending)
+    order_dispatcher.start()
+    
+    # Re-slot hot bins toward the port while the fleet is idle
+    seed_bin_demand()
+    bin_reslotter.start()
+    
+    # Start the packing timeout watchdog on the same loop as the WebSocket managers
+    app.state.watchdog_task = asyncio.get_running_loop().create_task(packing_timeout_watchdog())
+    
     print("[STARTUP] Application initialization complete")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await bin_reslotter.stop()
+    await order_dispatcher.stop()
+    await bot_stream.stop()
+    await fleet_scheduler.stop()
+    await sim_clock.stop()
+    await async_engine.dispose()
+
 # CORS middleware should be added before routers/static files
 app.add_middleware(
     CORSMiddleware,
@@ -70,6 +101,7 @@ app.include_router(orders)
 app.include_router(products)
 app.include_router(bins)
 app.include_router(bots)
+app.include_router(metrics)
 
 # --- WebSocket Event Manager ---
 
@@ -79,8 +111,10 @@ async def websocket_bots(websocket: WebSocket):
     await bots_ws_manager.connect(websocket)
     try:
         while True:
-            await asyncio.sleep(3600)  # Keep alive
+            await websocket.receive_text()  # Keep alive until the client goes away
     except WebSocketDisconnect:
+        pass
+    finally:
         bots_ws_manager.disconnect(websocket)
 
 @app.websocket("/ws/orders")
@@ -89,19 +123,14 @@ async def websocket_orders(websocket: WebSocket):
     await orders_ws_manager.connect(websocket)
     try:
         # Send an initial message right after connecting
-        await websocket.send_json({"event": "connected", "message": "WebSocket connection established"})
-        while True:
-            try:
-                await websocket.send_json({"event": "ping"})
-                await asyncio.sleep(30)
-            except RuntimeError as e:
-                if "Cannot call 'send' once a close message has been sent" in str(e):
-                    print("[DEBUG] WebSocket closed, stopping ping loop")
-                    break
-                else:
-                    raise e
-    except (WebSocketDisconnect, asyncio.CancelledError, RuntimeError) as e:
+        await orders_ws_manager.send(websocket, {"event": "connected", "message": "WebSocket connection established"})
+        # The manager drops the connection once a send fails, which ends the ping loop
+        while orders_ws_manager.is_connected(websocket):
+            await orders_ws_manager.send(websocket, {"event": "ping"})
+            await asyncio.sleep(30)
+    except (WebSocketDisconnect, asyncio.CancelledError) as e:
         print(f"[DEBUG] WebSocket /ws/orders disconnected: {type(e).__name__}")
+    finally:
         orders_ws_manager.disconnect(websocket)
 
 @app.get("/test-cors")
@@ -115,65 +144,20 @@ def read_root():
 @app.post("/admin/reset_bots")
 def admin_reset_bots():
     reset_stuck_bots()
+    order_dispatcher.wake()
     return {"status": "success", "message": "All bots reset to idle."} 
 
 async def packing_timeout_watchdog():
     while True:
-        db = SessionLocal()
-        try:
-            now = datetime.datetime.utcnow()
-            # Find orders stuck in 'packing' for more than 5 minutes
-            stuck_orders = db.query(Order).filter(Order.status == 'packing').all()
-            for order in stuck_orders:
-                # Assume order has a created_at or updated_at timestamp
-                # If not, skip this logic or add a timestamp field
-                last_update = getattr(order, 'updated_at', None) or getattr(order, 'created_at', None)
-                if not last_update:
-                    continue
-                if (now - last_update).total_seconds() > 300:
-                    # Mark order as packed
-                    order.status = 'packed'
-                    db.commit()
-                    # Find associated bot
-                    bot = db.query(Bot).filter(Bot.assigned_order_id == order.id).first()
-                    if bot:
-                        bot.status = 'idle'
-                        bot.assigned_order_id = None
-                        bot.destination_bin = None
-                        bot.path = []
-                        bot.full_path = None
-                        db.commit()
-                        # Broadcast bot update
-                        await bots_ws_manager.broadcast({
-                            'event': 'status_update',
-                            'bot_id': bot.id,
-                            'bot_status': bot.status,
-                            'assigned_order_id': bot.assigned_order_id
-                        })
-                    # Find associated bin(s)
-                    order_items = db.query(OrderProduct).filter(OrderProduct.order_id == order.id).all()
-                    for item in order_items:
-                        product = db.query(Product).filter(Product.id == item.product_id).first()
-                        if product and product.bin_id:
-                            bin_obj = db.query(Bin).filter(Bin.id == product.bin_id).first()
-                            if bin_obj and bin_obj.status == 'in-use':
-                                bin_obj.status = 'available'
-                                db.commit()
-                                # Broadcast bin update
-                                await bots_ws_manager.broadcast({
-                                    'event': 'status_update',
-                                    'bin_id': bin_obj.id,
-                                    'bin_status': bin_obj.status
-                                })
-                    # Broadcast order update
-                    await orders_ws_manager.broadcast({
-                        'event': 'status_update',
-                        'order_id': order.id,
-                        'order_status': order.status
-                    })
-        finally:
-            db.close()
-        await asyncio.sleep(60)
-
-# Start the watchdog on startup
-threading.Thread(target=lambda: asyncio.run(packing_timeout_watchdog()), daemon=True).start() 
\ No newline at end of file
+        # Runs on the scheduler's worker thread like a dispatch cycle; orders whose
+        # bot still has a mission are the mission's to finish
+        failed = await fleet_scheduler.offload(run_orphan_check, fleet_scheduler.view())
+        for order_id in failed:
+            await orders_ws_manager.broadcast({
+                'event': 'status_update',
+                'order_id': order_id,
+                'order_status': 'failed'
+            })
+        if failed:
+            order_dispatcher.wake()
+        await sim_clock.sleep(60)
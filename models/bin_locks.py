@@ -1,9 +1,10 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, ForeignKey
 from db.database import Base
+from db.types import IntegerList
 
 class BinLock(Base):
     __tablename__ = "bin_locks"
     id = Column(Integer, ForeignKey("bins.id"), primary_key=True)
     used_by = Column(Integer, ForeignKey("bots.id"))
     status = Column(String, nullable=False)
-    waiting_list = Column(JSON, default=list)  # Changed from ARRAY to JSON for SQLite compatibility 
\ No newline at end of file
+    waiting_list = Column(IntegerList, default=list)  # integer[] in PostgreSQL, JSON in SQLite 
\ No newline at end of file
@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, JSON
+from sqlalchemy import Column, Integer, String
 from db.database import Base
+from db.types import IntegerList
 
 class Bin(Base):
     __tablename__ = "bins"
@@ -10,5 +11,5 @@ class Bin(Base):
     original_x = Column(Integer, nullable=True)  # New: original grid x
     original_y = Column(Integer, nullable=True)  # New: original grid y
     original_z = Column(Integer, nullable=True)  # New: original grid z
-    product_ids = Column(JSON, default=list)  # Changed from ARRAY to JSON for SQLite compatibility
+    product_ids = Column(IntegerList, default=list)  # integer[] in PostgreSQL, JSON in SQLite
     status = Column(String, nullable=False) 
\ No newline at end of file
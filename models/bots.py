@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, JSON, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, Text
 from db.database import Base
+from db.types import JsonDocument
 
 class Bot(Base):
     __tablename__ = "bots"
@@ -9,8 +10,8 @@ class Bot(Base):
     current_location_z = Column(Integer, nullable=False, default=0)
     status = Column(String, nullable=False, default="idle")  # idle, busy, charging, moving, packing, carrying
     assigned_order_id = Column(Integer, ForeignKey("orders.id"), nullable=True)
-    destination_bin = Column(JSON, nullable=True)  # [x, y, z] coordinates (JSONB in PostgreSQL)
-    path = Column(JSON, nullable=True)  # [[x, y], [x, y], ...] path coordinates (JSONB in PostgreSQL)
+    destination_bin = Column(JsonDocument, nullable=True)  # [x, y, z] coordinates (JSONB in PostgreSQL)
+    path = Column(JsonDocument, nullable=True)  # [[x, y], [x, y], ...] path coordinates (JSONB in PostgreSQL)
     full_path = Column(Text)  # Add this line to store the full path as JSON string
     carried_bin_id = Column(Integer, ForeignKey("bins.id"), nullable=True)  # Track which bin is being carried
 
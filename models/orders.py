@@ -15,6 +15,9 @@ class OrderProduct(Base):
 class Order(Base):
     __tablename__ = "orders"
     id = Column(Integer, primary_key=True, index=True)
-    status = Column(String, default="pending")  # "pending", "packing", "packed"
+    status = Column(String, default="pending")  # "pending", "packing", "packed", "partial", "failed"
     assigned_bot_id = Column(Integer, ForeignKey("bots.id"), nullable=True)
+    # Simulated time (sim_clock.utcnow()): creation, and the last status change or bin picked
+    created_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, nullable=True)
     items = relationship("OrderProduct", backref="order", cascade="all, delete-orphan") 
\ No newline at end of file
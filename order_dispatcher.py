@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+class OrderDispatcher:
+    """Event-driven dispatch of pending orders on the asyncio loop.
+
+    The dispatcher sleeps until woken: by order creation, by a bot finishing
+    its mission, or by an admin reset. Each wake-up runs one dispatch cycle
+    (cycle() returns the number of orders started); wake-ups that arrive while
+    a cycle is running coalesce into a single follow-up cycle. Nothing runs
+    while the system is idle. Cycles query the database synchronously, so they
+    go through offload (e.g. the fleet scheduler's worker thread) if given;
+    prepare, if given, runs on the loop first and its result is passed to cycle
+    (e.g. a snapshot of the fleet state the cycle reads).
+    """
+
+    def __init__(self, cycle: Callable[..., int], offload: Optional[Callable[..., Awaitable]] = None,
+                 prepare: Optional[Callable[[], object]] = None):
+        self.cycle = cycle
+        self.offload = offload
+        self.prepare = prepare
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._woken_at: Optional[float] = None
+        self.cycles = 0
+        self.orders_started = 0
+        self.last_latency_ms = 0.0
+        self.max_latency_ms = 0.0
+
+    def wake(self, *_):
+        """Request a dispatch cycle; safe to call from any thread or as a scheduler callback."""
+        loop = self._loop
+        if loop is None:
+            return
+        try:
+            on_loop = asyncio.get_running_loop() is loop
+        except RuntimeError:
+            on_loop = False
+        if on_loop:
+            self._set()
+        else:
+            loop.call_soon_threadsafe(self._set)
+
+    def _set(self):
+        if self._woken_at is None:
+            self._woken_at = time.perf_counter()
+        self._wakeup.set()
+
+    async def run_cycle(self) -> int:
+        """Run one dispatch cycle now; returns the number of orders started."""
+        woken_at, self._woken_at = self._woken_at, None
+        args = (self.prepare(),) if self.prepare else ()
+        started = await self.offload(self.cycle, *args) if self.offload else self.cycle(*args)
+        self.cycles += 1
+        self.orders_started += started
+        if woken_at is not None:
+            self.last_latency_ms = (time.perf_counter() - woken_at) * 1000
+            self.max_latency_ms = max(self.max_latency_ms, self.last_latency_ms)
+        return started
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            try:
+                started = await self.run_cycle()
+                if started:
+                    logger.info(f"[DISPATCH] Cycle {self.cycles} started {started} orders in {self.last_latency_ms:.1f} ms")
+            except Exception as e:
+                logger.error(f"[DISPATCH] Cycle {self.cycles} failed: {e}")
+
+    def start(self):
+        """Start the dispatch task on the running loop (idempotent); runs one cycle for orders left pending."""
+        if self._task is not None and not self._task.done():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = self._loop.create_task(self._run())
+        self.wake()
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._loop = None
+
+    def metrics(self) -> dict:
+        return {
+            "cycles": self.cycles,
+            "orders_started": self.orders_started,
+            "wake_to_dispatch_ms": {"last": self.last_latency_ms, "max": self.max_latency_ms},
+        }
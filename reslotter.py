@@ -0,0 +1,100 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from sim_clock import sim_clock
+
+logger = logging.getLogger(__name__)
+
+class BinReslotter:
+    """Background re-slotting of hot bins during idle fleet time.
+
+    Every interval simulated seconds one pass runs (cycle() returns the number of
+    migrations started). The pass itself decides whether the fleet is idle,
+    i.e. no orders are pending and some bot has nothing to do, so orders
+    always take priority over re-slotting. A bin whose migration failed is
+    not planned again for retry_after passes. Like the dispatcher, passes go
+    through offload and get prepare()'s result if given; with launch, cycle()
+    only plans and launch(plan), back on the event loop, starts the
+    migrations and returns how many.
+    """
+
+    def __init__(self, cycle: Callable[..., object], interval: float = 5.0, retry_after: int = 12,
+                 offload: Optional[Callable[..., Awaitable]] = None, prepare: Optional[Callable[[], object]] = None,
+                 launch: Optional[Callable[[object], int]] = None):
+        self.cycle = cycle
+        self.offload = offload
+        self.prepare = prepare
+        self.launch = launch
+        self.interval = interval
+        self.retry_after = retry_after
+        self._failed: Dict[int, int] = {}  # bin_id -> pass of the failed migration
+        self.migrating: Dict[int, Tuple[int, int]] = {}  # bin_id -> source column of a running migration
+        self._task: Optional[asyncio.Task] = None
+        self.passes = 0
+        self.migrations_started = 0
+        self.migrations_completed = 0
+        self.rehandles = 0
+
+    def start_migration(self, bin_id: int, source: Tuple[int, int]):
+        """Called when a migration mission is handed to a bot."""
+        self.migrating[bin_id] = source
+
+    def record_migration(self, bin_id: int, completed: bool, rehandles: int = 0):
+        """Called by a migration mission when it ends."""
+        self.migrating.pop(bin_id, None)
+        self.migrations_completed += int(completed)
+        self.rehandles += rehandles
+        if completed:
+            self._failed.pop(bin_id, None)
+        else:
+            self._failed[bin_id] = self.passes
+
+    def cooling_down(self) -> Set[int]:
+        """Bins whose last migration failed too recently to plan again."""
+        self._failed = {b: p for b, p in self._failed.items() if self.passes - p < self.retry_after}
+        return set(self._failed)
+
+    async def run_pass(self) -> int:
+        args = (self.prepare(),) if self.prepare else ()
+        result = await self.offload(self.cycle, *args) if self.offload else self.cycle(*args)
+        started = self.launch(result) if self.launch else result
+        self.passes += 1
+        self.migrations_started += started
+        return started
+
+    async def _run(self):
+        while True:
+            await sim_clock.sleep(self.interval)
+            try:
+                started = await self.run_pass()
+                if started:
+                    logger.info(f"[RESLOT] Pass {self.passes} started {started} bin migrations")
+            except Exception as e:
+                logger.error(f"[RESLOT] Pass {self.passes} failed: {e}")
+
+    def start(self):
+        """Start the re-slotting task on the running loop (idempotent)."""
+        if self._task is not None and not self._task.done():
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def metrics(self) -> dict:
+        return {
+            "interval_s": self.interval,
+            "passes": self.passes,
+            "migrations_started": self.migrations_started,
+            "migrations_completed": self.migrations_completed,
+            "migrating": len(self.migrating),
+            "cooling_down": len(self._failed),
+            "dig_out_rehandles": self.rehandles,
+        }
@@ -1,4 +1,5 @@
 from .orders import router as orders
 from .products import router as products
 from .bins import router as bins
-from .bots import router as bots 
\ No newline at end of file
+from .bots import router as bots
+from .metrics import router as metrics
@@ -1,68 +1,30 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
-from sqlalchemy.orm import Session
-from db.database import SessionLocal
-from models.bots import Bot
-from models.orders import Order
-import asyncio
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Request
 import json
+from snapshot_cache import snapshot_cache
+from bot_stream import bot_stream
 
 router = APIRouter()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.get("/bots")
-def get_bots(db: Session = Depends(get_db)):
-    bots = db.query(Bot).all()
-    result = []
-    for bot in bots:
-        # Only allow valid statuses
-        valid_statuses = ["idle", "packing", "moving", "carrying", "delivering", "returning"]
-        status = bot.status if bot.status in valid_statuses else "idle"
-        result.append({
-            "id": bot.id,
-            "status": status,
-            "x": bot.x,
-            "y": bot.y,
-            "z": bot.current_location_z,
-            "assigned_order_id": bot.assigned_order_id,
-            "destination_bin": bot.destination_bin,
-            "path": bot.path or [],
-            "full_path": json.loads(bot.full_path) if bot.full_path else []
-        })
-    return result
+def get_bots(request: Request):
+    # Served from the snapshot cache; unchanged polls get 304 Not Modified
+    return snapshot_cache.respond(request, "bot_status")
 
 @router.websocket("/ws/bots")
 async def ws_bots(websocket: WebSocket):
-    await websocket.accept()
-    db = SessionLocal()
+    # Full snapshot first, then per-tick deltas from the shared publisher
+    await bot_stream.subscribe(websocket)
     try:
         while True:
-            bots = db.query(Bot).all()
-            result = []
-            for bot in bots:
-                # Only allow valid statuses
-                valid_statuses = ["idle", "packing", "moving", "carrying", "delivering", "returning"]
-                status = bot.status if bot.status in valid_statuses else "idle"
-                result.append({
-                    "id": bot.id,
-                    "status": status,
-                    "x": bot.x,
-                    "y": bot.y,
-                    "z": bot.current_location_z,
-                    "assigned_order_id": bot.assigned_order_id,
-                    "destination_bin": bot.destination_bin,
-                    "path": bot.path or [],
-                    "full_path": json.loads(bot.full_path) if bot.full_path else []
-                })
-            # Send with event type for frontend compatibility
-            await websocket.send_json({"event": "bots_update", "bots": result})
-            await asyncio.sleep(0.5)  # SLOWER: 0.5 seconds for less frequent updates
+            message = await websocket.receive_text()
+            try:
+                action = json.loads(message).get("action")
+            except (ValueError, AttributeError):
+                continue
+            if action == "resync":
+                # Client detected a sequence gap
+                await bot_stream.send_snapshot(websocket)
     except WebSocketDisconnect:
         print("WebSocket /ws/bots disconnected")
     finally:
-        db.close() 
\ No newline at end of file
+        bot_stream.unsubscribe(websocket)
@@ -0,0 +1,70 @@
+from fastapi import APIRouter
+from fleet_scheduler import fleet_scheduler
+from snapshot_cache import snapshot_cache
+from bot_stream import bot_stream
+from ws_manager import bots_ws_manager, orders_ws_manager
+from routers.orders import order_dispatcher, bin_reslotter
+from utils.stacks import retrieval_stats
+from delivery_ports import delivery_ports
+from utils.heuristics import heuristic_cache
+from utils.path_cache import path_cache
+from db.database import database_status
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+@router.get("/scheduler")
+def scheduler_metrics():
+    """Fleet scheduler tick counter, active missions and per-tick latency."""
+    return fleet_scheduler.metrics()
+
+@router.get("/snapshots")
+def snapshot_metrics():
+    """Snapshot cache versions, full responses served and 304s."""
+    return snapshot_cache.status()
+
+@router.get("/bot-stream")
+def bot_stream_metrics():
+    """/ws/bots publisher sequence number, subscribers and messages sent."""
+    return bot_stream.metrics()
+
+@router.get("/websockets")
+def websocket_metrics():
+    """Per-manager connections, queued/sent/dropped/coalesced messages and dead sockets removed."""
+    return {
+        "bots": bots_ws_manager.metrics(),
+        "orders": orders_ws_manager.metrics(),
+        "bot_stream": bot_stream.manager.metrics(),
+    }
+
+@router.get("/dispatch")
+def dispatch_metrics():
+    """Order dispatcher cycles, orders started and wake-to-dispatch latency."""
+    return order_dispatcher.metrics()
+
+@router.get("/retrieval")
+def retrieval_metrics():
+    """Bins retrieved and dig-out rehandles, in total, per order and for recent orders."""
+    return retrieval_stats.status()
+
+@router.get("/reslotting")
+def reslotting_metrics():
+    """Re-slotting passes, bin migrations started and completed, and their dig-out rehandles."""
+    return bin_reslotter.metrics()
+
+@router.get("/ports")
+def port_metrics():
+    """Per delivery port: queue length (now, max, time-weighted mean), orders routed, bins served, throughput and waits."""
+    return delivery_ports.metrics(fleet_scheduler.now)
+
+@router.get("/paths")
+def path_metrics():
+    """Path cache hit rate, clean vs repaired plans and estimated time saved, plus the heuristic table cache."""
+    return {
+        "path_cache": path_cache.status(),
+        "heuristic_cache": heuristic_cache.status(),
+    }
+
+@router.get("/database")
+def database_metrics():
+    """SQLite storage profile, its pragmas as the database reports them, and connection pool checkouts."""
+    return database_status()
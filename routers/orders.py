@@ -2,36 +2,39 @@
 # Features: order creation, bot assignment, bin locking, real-time movement, WebSocket updates, robust error handling
 
 import logging
-from fastapi import APIRouter, Depends, BackgroundTasks, HTTPException, WebSocket, WebSocketDisconnect
-from sqlalchemy.orm import Session
-from db.database import SessionLocal
+from fastapi import APIRouter, Depends, BackgroundTasks, Request, WebSocket, WebSocketDisconnect
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from db.database import SessionLocal, get_async_db
 from models.orders import Order, OrderProduct
 from models.products import Product
 from models.bots import Bot
 from models.bins import Bin
-from db.database import Base
 from typing import List
-import time
-import random
-from utils.astar import whca_star, create_varied_path, update_bot_reservations, get_reservation_table_status
+from utils.astar import cached_whca_star, create_varied_path, whca_star_varied, reservation_table
+from utils.grid_layout import get_grid_layout
+from utils.pick_sequence import plan_picks
+from utils.assignment import assign
+from utils.stacks import plan_dig_out, relocation_target, retrieval_stats
+from utils.reslotting import bin_demand, plan_migrations, plan_return
 from pydantic import BaseModel
 import json
+import os
 from ws_manager import bots_ws_manager, orders_ws_manager
+from fleet_scheduler import fleet_scheduler
+from order_dispatcher import OrderDispatcher
+from reslotter import BinReslotter
+from delivery_ports import delivery_ports
+from snapshot_cache import snapshot_cache
+from sim_clock import sim_clock
 import asyncio
-import datetime
-import threading
+from collections import deque
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s %(levelname)s %(message)s')
 logger = logging.getLogger(__name__)
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 router = APIRouter()
 
 class OrderItemIn(BaseModel):
@@ -41,61 +44,9 @@ class OrderItemIn(BaseModel):
 class OrderCreate(BaseModel):
     items: List[OrderItemIn]
 
-def assign_bot_to_order(order_id: int, db: Session):
-    order = db.query(Order).filter(Order.id == order_id).first()
-    if not order or order.assigned_bot_id:
-        return
-    
-    # Get the first product to find the bin
-    first_item = db.query(OrderProduct).filter(OrderProduct.order_id == order_id).first()
-    if not first_item:
-        return
-    
-    product = db.query(Product).filter(Product.id == first_item.product_id).first()
-    if not product:
-        return
-    
-    bin_obj = db.query(Bin).filter(Bin.id == product.bin_id).first()
-    if not bin_obj:
-        return
-    
-    # Find the nearest idle bot (only assign to idle bots)
-    idle_bot = find_nearest_idle_bot(db, bin_obj.x, bin_obj.y)
-    if idle_bot and idle_bot.status == "idle":
-        order.assigned_bot_id = idle_bot.id
-        order.status = "packing"
-        db.commit()
-        logger.debug(f"[DEBUG] Assigned bot {idle_bot.id} to order {order_id}")
-    else:
-        logger.debug(f"[DEBUG] No idle bots available for order {order_id}")
-
-def assign_pending_orders_periodically(db: Session, interval: int = 2):
-    """Periodically assign pending orders to available bots"""
-    try:
-        packing_orders = db.query(Order).filter(Order.status == "packing", Order.assigned_bot_id == None).all()
-        for order in packing_orders:
-            available_bot = db.query(Bot).filter(Bot.status == "idle").first()
-            if available_bot:
-                assign_bot_to_order(order.id, db)
-                logger.debug(f"[DEBUG] Assigned bot {available_bot.id} to order {order.id}")
-    except Exception as e:
-        logger.warning(f"[WARNING] Could not assign pending orders (tables may not exist yet): {e}")
-    finally:
-        db.close()
-
-# Start the background thread when the module is loaded
-# Commented out to prevent running before tables are created
-# threading.Thread(target=lambda: assign_pending_orders_periodically(SessionLocal()), daemon=True).start()
-
-def is_cell_blocked(x, y, bots, bins, ignore_bot_id=None):
-    # Returns True if cell is occupied by another bot or a bin
-    for bot in bots:
-        if bot.id != ignore_bot_id and bot.x == x and bot.y == y:
-            return True
-    for bin in bins:
-        if hasattr(bin, 'x') and hasattr(bin, 'y') and bin.x == x and bin.y == y:
-            return True
-    return False
+def is_cell_blocked(x, y, occupancy, ignore_bot_id=None):
+    # Returns True if cell is occupied by another bot or a bin left on top of the grid
+    return occupancy.is_blocked(x, y, ignore_bot_id)
 
 # Helper: Lock a bin (returns True if locked, False if already locked)
 def lock_bin(db, bin_id, bot_id):
@@ -106,7 +57,7 @@ def lock_bin(db, bin_id, bot_id):
         db.add(bin_lock)
         db.commit()
         return True
-    if bin_lock.status == "Available":
+    if bin_lock.status.lower() == "available" or bin_lock.used_by == bot_id:  # released locks are written as "available"
         bin_lock.status = "Locked"
         bin_lock.used_by = bot_id
         db.commit()
@@ -117,48 +68,277 @@ def lock_bin(db, bin_id, bot_id):
         db.commit()
     return False
 
-# Helper: Find nearest idle bot (simple Euclidean distance for now)
-def find_nearest_idle_bot(db, bin_x, bin_y):
-    bots = db.query(Bot).filter(Bot.status == "idle").all()
-    if not bots:
+def release_bin_locks(db, bot_id, bin_ids=None):
+    """Release the bin locks bot_id holds (only those of bin_ids if given); other bots' locks are left alone.
+
+    Bins still marked "locked" by the order are made available again.
+    """
+    from models.bin_locks import BinLock
+    query = db.query(BinLock).filter(BinLock.used_by == bot_id)
+    if bin_ids is not None:
+        query = query.filter(BinLock.id.in_(bin_ids))
+    for bin_lock in query.all():
+        bin_lock.status = "available"
+        bin_lock.used_by = None
+        bin_obj = db.get(Bin, bin_lock.id)
+        if bin_obj is not None and bin_obj.status == "locked":
+            bin_obj.status = "available"
+
+def order_bins(db, order_id):
+    """Distinct bins holding an order's products, in order line order."""
+    bins = {}
+    for item in db.query(OrderProduct).filter(OrderProduct.order_id == order_id).all():
+        product = db.query(Product).filter(Product.id == item.product_id).first()
+        bin_obj = db.query(Bin).filter(Bin.id == product.bin_id).first() if product and product.bin_id else None
+        if bin_obj:
+            bins.setdefault(bin_obj.id, bin_obj)
+    return list(bins.values())
+
+def order_bin_cells(db, order_id):
+    """Distinct (x, y) cells of the bins holding an order's products."""
+    return list(dict.fromkeys((bin_obj.x, bin_obj.y) for bin_obj in order_bins(db, order_id)))
+
+def start_order(db, order, bot, fleet):
+    """Lock every bin of the order, assign the bot and hand the order to the fleet scheduler.
+
+    Returns the order's first bin, or None if a bin could not be locked (the
+    order stays pending and the locks already taken for it are released).
+    """
+    bins = order_bins(db, order.id)
+    if not bins:
+        logger.error(f"ERROR: No bin found for order {order.id}")
         return None
-    # Find nearest by distance
-    nearest = min(bots, key=lambda b: (b.x - bin_x) ** 2 + (b.y - bin_y) ** 2)
-    return nearest
 
-def assign_pending_orders_loop():
-    from db.database import SessionLocal
-    while True:
-        db = SessionLocal()
-        try:
-            pending_orders = db.query(Order).filter(Order.status == "pending").all()
-            for order in pending_orders:
-                # Try to assign a bot
-                assign_bot_to_order(order.id, db)
-        except Exception as e:
-            logger.error(f"[AUTO-ASSIGN] Error: {e}")
-        finally:
-            db.close()
-        time.sleep(2)  # Check every 2 seconds
+    for bin_obj in bins:
+        if not lock_bin(db, bin_obj.id, bot.id):
+            logger.error(f"ERROR: Bin {bin_obj.id} could not be locked for order {order.id}")
+            release_bin_locks(db, bot.id, [b.id for b in bins])
+            db.commit()
+            return None
 
-from fastapi import FastAPI
-from fastapi import APIRouter
+    # Standardize bin status
+    for bin_obj in bins:
+        bin_obj.status = "locked"
+        fleet.broadcast(bots_ws_manager, {
+            "event": "status_update",
+            "bin_id": bin_obj.id,
+            "bin_status": "locked"
+        })
+    db.commit()
+    bin_obj = bins[0]
 
-router = APIRouter()
+    # The bot starts from wherever it stands; the mission drives it from there
+    bot.status = 'packing'
+    bot.assigned_order_id = order.id
+    bot.destination_bin = [bin_obj.x, bin_obj.y, getattr(bin_obj, 'z_location', 0), bin_obj.id]
+    bot.path = []
+    bot.full_path = None
+    order.assigned_bot_id = bot.id
+    order.status = 'packing'
+    order.updated_at = sim_clock.utcnow()
+    db.commit()
+    db.refresh(bot)
+    db.refresh(order)
+
+    # After assigning the bot and committing changes, hand the order to the fleet scheduler
+    fleet.submit(bot.id, process_order_enhanced(order.id, fleet))
+    logger.info(f"Started order processing for order {order.id} with bot {bot.id}")
+    return bin_obj
+
+def dispatch_pending_orders(db, fleet, view, batch_factor: int = 2):
+    """One dispatch cycle: assign idle bots to the oldest pending orders in a single batch.
+
+    Builds a bots x orders cost matrix of true grid distances (bot to the
+    order's nearest bin) and solves it with the Hungarian algorithm, so the
+    fleet as a whole travels least instead of each order grabbing the closest
+    bot in turn. At most batch_factor orders per idle bot are considered, oldest
+    first, so far-away orders are not starved. Fleet state is read from view
+    (fleet.view(), taken on the event loop); fleet is only handed missions.
+    An order whose bins cannot all be locked is dropped for this cycle and the
+    bots left idle are matched again against the remaining orders.
+    Returns the (order, bot) pairs started.
+    """
+    # Bots the scheduler is still driving are not free yet, whatever their row says
+    idle_bots = [bot for bot in db.query(Bot).filter(Bot.status == "idle").order_by(Bot.id).all()
+                 if bot.id not in view.missions]
+    if not idle_bots:
+        return []
+    pending = (db.query(Order)
+               .filter(Order.status == "pending", Order.assigned_bot_id == None)
+               .order_by(Order.id)
+               .limit(batch_factor * len(idle_bots))
+               .all())
+    orders, order_cells = [], []
+    for order in pending:
+        cells = order_bin_cells(db, order.id)
+        if cells:
+            orders.append(order)
+            order_cells.append(cells)
+    if not orders:
+        return []
+
+    # Live positions from the scheduler's occupancy index; the database may lag behind
+    occupancy = view.occupancy
+    bot_cells = [occupancy.bot_cells.get(bot.id, (bot.x, bot.y)) if occupancy else (bot.x, bot.y)
+                 for bot in idle_bots]
+    layout = get_grid_layout()
+    started = []
+    free_bots, open_orders = list(range(len(idle_bots))), list(range(len(orders)))
+    while free_bots and open_orders:
+        dropped = False
+        pairs = assign([bot_cells[i] for i in free_bots], [order_cells[j] for j in open_orders], layout)
+        for i, j, cost in pairs:
+            i, j = free_bots[i], open_orders[j]
+            bot, order = idle_bots[i], orders[j]
+            logger.info(f"[DISPATCH] Bot {bot.id} at {bot_cells[i]} -> order {order.id} (distance {cost:.0f})")
+            if start_order(db, order, bot, fleet):
+                started.append((order, bot))
+                free_bots.remove(i)
+            else:
+                dropped = True
+            open_orders.remove(j)
+        if not dropped:
+            break
+    return started
+
+def run_dispatch_cycle(view):
+    """One dispatch cycle in its own session; returns the number of orders started."""
+    db = SessionLocal()
+    try:
+        return len(dispatch_pending_orders(db, fleet_scheduler, view))
+    finally:
+        db.close()
+
+# Packing orders whose bot runs no mission are failed after this long without progress
+ORPHAN_TIMEOUT_SECONDS = 300.0
+
+def fail_orphaned_orders(db, view, timeout_seconds: float = ORPHAN_TIMEOUT_SECONDS):
+    """Fail "packing" orders that no mission is working on any more.
+
+    An order whose bot still has a mission is left alone: the mission owns the
+    order, its bins and its bot, and ends the order itself. An orphaned order
+    (its mission crashed, or the server restarted mid-order) that made no
+    progress for timeout_seconds is marked "failed", its bin locks released
+    and its bot made idle. Missions are read from view (fleet.view(), taken on
+    the event loop). Returns the ids of the orders failed.
+    """
+    now = sim_clock.utcnow()
+    failed = []
+    for order in db.query(Order).filter(Order.status == "packing").all():
+        if order.assigned_bot_id in view.missions:
+            continue
+        last_update = order.updated_at or order.created_at
+        if last_update is None or (now - last_update).total_seconds() <= timeout_seconds:
+            continue
+        logger.warning(f"[WATCHDOG] Order {order.id} has had no mission for {timeout_seconds}s, failing it")
+        order.status = "failed"
+        order.updated_at = now
+        bot = db.get(Bot, order.assigned_bot_id) if order.assigned_bot_id else None
+        if bot is not None:
+            release_bin_locks(db, bot.id, [bin_obj.id for bin_obj in order_bins(db, order.id)])
+            if bot.assigned_order_id == order.id:
+                bot.status = "idle"
+                bot.assigned_order_id = None
+                bot.destination_bin = None
+                bot.path = []
+                bot.full_path = None
+        failed.append(order.id)
+    db.commit()
+    return failed
+
+def run_orphan_check(view):
+    """fail_orphaned_orders in its own session."""
+    db = SessionLocal()
+    try:
+        return fail_orphaned_orders(db, view)
+    finally:
+        db.close()
+
+# Woken by order creation and whenever a bot finishes its mission
+order_dispatcher = OrderDispatcher(run_dispatch_cycle, offload=fleet_scheduler.offload, prepare=fleet_scheduler.view)
+fleet_scheduler.idle_listeners.append(order_dispatcher.wake)
+fleet_scheduler.idle_listeners.append(delivery_ports.release_bot)
+
+def reslot_view():
+    """Fleet view for a re-slotting pass, with the mission state the pass reads; taken on the event loop."""
+    return fleet_scheduler.view(
+        demand=bin_demand.scores(sim_clock.now()),
+        cooling_down=bin_reslotter.cooling_down(),
+        columns_in_use=set(dig_sites.values()) | set(bin_reslotter.migrating.values()),
+    )
+
+def reslot_idle_bots(db, view):
+    """One re-slotting pass: while no order is pending, pick idle bots to move hot bins nearer the port.
+
+    Bins of orders still pending or packing, bins not available, bins in a
+    column being dug out or that a running migration will dig, and bins whose
+    last migration failed are left alone. Fleet state is read from view
+    (reslot_view()). The chosen bots are marked busy; returns the
+    (migration, bot id) pairs for launch_migrations to start on the loop.
+    """
+    if db.query(Order).filter(Order.status == "pending").first():
+        return []
+    bots = [b for b in db.query(Bot).filter(Bot.status == "idle").all() if b.id not in view.missions]
+    if not bots:
+        return []
+    busy = {bin_id for (bin_id,) in db.query(Product.bin_id)
+            .join(OrderProduct, OrderProduct.product_id == Product.id)
+            .join(Order, Order.id == OrderProduct.order_id)
+            .filter(Order.status.in_(["pending", "packing"]))}
+    busy.update(bin_id for (bin_id,) in db.query(Bin.id).filter(Bin.status != "available"))
+    busy.update(view.cooling_down)
+    for cell in view.columns_in_use:
+        busy.update(view.occupancy.stacks.get(cell, []))
+    layout = get_grid_layout()
+    migrations = plan_migrations(view.occupancy, view.demand, layout.delivery_station,
+                                 max_moves=len(bots), exclude=busy)
+    bot_cells = [view.occupancy.bot_cells.get(b.id, (b.x, b.y)) for b in bots]
+    planned = []
+    for i, j, _ in assign(bot_cells, [[m.source] for m in migrations], layout):
+        bot, migration = bots[i], migrations[j]
+        bot.status = "moving"
+        planned.append((migration, bot.id))
+    db.commit()
+    return planned
+
+def run_reslot_cycle(view):
+    """One re-slotting pass in its own session; returns the planned (migration, bot id) pairs."""
+    db = SessionLocal()
+    try:
+        return reslot_idle_bots(db, view)
+    finally:
+        db.close()
 
-@router.on_event("startup")
-def start_assign_pending_orders_loop():
-    t = threading.Thread(target=assign_pending_orders_loop, daemon=True)
-    t.start()
+def launch_migrations(planned):
+    """Start the migrations a re-slotting pass planned; runs on the event loop. Returns how many."""
+    for migration, bot_id in planned:
+        bin_reslotter.start_migration(migration.bin_id, migration.source)
+        fleet_scheduler.submit(bot_id, reslot_bin(bot_id, migration, fleet_scheduler))
+        logger.info(f"[RESLOT] Bot {bot_id} assigned {migration}")
+    return len(planned)
+
+# Moves hot bins toward the port while the fleet has nothing else to do
+bin_reslotter = BinReslotter(run_reslot_cycle, interval=float(os.environ.get("AUTOSTORE_RESLOT_SECONDS", "5.0")),
+                             offload=fleet_scheduler.offload, prepare=reslot_view, launch=launch_migrations)
+
+def seed_bin_demand():
+    """Seed the bin demand model from each bin's summed Product.sale_count."""
+    db = SessionLocal()
+    try:
+        counts = db.query(Product.bin_id, func.sum(Product.sale_count)).group_by(Product.bin_id).all()
+        bin_demand.seed(counts, sim_clock.now())
+        logger.info(f"[RESLOT] Seeded demand for {len(bin_demand.scores(sim_clock.now()))} bins")
+    finally:
+        db.close()
 
 @router.post("/orders/")
-async def create_order(order_data: OrderCreate, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+async def create_order(order_data: OrderCreate, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_async_db)):
     try:
         logger.info("STEP 1: Creating order")
-        order = Order(status="pending")
+        now = sim_clock.utcnow()
+        order = Order(status="pending", created_at=now, updated_at=now)
         db.add(order)
-        db.commit()
-        db.refresh(order)
+        await db.commit()
         # Broadcast status update immediately
         try:
             loop = asyncio.get_event_loop()
@@ -175,110 +355,32 @@ async def create_order(order_data: OrderCreate, background_tasks: BackgroundTask
         items = []
         for item in order_data.items:
             logger.info(f"STEP 3: Adding item {item.product_id}")
-            product = db.query(Product).filter(Product.id == item.product_id).first()
+            product = await db.get(Product, item.product_id)
             if not product:
                 logger.error(f"ERROR: Product {item.product_id} not found")
                 continue
             order_item = OrderProduct(order_id=order.id, product_id=product.id, quantity=item.quantity)
             db.add(order_item)
+            product.sale_count = (product.sale_count or 0) + item.quantity
+            if product.bin_id:
+                bin_demand.record(product.bin_id, item.quantity, sim_clock.now())
             items.append({"product_id": product.id, "name": product.name, "quantity": item.quantity})
-        db.commit()
-        db.refresh(order)
+        await db.commit()
         logger.info("STEP 4: Order items added")
 
-        first_item = db.query(OrderProduct).filter(OrderProduct.order_id == order.id).first()
-        if not first_item:
-            logger.error("ERROR: No order items found")
-            return {
-                "order_id": order.id,
-                "status": order.status,
-                "assigned_bot_id": None,
-                "items": items
-            }
-        product = db.query(Product).filter(Product.id == first_item.product_id).first()
-        if not product or not product.bin_id:
-            logger.error("ERROR: Product or bin_id missing")
-            return {
-                "order_id": order.id,
-                "status": order.status,
-                "assigned_bot_id": None,
-                "items": items
-            }
-        bin_obj = db.query(Bin).filter(Bin.id == product.bin_id).first()
-        if not bin_obj:
-            logger.error("ERROR: Bin not found")
-            return {
-                "order_id": order.id,
-                "status": order.status,
-                "assigned_bot_id": None,
-                "items": items
-            }
-        logger.info(f"STEP 5: Bin found: {bin_obj.id}")
-
-        bot = find_nearest_idle_bot(db, bin_obj.x, bin_obj.y)
-        if not bot:
-            logger.info("No idle bot found, order remains pending.")
-            return {
-                "order_id": order.id,
-                "status": order.status,
-                "assigned_bot_id": None,
-                "items": items
-            }
-        logger.info(f"STEP 6: Bot found: {bot.id}")
-
-        locked = lock_bin(db, bin_obj.id, bot.id)
-        if not locked:
-            logger.error("ERROR: Bin could not be locked")
-            return {
-                "order_id": order.id,
-                "status": order.status,
-                "assigned_bot_id": None,
-                "items": items
-            }
-        logger.info("STEP 7: Bin locked")
-
-        # Standardize bin status
-        bin_obj.status = "locked"
-        db.commit()
-        await bots_ws_manager.broadcast({
-            "event": "status_update",
-            "bin_id": bin_obj.id,
-            "bin_status": "locked"
-        })
-
-        # Set bot to parking station
-        if bot.id == 1:
-            bot.x, bot.y = 5, 5  # Parking 1
-            bot.current_location_z = 5
-        elif bot.id == 2:
-            bot.x, bot.y = 5, 4  # Parking 2
-            bot.current_location_z = 4
+        # Run a dispatch cycle right away so the new order is assigned if a bot is free
+        started = await order_dispatcher.run_cycle()
+        await db.refresh(order)
+        if order.assigned_bot_id:
+            logger.info(f"STEP 5: Bot {order.assigned_bot_id} assigned and order updated (status={order.status})")
         else:
-            bot.x, bot.y = 5, (bot.id % 5)  # Spread additional bots
-            bot.current_location_z = 0
-        bot.status = 'packing'
-        bot.assigned_order_id = order.id
-        bot.destination_bin = [bin_obj.x, bin_obj.y, getattr(bin_obj, 'z_location', 0), bin_obj.id]
-        bot.path = []
-        bot.full_path = None
-        order.assigned_bot_id = bot.id
-        order.status = 'packing'
-        db.commit()
-        db.refresh(bot)
-        db.refresh(order)
-        logger.info("STEP 8: Bot assigned and order updated (status=packing)")
-        response = {
+            logger.info(f"No idle bot assigned ({started} other orders started), order remains pending.")
+        return {
             "order_id": order.id,
             "status": order.status,
-            "assigned_bot_id": bot.id if bot else None,
+            "assigned_bot_id": order.assigned_bot_id,
             "items": items
         }
-        # After assigning the bot and committing changes:
-        if bot and order.assigned_bot_id:
-            import asyncio
-            asyncio.create_task(process_order_enhanced(order.id))
-            logger.info(f"Started order processing for order {order.id} with bot {bot.id}")
-        return response
     except Exception as e:
         logger.error(f"ERROR in create_order: {e}")
         return {"error": str(e)}
@@ -295,10 +397,12 @@ async def simulate_bot_order(order_id: int, bot_id: int, bin_id: int):
         bot = db.query(Bot).filter(Bot.id == bot_id).first()
         bin_obj = db.query(Bin).filter(Bin.id == bin_id).first()
 
+        layout = get_grid_layout()
+
         # 1. Move from parking to bin (stepwise)
         start_pos = (bot.x, bot.y)
         bin_pos = (bin_obj.x, bin_obj.y)
-        path_to_bin = create_varied_path(start_pos, bin_pos, (6, 6), bot.id, int(time.time()))
+        path_to_bin = create_varied_path(start_pos, bin_pos, layout, bot.id, fleet_scheduler.now)
         logger.info(f"[PATH] Bot {bot.id} path to bin: {path_to_bin}")
         if path_to_bin:
             for idx, (x, y) in enumerate(path_to_bin):
@@ -314,7 +418,7 @@ async def simulate_bot_order(order_id: int, bot_id: int, bin_id: int):
                     "z": bot.current_location_z,
                     "status": "moving_to_bin"
                 })
-                await asyncio.sleep(0.1)
+                await sim_clock.sleep(0.1)
 
         # 2. Pick up bin
         if bot.x == bin_obj.x and bot.y == bin_obj.y:
@@ -329,13 +433,13 @@ async def simulate_bot_order(order_id: int, bot_id: int, bin_id: int):
                 "bin_id": bin_obj.id,
                 "bin_status": "in_transit"
             })
-            await asyncio.sleep(0.1)
+            await sim_clock.sleep(0.1)
         else:
             logger.warning(f"Bot {bot.id} not at bin {bin_obj.id} position for pickup! Bot at ({bot.x}, {bot.y}), bin at ({bin_obj.x}, {bin_obj.y})")
 
         # 3. Move to delivery station (stepwise)
-        delivery_pos = (5, 0)
-        path_to_delivery = create_varied_path(bin_pos, delivery_pos, (6, 6), bot.id, int(time.time()))
+        delivery_pos = delivery_ports.best_port([bin_pos], layout)
+        path_to_delivery = create_varied_path(bin_pos, delivery_pos, layout, bot.id, fleet_scheduler.now)
         logger.info(f"[PATH] Bot {bot.id} path to delivery: {path_to_delivery}")
         if path_to_delivery:
             for idx, (x, y) in enumerate(path_to_delivery):
@@ -351,7 +455,7 @@ async def simulate_bot_order(order_id: int, bot_id: int, bin_id: int):
                     "z": bot.current_location_z,
                     "status": "delivering"
                 })
-                await asyncio.sleep(0.1)
+                await sim_clock.sleep(0.1)
 
         # 4. Drop bin at delivery
         bot.carried_bin_id = None
@@ -363,11 +467,11 @@ async def simulate_bot_order(order_id: int, bot_id: int, bin_id: int):
             "bin_id": bin_obj.id,
             "bin_status": "delivered"
         })
-        await asyncio.sleep(0.1)
+        await sim_clock.sleep(0.1)
 
         # 5. Return to parking (stepwise)
-        parking_pos = (5, 5) if bot.id == 1 else (5, 4)
-        path_to_parking = create_varied_path(delivery_pos, parking_pos, (6, 6), bot.id, int(time.time()))
+        parking_pos = layout.parking_for(bot.id)[:2]
+        path_to_parking = create_varied_path(delivery_pos, parking_pos, layout, bot.id, fleet_scheduler.now)
         logger.info(f"[PATH] Bot {bot.id} path to parking: {path_to_parking}")
         if path_to_parking:
             for idx, (x, y) in enumerate(path_to_parking):
@@ -383,7 +487,7 @@ async def simulate_bot_order(order_id: int, bot_id: int, bin_id: int):
                     "z": bot.current_location_z,
                     "status": "returning"
                 })
-                await asyncio.sleep(0.1)
+                await sim_clock.sleep(0.1)
 
         # 6. Set bot to idle
         bot.status = "idle"
@@ -397,13 +501,8 @@ async def simulate_bot_order(order_id: int, bot_id: int, bin_id: int):
     finally:
         db.close()
 
-async def broadcast_bot_status(bot):
-    try:
-        loop = asyncio.get_event_loop()
-    except RuntimeError:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-    await bots_ws_manager.broadcast({
+def queue_bot_status(fleet, bot):
+    fleet.broadcast(bots_ws_manager, {
         "event": "status_update", 
         "bot_id": bot.id, 
         "bot_status": bot.status, 
@@ -411,602 +510,650 @@ async def broadcast_bot_status(bot):
         "carried_bin_id": bot.carried_bin_id
     })
 
-# Enhanced order processing with async movement and WebSocket updates
-async def process_order_enhanced(order_id: int):
+def queue_order_status(fleet, order):
+    fleet.broadcast(orders_ws_manager, {
+        "event": "status_update",
+        "order_id": order.id,
+        "order_status": order.status
+    })
+
+# Seconds a bot may make no progress towards its goal before drive() gives up
+DRIVE_STALL_SECONDS = 10.0
+# Seconds a bot may be held at a gate (a port queue) before drive() gives up
+GATE_WAIT_SECONDS = 30.0
+# Tries a bot carrying a bin gets at its port before it fails over to another port
+# or, with none left, puts the bin back with its lines unpicked
+PORT_ATTEMPTS = 3
+
+# Columns bots are digging out, {bot_id: (x, y)}: no other bin may be set on them meanwhile
+dig_sites = {}
+
+def other_bot_cells(fleet, bot):
+    """Cells other bots stand on or are digging out, which a bin cannot be set down on."""
+    cells = [cell for bot_id, cell in fleet.occupancy.bot_cells.items() if bot_id != bot.id]
+    return cells + [cell for bot_id, cell in dig_sites.items() if bot_id != bot.id]
+
+def nearest_free_cell(start, excluded, layout):
+    """Closest cell to start (in moves) that is not in excluded, or None."""
+    seen = {start}
+    queue = deque([start])
+    while queue:
+        cell = queue.popleft()
+        if cell not in excluded:
+            return cell
+        for neighbor in layout.neighbors(*cell):
+            if neighbor not in seen:
+                seen.add(neighbor)
+                queue.append(neighbor)
+    return None
+
+def clear_idle_bot(fleet, cell, bot, layout):
+    """Move an idle bot standing on cell out of bot's way; True if it was sent off.
+
+    Parking spots are storage columns like any other, so a parked bot can sit
+    on a column another mission has to reach. It gets a make_way mission to
+    the nearest cell that is free, not a port and not being dug out.
+    """
+    occupant = fleet.occupancy.bot_at(*cell)
+    if occupant is None or occupant == bot.id or occupant in fleet.missions:
+        return False
+    idle = fleet.db.get(Bot, occupant)
+    if idle is None or idle.status != "idle":
+        return False
+    excluded = {cell, (bot.x, bot.y), *layout.ports, *dig_sites.values(), *fleet.occupancy.bot_cells.values()}
+    target = nearest_free_cell(cell, excluded, layout)
+    if target is None:
+        return False
+    logger.info(f"[PARKING] Bot {occupant} moves from {cell} to {target} to make way for bot {bot.id}")
+    fleet.submit(occupant, make_way(fleet, idle, target, layout), preemptible=True)
+    return True
+
+def make_way(fleet, bot, target, layout):
+    """Mission: drive an idle bot off a cell another mission needs; it stays idle at target."""
+    yield from drive(fleet, bot, target, layout, bot.current_location_z)
+
+def show_path(fleet, bot, path):
+    bot.path = path
+    bot.full_path = json.dumps(path)
+    queue_bot_status(fleet, bot)
+
+def drive(fleet, bot, goal, layout, z, gate=None):
+    """Mission step: drive the bot (and any bin it carries) to goal, one cell per tick.
+
+    gate(cell) returning True holds the bot in front of that cell (e.g. a port
+    queue); that is no stall, but is given up after GATE_WAIT_SECONDS. With
+    the WHCA* planner the bot plans alone, replanning every half reservation
+    window and whenever it is held or blocked; with the cbs planner it follows
+    the fleet's joint plan. Ends at the goal, or where the bot got to after
+    DRIVE_STALL_SECONDS without progress or GATE_WAIT_SECONDS held at a gate.
+    """
+    stall_limit = max(1, round(DRIVE_STALL_SECONDS / fleet.tick_interval))
+    gate_limit = max(1, round(GATE_WAIT_SECONDS / fleet.tick_interval))
+    stalled = 0
+    gated = 0
+    planner = fleet.joint_planner
+    if planner is not None:
+        planner.request(bot.id, goal)
+        shown = None
+        try:
+            while (bot.x, bot.y) != goal and stalled < stall_limit and gated < gate_limit:
+                cell = planner.next_cell(bot.id, fleet.now)
+                if cell is None:
+                    # No plan yet, or the goal is taken: next to a gated goal that is a queue, not a stall
+                    if gate is not None and goal in layout.neighbors(bot.x, bot.y) and gate(goal):
+                        gated += 1
+                    else:
+                        stalled += 1
+                        clear_idle_bot(fleet, goal, bot, layout)
+                    yield
+                    continue
+                if gate is not None and gate(cell):
+                    planner.release(bot.id)  # stand aside as an obstacle while held
+                    while gate(cell) and gated < gate_limit:
+                        gated += 1
+                        yield
+                    planner.request(bot.id, goal)
+                    continue
+                if planner.plan_time != shown:
+                    shown = planner.plan_time
+                    show_path(fleet, bot, planner.remaining(bot.id, fleet.now))
+                if cell == (bot.x, bot.y) or is_cell_blocked(*cell, fleet.occupancy, ignore_bot_id=bot.id):
+                    stalled += 1  # a planned wait, or blocked and off plan so the next tick replans
+                    clear_idle_bot(fleet, cell, bot, layout)
+                    yield
+                    continue
+                fleet.move_bot(bot, *cell, z)
+                yield
+                # Held by the scheduler to keep clear of another bot: the next replan starts from here
+                stalled = 0 if (bot.x, bot.y) == cell else stalled + 1
+        finally:
+            planner.release(bot.id)
+    else:
+        # Rolling horizon: only the window ahead is reserved, so replan every half window
+        replan_every = max(1, reservation_table.window_size // 2)
+        path, planned_at = [], None
+        while (bot.x, bot.y) != goal and stalled < stall_limit and gated < gate_limit:
+            if planned_at is None or fleet.now - planned_at >= replan_every:
+                path = create_path_avoiding_delivery_station((bot.x, bot.y), goal, layout, bot.id, fleet.now) or []
+                planned_at = fleet.now
+                show_path(fleet, bot, path)
+            index = fleet.now - planned_at + 1
+            if index >= len(path):
+                stalled += 1  # boxed in by reservations for now
+                clear_idle_bot(fleet, goal, bot, layout)
+                planned_at = None
+                yield
+                continue
+            cell = path[index]
+            if gate is not None and gate(cell):
+                gated += 1
+                planned_at = None
+                yield
+                continue
+            if is_cell_blocked(*cell, fleet.occupancy, ignore_bot_id=bot.id):
+                logger.debug(f"[DEBUG] Obstacle detected at {cell}, bot {bot.id} replanning to {goal}")
+                stalled += 1
+                clear_idle_bot(fleet, cell, bot, layout)
+                planned_at = None
+                yield
+                continue
+            waiting = cell == (bot.x, bot.y)
+            fleet.move_bot(bot, *cell, z)
+            yield
+            if (bot.x, bot.y) != cell:
+                stalled += 1  # held by the scheduler to keep clear of another bot, off plan now
+                planned_at = None
+            else:
+                stalled = stalled + 1 if waiting else 0
+    if (bot.x, bot.y) != goal and stalled >= stall_limit:
+        logger.warning(f"[DRIVE] Bot {bot.id} made no progress towards {goal} for {DRIVE_STALL_SECONDS}s, stopping at ({bot.x}, {bot.y})")
+    elif (bot.x, bot.y) != goal and gated >= gate_limit:
+        logger.warning(f"[DRIVE] Bot {bot.id} held at the gate to {goal} for {GATE_WAIT_SECONDS}s, stopping at ({bot.x}, {bot.y})")
+
+def set_down(fleet, bot, bin_obj, choose, layout, z):
+    """Mission step: carry bin_obj to a column with room and set it on top.
+
+    choose(excluded) names the column to try, leaving out the excluded cells,
+    or None when no column has room. A column the bot cannot reach, or that
+    fills up on the way, is excluded and the bot keeps the bin and tries the
+    next choice; when none is left it waits DRIVE_STALL_SECONDS and starts over.
+    A bin is never put down on a full column or a port. Returns the column.
+    """
+    excluded = set()
+    while True:
+        cell = choose(excluded)
+        if cell is None:
+            logger.warning(f"[SET DOWN] Bot {bot.id} found no column with room for bin {bin_obj.id}, holding it")
+            excluded.clear()
+            yield from fleet.wait(DRIVE_STALL_SECONDS)
+            continue
+        yield from drive(fleet, bot, cell, layout, z)
+        # Not on a column another bot started digging out while this one was on its way
+        if (bot.x, bot.y) == cell and fleet.occupancy.has_room(*cell) and cell not in other_bot_cells(fleet, bot):
+            break
+        logger.info(f"[SET DOWN] Bot {bot.id} could not set bin {bin_obj.id} down on {cell}, choosing again")
+        excluded.add(cell)
+    bot.carried_bin_id = None
+    bin_obj.x, bin_obj.y = cell
+    bin_obj.z_location = fleet.occupancy.add_bin(bin_obj.id, *cell)
+    return cell
+
+def dig_out(fleet, bot, plan, layout, parking_z):
+    """Mission step: relocate the bins stacked on a buried bin, topmost first.
+
+    The bot stands on the buried bin's column. Each blocker is lifted, carried
+    to the column chosen by plan_dig_out and set on top of it, then the bot
+    drives back. If that column cannot be used any more, or a bin was set on
+    the column after planning, the blocker goes to the best column with room
+    from where the bot got to. Returns the number of bins actually rehandled.
+    """
+    db = fleet.db
+    rehandled = 0
+    planned = {relocation.bin_id: relocation.target for relocation in plan.relocations}
+    dig_sites[bot.id] = plan.cell
+    try:
+        while fleet.occupancy.bins_above(plan.bin_id, *plan.cell):
+            blocker = db.get(Bin, fleet.occupancy.top_bin(*plan.cell))
+            if blocker is None:
+                logger.warning(f"[DIG-OUT] Top bin of {plan.cell} not found, stopping dig-out")
+                break
+            if blocker.id not in planned:
+                logger.info(f"[DIG-OUT] Bin {blocker.id} was set on {plan.cell} after planning, relocating it too")
+            bot.status = "carrying"
+            bot.carried_bin_id = blocker.id
+            fleet.occupancy.remove_bin(blocker.id, *plan.cell)
+            fleet.broadcast(bots_ws_manager, {
+                "event": "bin_pickup",
+                "bot_id": bot.id,
+                "bin_id": blocker.id,
+                "bot_x": bot.x,
+                "bot_y": bot.y,
+                "bot_z": bot.current_location_z
+            })
+            yield from fleet.wait(0.1)
+
+            def choose(excluded, target=planned.get(blocker.id)):
+                if target is not None and target not in excluded and target not in other_bot_cells(fleet, bot) \
+                        and fleet.occupancy.has_room(*target):
+                    return target
+                return relocation_target(fleet.occupancy, (bot.x, bot.y),
+                                         avoid=[plan.cell, *plan.avoid, *other_bot_cells(fleet, bot), *excluded])
+
+            yield from set_down(fleet, bot, blocker, choose, layout, parking_z)
+            rehandled += 1
+            logger.info(f"[DIG-OUT] Bot {bot.id} moved bin {blocker.id} from {plan.cell} "
+                        f"to ({blocker.x}, {blocker.y}, {blocker.z_location})")
+            fleet.broadcast(bots_ws_manager, {
+                "event": "bin_return",
+                "bin_id": blocker.id,
+                "x": blocker.x,
+                "y": blocker.y,
+                "z": blocker.z_location
+            })
+
+            bot.status = "moving"
+            yield from drive(fleet, bot, plan.cell, layout, parking_z)
+            if (bot.x, bot.y) != plan.cell:
+                logger.warning(f"[DIG-OUT] Bot {bot.id} could not get back to {plan.cell}")
+                break
+    finally:
+        dig_sites.pop(bot.id, None)
+    return rehandled
+
+def migrate_bin(fleet, bot, bin_obj, migration, layout, z):
+    """Mission step: dig a bin out if needed and set it on top of the migration's target column.
+
+    If the target cannot be reached or fills up on the way, the bin goes back
+    on its source column, or failing that the best column with room from
+    where the bot got to. Returns (moved, rehandles).
+    """
+    if (bin_obj.x, bin_obj.y) != migration.source or bin_obj.status != "available":
+        logger.info(f"[RESLOT] Bin {bin_obj.id} moved or in use since planning, skipping")
+        return False, 0
+    bot.status = "moving"
+    yield from drive(fleet, bot, migration.source, layout, z)
+    if (bot.x, bot.y) != migration.source:
+        logger.warning(f"[RESLOT] Bot {bot.id} could not reach bin {bin_obj.id} at {migration.source}")
+        return False, 0
+    if bin_obj.id not in fleet.occupancy.stacks.get(migration.source, []) or bin_obj.status != "available":
+        # Another bot dug it out or picked it for an order while this one was driving
+        logger.info(f"[RESLOT] Bin {bin_obj.id} moved or in use since planning, skipping")
+        return False, 0
+    rehandles = 0
+    if fleet.occupancy.bins_above(bin_obj.id, *migration.source):
+        # Orders come first: never bury a bin an order has locked
+        locked = [(x, y) for x, y in fleet.db.query(Bin.x, Bin.y).filter(Bin.status == "locked")]
+        plan = plan_dig_out(fleet.occupancy, bin_obj.id, migration.source,
+                            avoid=[migration.target, *locked, *other_bot_cells(fleet, bot)])
+        if plan is None:
+            return False, 0
+        rehandles = yield from dig_out(fleet, bot, plan, layout, z)
+        if fleet.occupancy.top_bin(*migration.source) != bin_obj.id or (bot.x, bot.y) != migration.source:
+            return False, rehandles
+    if fleet.occupancy.stack_height(*migration.target) >= fleet.occupancy.capacity[migration.target]:
+        logger.info(f"[RESLOT] Column {migration.target} filled up since planning, leaving bin {bin_obj.id}")
+        return False, rehandles
+
+    bot.status = "carrying"
+    bot.carried_bin_id = bin_obj.id
+    fleet.occupancy.remove_bin(bin_obj.id, *migration.source)
+    fleet.broadcast(bots_ws_manager, {
+        "event": "bin_pickup",
+        "bot_id": bot.id,
+        "bin_id": bin_obj.id,
+        "bot_x": bot.x,
+        "bot_y": bot.y,
+        "bot_z": bot.current_location_z
+    })
+    yield from fleet.wait(0.1)
+
+    def choose(excluded):
+        taken = set(other_bot_cells(fleet, bot))
+        for cell in (migration.target, migration.source):
+            if cell not in excluded and cell not in taken and fleet.occupancy.has_room(*cell):
+                return cell
+        return relocation_target(fleet.occupancy, (bot.x, bot.y), avoid=[*other_bot_cells(fleet, bot), *excluded])
+
+    cell = yield from set_down(fleet, bot, bin_obj, choose, layout, z)
+    logger.info(f"[RESLOT] Bot {bot.id} moved bin {bin_obj.id} from {migration.source} "
+                f"to ({bin_obj.x}, {bin_obj.y}, {bin_obj.z_location}), expected gain {migration.gain:.1f}")
+    fleet.broadcast(bots_ws_manager, {
+        "event": "bin_return",
+        "bin_id": bin_obj.id,
+        "x": bin_obj.x,
+        "y": bin_obj.y,
+        "z": bin_obj.z_location
+    })
+    return cell == migration.target, rehandles
+
+def reslot_bin(bot_id, migration, fleet):
+    """Fleet mission: move a hot bin onto the top of a stack nearer the port, then park again."""
+    db = fleet.db
+    bot = db.query(Bot).populate_existing().filter(Bot.id == bot_id).first()
+    bin_obj = db.query(Bin).populate_existing().filter(Bin.id == migration.bin_id).first()
+    if not bot or not bin_obj:
+        bin_reslotter.record_migration(migration.bin_id, False)
+        return
+    fleet.occupancy.place_bot(bot.id, bot.x, bot.y)
+    layout = get_grid_layout()
+    parking_x, parking_y, parking_z = layout.parking_for(bot.id)
+    moved, rehandles = yield from migrate_bin(fleet, bot, bin_obj, migration, layout, parking_z)
+    bin_reslotter.record_migration(bin_obj.id, moved, rehandles)
+
+    bot.status = "returning"
+    yield from drive(fleet, bot, (parking_x, parking_y), layout, parking_z)
+    bot.status = "idle"
+    bot.path = []
+    queue_bot_status(fleet, bot)
+
+# Enhanced order processing as a fleet scheduler mission
+def process_order_enhanced(order_id: int, fleet):
     """
     Enhanced order processing with:
-    - Sequential bin delivery for multiple items
+    - Order lines grouped by bin, so each bin is fetched only once
+    - Bin visits sequenced to minimise total travel (utils.pick_sequence)
     - Better obstacle avoidance
     - No movement through delivery station when picking orders
+    - Buried bins dug out first: the bins above them are moved to nearby low
+      stacks (utils.stacks), and the rehandles are counted per order
+    - Each bin put back after picking on the stack with room that best fits its
+      demand and the bot's next leg (utils.reslotting.plan_return), then on to the next bin
     - Return to idle after completing all items
+
+    This is a mission generator run by the fleet scheduler: each yield ends the
+    bot's step for the current tick. Moves are staged with fleet.move_bot and
+    applied, committed and broadcast together with the rest of the fleet.
     """
-    logger.debug(f"[DEBUG] (ASYNC) process_order_enhanced called for order_id={order_id}")
-    db = SessionLocal()
-    try:
-        order = db.query(Order).filter(Order.id == order_id).first()
-        if not order or not order.assigned_bot_id:
-            logger.debug(f"[DEBUG] Order {order_id} not found or no assigned bot")
-            return
-        bot = db.query(Bot).filter(Bot.id == order.assigned_bot_id).first()
-        if not bot:
-            logger.debug(f"[DEBUG] Bot {order.assigned_bot_id} not found for order {order_id}")
-            return
-
-        # Immediately set bot to moving status
-        bot.status = "moving"
-        db.commit()
-        await broadcast_bot_status(bot)  # Make sure this broadcasts via WebSocket
+    logger.debug(f"[DEBUG] process_order_enhanced mission started for order_id={order_id}")
+    db = fleet.db
+    # The scheduler session is long-lived, so reload rows another session may have changed
+    order = db.query(Order).populate_existing().filter(Order.id == order_id).first()
+    if not order or not order.assigned_bot_id:
+        logger.debug(f"[DEBUG] Order {order_id} not found or no assigned bot")
+        return
+    bot = db.query(Bot).populate_existing().filter(Bot.id == order.assigned_bot_id).first()
+    if not bot:
+        logger.debug(f"[DEBUG] Bot {order.assigned_bot_id} not found for order {order_id}")
+        return
+    fleet.occupancy.place_bot(bot.id, bot.x, bot.y)
 
-        # Get the first product's bin location
-        first_item = db.query(OrderProduct).filter(OrderProduct.order_id == order_id).first()
-        if not first_item:
-            return
+    # Immediately set bot to moving status
+    bot.status = "moving"
+    queue_bot_status(fleet, bot)
 
-        product = db.query(Product).filter(Product.id == first_item.product_id).first()
-        if not product or not product.bin_id:
-            return
+    # Get all items in the order
+    order_items = db.query(OrderProduct).filter(OrderProduct.order_id == order_id).all()
+    if not order_items:
+        logger.debug(f"[DEBUG] No items found for order {order_id}")
+        return
+
+    layout = get_grid_layout()
 
-        bin_obj = db.query(Bin).filter(Bin.id == product.bin_id).first()
+    # Each bot has a unique parking spot based on its id
+    parking_x, parking_y, parking_z = layout.parking_for(bot.id)
+    parking_spot = (parking_x, parking_y)
+
+    # Group order lines by bin and plan the order of the bin visits
+    lines = []
+    for order_item in order_items:
+        product = db.query(Product).filter(Product.id == order_item.product_id).first()
+        if not product or not product.bin_id:
+            logger.debug(f"[DEBUG] Product {order_item.product_id} or bin_id missing, skipping item")
+            continue
+        bin_obj = db.query(Bin).populate_existing().filter(Bin.id == product.bin_id).first()
         if not bin_obj:
-            return
+            logger.debug(f"[DEBUG] Bin {product.bin_id} not found, skipping item")
+            continue
+        lines.append((order_item, bin_obj.id, (bin_obj.x, bin_obj.y)))
+    unfilled = len(order_items) - len(lines)
+    # Route the order to the port with the least expected wait
+    bin_cells = list({bin_id: cell for _, bin_id, cell in lines}.values())
+    delivery_station = delivery_ports.route(bot.id, bin_cells, layout)
+    service_seconds = delivery_ports.service_seconds(delivery_station, layout)
 
-        # Generate path to bin
-        start_pos = (bot.x, bot.y)
-        bin_pos = (bin_obj.x, bin_obj.y)
-        path = create_varied_path(start_pos, bin_pos, (6, 6), bot.id, int(time.time()))
-        logger.info(f"[ORDER {order_id}] Bot {bot.id} starting to move from {start_pos} to bin at {bin_pos}")
-        logger.info(f"[ORDER {order_id}] Calculated path to bin: {path}")
-        
-        if path:
-            bot.path = path
-            bot.status = "moving"
-            db.commit()
-            await broadcast_bot_status(bot)
-            for i, (x, y) in enumerate(path[1:], 1):
-                logger.info(f"[ORDER {order_id}] Bot {bot.id} moving to ({x}, {y}) step {i}/{len(path)-1}")
-                bot.x, bot.y = x, y
-                db.commit()
-                await broadcast_bot_status(bot)
-                # If bot is carrying a bin, update bin coordinates and broadcast
-                if getattr(bot, 'carried_bin_id', None):
-                    bin_obj = db.query(Bin).filter(Bin.id == bot.carried_bin_id).first()
-                    if bin_obj:
-                        bin_obj.x = bot.x
-                        bin_obj.y = bot.y
-                        bin_obj.z_location = bot.current_location_z
-                        db.commit()
-                        try:
-                            loop = asyncio.get_event_loop()
-                            if loop.is_running():
-                                asyncio.ensure_future(bots_ws_manager.broadcast({
-                                    'event': 'bin_move',
-                                    'bin_id': bin_obj.id,
-                                    'x': bin_obj.x,
-                                    'y': bin_obj.y,
-                                    'z': bin_obj.z_location,
-                                    'bin_status': bin_obj.status
-                                }))
-                        except:
-                            pass
-                await asyncio.sleep(1.0)
-
-        # Get all items in the order
-        order_items = db.query(OrderProduct).filter(OrderProduct.order_id == order_id).all()
-        if not order_items:
-            logger.debug(f"[DEBUG] No items found for order {order_id}")
-            return
-        
-        # Each bot has a unique parking spot based on its id
-        if bot.id == 1:
-            parking_spot = (5, 0)
-            parking_z = 5
-        elif bot.id == 2:
-            parking_spot = (5, 0)
-            parking_z = 4
-        else:
-            parking_spot = (bot.x, bot.y)
-            parking_z = bot.current_location_z
-        
-        delivery_station = (5, 0)
-        delivery_z = parking_z
-        current_time = int(time.time()) % 1000
-        
-        logger.info(f"Processing order {order_id} with {len(order_items)} items")
+    def port_gate(cell):
+        if cell != delivery_station:
+            return False
+        delivery_ports.arrive(delivery_station, bot.id, fleet.now)
+        return not delivery_ports.may_enter(delivery_station, bot.id, fleet.occupancy)
+    # Where each bin is likely to be put back after the port: the bot sets off for the next bin from there
+    demand = bin_demand.scores(sim_clock.now())
+    returns = {bin_id: plan_return(fleet.occupancy, demand, bin_id, delivery_station) or cell
+               for _, bin_id, cell in lines}
+    visits = plan_picks((bot.x, bot.y), lines, delivery_station, parking_spot, layout, returns=returns)
+    
+    logger.info(f"Processing order {order_id} with {len(order_items)} items from {len(visits)} bins at port {delivery_station}, sequence {[v.bin_id for v in visits]}")
+    
+    # Set order status to 'packing' at the start
+    order.status = "packing"
+    order.updated_at = sim_clock.utcnow()
+    queue_order_status(fleet, order)
+
+    retrieved = 0
+    rehandles = 0
+    failed_digs = 0
+    # Visit each bin once, in planned order
+    for visit_index, visit in enumerate(visits):
+        logger.info(f"Processing bin {visit_index + 1}/{len(visits)} for {len(visit.items)} items")
+        bin_obj = db.get(Bin, visit.bin_id)
+
+        # 1. Move from current position to bin (avoid delivery station). Another bot digging
+        # out its own bin may relocate this one meanwhile: follow it to where it was set down
+        bot.status = "moving"
+        while True:
+            bin_pos = (bin_obj.x, bin_obj.y)
+            yield from drive(fleet, bot, bin_pos, layout, parking_z)
+            if (bot.x, bot.y) != bin_pos or bin_obj.id in fleet.occupancy.stacks.get(bin_pos, []):
+                break
+            yield  # still being carried as a blocker
         
-        # Set order status to 'packing' at the start
-        order.status = "packing"
-        order.updated_at = datetime.datetime.utcnow()
-        db.commit()
-        try:
-            loop = asyncio.get_event_loop()
-            if loop.is_running():
-                asyncio.ensure_future(orders_ws_manager.broadcast({
-                    "event": "status_update",
-                    "order_id": order.id,
-                    "order_status": order.status
-                }))
-        except Exception as e:
-            logger.error(f"[WS] Failed to broadcast order status update: {e}")
+        # 2. Pick up bin (simulate)
+        if bot.x != bin_obj.x or bot.y != bin_obj.y:
+            logger.warning(f"[DEBUG] Bot {bot.id} not at bin {bin_obj.id} position for pickup! Bot at ({bot.x}, {bot.y}), bin at ({bin_obj.x}, {bin_obj.y})")
+            unfilled += len(visit.items)
+            continue
+        logger.info(f"[ORDER {order_id}] Bot {bot.id} reached bin {bin_obj.id} at ({bot.x}, {bot.y})")
 
-        # Process each item sequentially
-        for item_index, order_item in enumerate(order_items):
-            logger.info(f"Processing item {item_index + 1}/{len(order_items)}")
-            
-            # Get product and bin for this item
-            product = db.query(Product).filter(Product.id == order_item.product_id).first()
-            if not product or not product.bin_id:
-                logger.debug(f"[DEBUG] Product {order_item.product_id} or bin_id missing for item {item_index + 1}")
+        # Dig the bin out if other bins are stacked on it
+        if fleet.occupancy.bins_above(bin_obj.id, *bin_pos):
+            later = [db.get(Bin, v.bin_id) for v in visits[visit_index + 1:]]
+            plan = plan_dig_out(fleet.occupancy, bin_obj.id, bin_pos,
+                                avoid=[(b.x, b.y) for b in later if b] + other_bot_cells(fleet, bot))
+            if plan is None:
+                logger.warning(f"[DIG-OUT] No free stack capacity to dig out bin {bin_obj.id} at {bin_pos}, skipping it")
+                failed_digs += 1
+                unfilled += len(visit.items)
                 continue
-                
-            bin_obj = db.query(Bin).filter(Bin.id == product.bin_id).first()
-            if not bin_obj:
-                logger.debug(f"[DEBUG] Bin {product.bin_id} not found for item {item_index + 1}")
+            logger.info(f"[DIG-OUT] Order {order_id}: bin {bin_obj.id} at {bin_pos} needs {plan.rehandles} rehandles")
+            rehandles += yield from dig_out(fleet, bot, plan, layout, parking_z)
+            if fleet.occupancy.top_bin(*bin_pos) != bin_obj.id or (bot.x, bot.y) != bin_pos:
+                logger.warning(f"[DIG-OUT] Bin {bin_obj.id} is still buried, skipping it")
+                failed_digs += 1
+                unfilled += len(visit.items)
                 continue
-            
-            bin_pos = (bin_obj.x, bin_obj.y)
-            
-            # 1. Move from current position to bin (avoid delivery station)
-            start_pos = (bot.x, bot.y)
-            path_to_bin = create_path_avoiding_delivery_station(start_pos, bin_pos, (6, 6), bot.id, current_time)
-            
-            if path_to_bin:
-                bot.path = path_to_bin
-                bot.full_path = json.dumps(path_to_bin)
-                bot.status = "moving"
-                db.commit()
-                await broadcast_bot_status(bot)
-                
-                for i, (x, y) in enumerate(path_to_bin[1:], 1):
-                    logger.debug(f"[DEBUG] Bot {bot.id} moving to bin ({x}, {y}) step {i}/{len(path_to_bin)-1}")
-                    
-                    # Enhanced obstacle detection and avoidance
-                    if is_cell_blocked(x, y, db.query(Bot).all(), db.query(Bin).all(), ignore_bot_id=bot.id):
-                        logger.debug(f"[DEBUG] Obstacle detected at ({x}, {y}), replanning path")
-                        # Replan path avoiding obstacles
-                        new_path = create_path_avoiding_obstacles((bot.x, bot.y), bin_pos, (6, 6), bot.id, current_time + i)
-                        if new_path:
-                            bot.path = new_path
-                            bot.full_path = json.dumps(new_path)
-                            db.commit()
-                            continue  # Restart loop with new path
-                        else:
-                            logger.debug(f"[DEBUG] Could not find alternative path, skipping this item")
-                            break
-                    
-                    update_bot_reservations(bot.id, (bot.x, bot.y), (x, y), current_time + i)
-                    bot.x, bot.y, bot.current_location_z = x, y, parking_z
-                    db.commit()
-                    await broadcast_bot_status(bot)
-                    # If bot is carrying a bin, update bin coordinates and broadcast
-                    if getattr(bot, 'carried_bin_id', None):
-                        bin_obj = db.query(Bin).filter(Bin.id == bot.carried_bin_id).first()
-                        if bin_obj:
-                            bin_obj.x = bot.x
-                            bin_obj.y = bot.y
-                            bin_obj.z_location = bot.current_location_z
-                            db.commit()
-                            try:
-                                loop = asyncio.get_event_loop()
-                                if loop.is_running():
-                                    asyncio.ensure_future(bots_ws_manager.broadcast({
-                                        'event': 'bin_move',
-                                        'bin_id': bin_obj.id,
-                                        'x': bin_obj.x,
-                                        'y': bin_obj.y,
-                                        'z': bin_obj.z_location,
-                                        'bin_status': bin_obj.status
-                                    }))
-                            except:
-                                pass
-                    
-                    # Send WebSocket update for smooth movement
-                    try:
-                        loop = asyncio.get_event_loop()
-                        if loop.is_running():
-                            asyncio.ensure_future(bots_ws_manager.broadcast({
-                                "event": "bot_move", 
-                                "bot_id": bot.id, 
-                                "x": x, 
-                                "y": y, 
-                                "z": bot.current_location_z, 
-                                "assigned_order_id": bot.assigned_order_id
-                            }))
-                    except:
-                        pass
-                    await asyncio.sleep(1.0)
-            
-            # 2. Pick up bin (simulate)
-            if bot.x == bin_obj.x and bot.y == bin_obj.y:
-                logger.info(f"[ORDER {order_id}] Bot {bot.id} reached bin {bin_obj.id} at ({bot.x}, {bot.y})")
-                logger.debug(f"[DEBUG] Bot {bot.id} picking up bin {bin_obj.id}")
-                bot.status = "carrying"
-                bot.carried_bin_id = bin_obj.id
-                bin_obj.status = "in-use"
-                db.commit()
-                # Broadcast bin status update for 'in-use'
-                try:
-                    loop = asyncio.get_event_loop()
-                    if loop.is_running():
-                        asyncio.ensure_future(bots_ws_manager.broadcast({
-                            "event": "status_update",
-                            "bin_id": bin_obj.id,
-                            "bin_status": "in-use"
-                        }))
-                except:
-                    pass
-                # Broadcast bin pickup event
-                try:
-                    loop = asyncio.get_event_loop()
-                    if loop.is_running():
-                        asyncio.ensure_future(bots_ws_manager.broadcast({
-                            "event": "bin_pickup",
-                            "bot_id": bot.id,
-                            "bin_id": bin_obj.id,
-                            "bot_x": bot.x,
-                            "bot_y": bot.y,
-                            "bot_z": bot.current_location_z
-                        }))
-                except:
-                    pass
-                await asyncio.sleep(0.1)  # Simulate picking up time
-            else:
-                logger.warning(f"[DEBUG] Bot {bot.id} not at bin {bin_obj.id} position for pickup! Bot at ({bot.x}, {bot.y}), bin at ({bin_obj.x}, {bin_obj.y})")
-            
-            # 3. Move from bin to delivery station
-            path_to_delivery = create_varied_path(bin_pos, delivery_station, (6, 6), bot.id, current_time + len(path_to_bin)) or []
-            if path_to_delivery:
-                bot.path = path_to_delivery
-                bot.full_path = json.dumps(path_to_bin[:-1] + path_to_delivery) if path_to_bin else json.dumps(path_to_delivery)
-                bot.status = "delivering"
-                db.commit()
-                await broadcast_bot_status(bot)
-                
-                for i, (x, y) in enumerate(path_to_delivery[1:], 1):
-                    logger.debug(f"[DEBUG] Bot {bot.id} delivering to ({x}, {y}) step {i}/{len(path_to_delivery)-1}")
-                    
-                    # Obstacle check for delivery path
-                    if is_cell_blocked(x, y, db.query(Bot).all(), db.query(Bin).all(), ignore_bot_id=bot.id):
-                        logger.debug(f"[DEBUG] Obstacle detected during delivery at ({x}, {y}), replanning")
-                        new_path = create_path_avoiding_obstacles((bot.x, bot.y), delivery_station, (6, 6), bot.id, current_time + len(path_to_bin) + i)
-                        if new_path:
-                            bot.path = new_path
-                            bot.full_path = json.dumps(path_to_bin[:-1] + new_path) if path_to_bin else json.dumps(new_path)
-                            db.commit()
-                            continue
-                    
-                    update_bot_reservations(bot.id, (bot.x, bot.y), (x, y), current_time + len(path_to_bin) + i)
-                    bot.x, bot.y, bot.current_location_z = x, y, parking_z
-                    db.commit()
-                    await broadcast_bot_status(bot)
-                    # If bot is carrying a bin, update bin coordinates and broadcast
-                    if getattr(bot, 'carried_bin_id', None):
-                        bin_obj = db.query(Bin).filter(Bin.id == bot.carried_bin_id).first()
-                        if bin_obj:
-                            bin_obj.x = bot.x
-                            bin_obj.y = bot.y
-                            bin_obj.z_location = bot.current_location_z
-                            db.commit()
-                            try:
-                                loop = asyncio.get_event_loop()
-                                if loop.is_running():
-                                    asyncio.ensure_future(bots_ws_manager.broadcast({
-                                        'event': 'bin_move',
-                                        'bin_id': bin_obj.id,
-                                        'x': bin_obj.x,
-                                        'y': bin_obj.y,
-                                        'z': bin_obj.z_location,
-                                        'bin_status': bin_obj.status
-                                    }))
-                            except:
-                                pass
-                    
-                    try:
-                        loop = asyncio.get_event_loop()
-                        if loop.is_running():
-                            asyncio.ensure_future(bots_ws_manager.broadcast({
-                                "event": "bot_move", 
-                                "bot_id": bot.id, 
-                                "x": x, 
-                                "y": y, 
-                                "z": bot.current_location_z, 
-                                "assigned_order_id": bot.assigned_order_id
-                            }))
-                    except:
-                        pass
-                    await asyncio.sleep(1.0)
-            
-            # 4. Deliver bin at delivery station
-            logger.debug(f"[DEBUG] Bot {bot.id} delivering bin {bin_obj.id} at delivery station")
-            bot.status = "delivering"
-            bot.carried_bin_id = None
-            db.commit()
 
-            # Broadcast bin drop event (bin disappears from bot and grid)
-            try:
-                loop = asyncio.get_event_loop()
-                if loop.is_running():
-                    asyncio.ensure_future(bots_ws_manager.broadcast({
-                        "event": "bin_drop",
-                        "bot_id": bot.id,
-                        "bin_id": bin_obj.id,
-                        "delivery_x": 5,
-                        "delivery_y": 0,
-                        "delivery_z": bot.current_location_z
-                    }))
-            except:
-                pass
-
-            # 5. Return to parking spot (always, even for last item)
-            return_path = create_path_avoiding_delivery_station(delivery_station, parking_spot, (6, 6), bot.id, current_time + len(path_to_bin) + len(path_to_delivery))
-            if return_path:
-                bot.path = return_path
-                bot.status = "returning"
-                db.commit()
-                await broadcast_bot_status(bot)
-                for i, (x, y) in enumerate(return_path[1:], 1):
-                    logger.debug(f"[DEBUG] Bot {bot.id} returning to parking ({x}, {y}) step {i}/{len(return_path)-1}")
-                    update_bot_reservations(bot.id, (bot.x, bot.y), (x, y), current_time + len(path_to_bin) + len(path_to_delivery) + i)
-                    bot.x, bot.y, bot.current_location_z = x, y, parking_z
-                    db.commit()
-                    await broadcast_bot_status(bot)
-                    # If bot is carrying a bin, update bin coordinates and broadcast
-                    if getattr(bot, 'carried_bin_id', None):
-                        bin_obj = db.query(Bin).filter(Bin.id == bot.carried_bin_id).first()
-                        if bin_obj:
-                            bin_obj.x = bot.x
-                            bin_obj.y = bot.y
-                            bin_obj.z_location = bot.current_location_z
-                            db.commit()
-                            try:
-                                loop = asyncio.get_event_loop()
-                                if loop.is_running():
-                                    asyncio.ensure_future(bots_ws_manager.broadcast({
-                                        'event': 'bin_move',
-                                        'bin_id': bin_obj.id,
-                                        'x': bin_obj.x,
-                                        'y': bin_obj.y,
-                                        'z': bin_obj.z_location,
-                                        'bin_status': bin_obj.status
-                                    }))
-                            except:
-                                pass
-                    await asyncio.sleep(1.0)
-
-            # After bot returns to parking, set order status to 'packed' and broadcast
-            order.status = "packed"
-            order.updated_at = datetime.datetime.utcnow()
-            db.commit()
-            try:
-                loop = asyncio.get_event_loop()
-                if loop.is_running():
-                    asyncio.ensure_future(orders_ws_manager.broadcast({
-                        "event": "status_update",
-                        "order_id": order.id,
-                        "order_status": order.status
-                    }))
-            except Exception as e:
-                logger.error(f"[WS] Failed to broadcast order status update: {e}")
-
-            # After bot returns to parking, wait 2 seconds, then make bin visible at delivery station
-            logger.info(f"[BIN RETURN] Preparing to return bin {bin_obj.id} to grid at (5, 0)")
-            await asyncio.sleep(2.0)
-            try:
-                bin_obj.status = "available"
-                bin_obj.x = 5
-                bin_obj.y = 0
-                bin_obj.z_location = bot.current_location_z
-                db.commit()
-                logger.info(f"[BIN RETURN] Bin {bin_obj.id} status set to 'available' and position set to (5, 0, {bot.current_location_z})")
-                # Release bin lock
-                bin_lock = db.query(BinLock).filter(BinLock.id == bin_obj.id).first()
-                if bin_lock:
-                    bin_lock.status = "available"
-                    bin_lock.used_by = None
-                    db.commit()
-                # Broadcast bin return move
-                loop = asyncio.get_event_loop()
-                if loop.is_running():
-                    asyncio.ensure_future(bots_ws_manager.broadcast({
-                        "event": "bin_return_move",
-                        "bin_id": bin_obj.id,
-                        "x": 5,
-                        "y": 0,
-                        "z": bot.current_location_z
-                    }))
-                logger.info(f"[BIN RETURN] bin_return_move event sent for bin {bin_obj.id}")
-                await asyncio.sleep(2.0)
-                # Final bin return event
-                if loop.is_running():
-                    asyncio.ensure_future(bots_ws_manager.broadcast({
-                        "event": "bin_return",
-                        "bin_id": bin_obj.id,
-                        "x": 5,
-                        "y": 0,
-                        "z": bot.current_location_z
-                    }))
-                logger.info(f"[BIN RETURN] bin_return event sent for bin {bin_obj.id}")
-            except Exception as e:
-                logger.error(f"[BIN RETURN] Error returning bin: {e}")
-
-        # After bin returns to delivery station and status is set to available
-        await asyncio.sleep(2.0)
-        # Move bin back to original grid position
-        if bin_obj.original_x is not None and bin_obj.original_y is not None and bin_obj.original_z is not None:
-            bin_obj.x = bin_obj.original_x
-            bin_obj.y = bin_obj.original_y
-            bin_obj.z_location = bin_obj.original_z
-            bin_obj.status = "available"
-            db.commit()
-            logger.info(f"[BIN RESTORE] Bin {bin_obj.id} restored to original position ({bin_obj.x}, {bin_obj.y}, {bin_obj.z_location}) and set to 'available'")
-            # Broadcast status update for bin
-            loop = asyncio.get_event_loop()
-            if loop.is_running():
-                asyncio.ensure_future(bots_ws_manager.broadcast({
-                    "event": "status_update",
-                    "bin_id": bin_obj.id,
-                    "bin_status": "available"
-                }))
-
-        # 6. Complete order and return to idle
-        logger.debug(f"[DEBUG] About to mark order {order_id} as packed")
-        order.status = "packed"
-        order.updated_at = datetime.datetime.utcnow()
-        db.commit()
-        logger.debug(f"[DEBUG] Order {order_id} marked as packed and committed to DB")
-        # Broadcast order status update to /ws/orders
-        try:
-            loop = asyncio.get_event_loop()
-            if loop.is_running():
-                asyncio.ensure_future(orders_ws_manager.broadcast({
-                    "event": "status_update",
-                    "order_id": order.id,
-                    "order_status": order.status
-                }))
-        except Exception as e:
-            logger.error(f"[WS] Failed to broadcast order status update: {e}")
+        logger.debug(f"[DEBUG] Bot {bot.id} picking up bin {bin_obj.id}")
+        bot.status = "carrying"
+        bot.carried_bin_id = bin_obj.id
+        bin_obj.status = "in-use"
+        fleet.occupancy.remove_bin(bin_obj.id, *bin_pos)
+        retrieved += 1
+        # Broadcast bin status update for 'in-use'
+        fleet.broadcast(bots_ws_manager, {
+            "event": "status_update",
+            "bin_id": bin_obj.id,
+            "bin_status": "in-use"
+        })
+        # Broadcast bin pickup event
+        fleet.broadcast(bots_ws_manager, {
+            "event": "bin_pickup",
+            "bot_id": bot.id,
+            "bin_id": bin_obj.id,
+            "bot_x": bot.x,
+            "bot_y": bot.y,
+            "bot_z": bot.current_location_z
+        })
+        yield from fleet.wait(0.1)  # Simulate picking up time
+        next_bin = db.get(Bin, visits[visit_index + 1].bin_id) if visit_index + 1 < len(visits) else None
+        next_cell = (next_bin.x, next_bin.y) if next_bin else parking_spot
         
-        # Return to parking spot after completing all items
-        final_return_path = create_path_avoiding_delivery_station((bot.x, bot.y), parking_spot, (6, 6), bot.id, current_time)
-        if final_return_path:
-            bot.path = final_return_path
+        # 3. Move from bin to delivery station, queueing next to it until it is this bot's turn.
+        # A bot that does not get in (e.g. the port's neighbours are all queued and the bot in
+        # the port cannot leave) makes way back towards the bin's column and tries again,
+        # keeping its place in the queue. After PORT_ATTEMPTS tries it fails over to another
+        # port; with none left the bin goes back unpicked
+        bot.status = "delivering"
+        tried_ports = [delivery_station]
+        attempts = 0
+        while True:
+            yield from drive(fleet, bot, delivery_station, layout, parking_z, gate=port_gate)
+            if (bot.x, bot.y) == delivery_station:
+                break
+            attempts += 1
+            if attempts >= PORT_ATTEMPTS:
+                remaining = [bin_pos] + [(b.x, b.y) for b in (db.get(Bin, v.bin_id) for v in visits[visit_index + 1:]) if b]
+                other = delivery_ports.reroute(delivery_station, bot.id, remaining, layout, fleet.now, exclude=tried_ports)
+                if other is None:
+                    break
+                logger.warning(f"[PORT] Bot {bot.id} did not get into port {delivery_station} in {attempts} tries, "
+                               f"failing over to port {other}")
+                delivery_station = other
+                service_seconds = delivery_ports.service_seconds(delivery_station, layout)
+                tried_ports.append(delivery_station)
+                attempts = 0
+                continue
+            logger.warning(f"[PORT] Bot {bot.id} did not reach port {delivery_station}, making way and trying again")
+            yield from drive(fleet, bot, bin_pos, layout, parking_z)
+
+        if (bot.x, bot.y) != delivery_station:
+            logger.warning(f"[PORT] Bot {bot.id} could not get into any port, putting bin {bin_obj.id} back "
+                           f"with {len(visit.items)} lines unpicked")
+            delivery_ports.leave(delivery_station, bot.id, fleet.now)
+            unfilled += len(visit.items)
             bot.status = "returning"
-            db.commit()
-            await broadcast_bot_status(bot)
-            
-            for i, (x, y) in enumerate(final_return_path[1:], 1):
-                logger.debug(f"[DEBUG] Bot {bot.id} final return to parking ({x}, {y}) step {i}/{len(final_return_path)-1}")
-                bot.x, bot.y, bot.current_location_z = x, y, parking_z
-                db.commit()
-                await broadcast_bot_status(bot)
-                # If bot is carrying a bin, update bin coordinates and broadcast
-                if getattr(bot, 'carried_bin_id', None):
-                    bin_obj = db.query(Bin).filter(Bin.id == bot.carried_bin_id).first()
-                    if bin_obj:
-                        bin_obj.x = bot.x
-                        bin_obj.y = bot.y
-                        bin_obj.z_location = bot.current_location_z
-                        db.commit()
-                        try:
-                            loop = asyncio.get_event_loop()
-                            if loop.is_running():
-                                asyncio.ensure_future(bots_ws_manager.broadcast({
-                                    'event': 'bin_move',
-                                    'bin_id': bin_obj.id,
-                                    'x': bin_obj.x,
-                                    'y': bin_obj.y,
-                                    'z': bin_obj.z_location,
-                                    'bin_status': bin_obj.status
-                                }))
-                        except:
-                            pass
-                await asyncio.sleep(1.0)
-        
-        # Set bot to idle
-        bot.status = "idle"
-        bot.assigned_order_id = None
-        bot.destination_bin = None
-        bot.path = []
-        bot.full_path = None
-        db.commit()
-        await broadcast_bot_status(bot)
-        
-        logger.debug(f"[DEBUG] Bot {bot.id} returned to idle state")
-        
-    finally:
-        db.close()
 
-def create_path_avoiding_delivery_station(start, goal, grid_size, bot_id, current_time):
-    """
-    Create path that avoids the delivery station area when picking up orders
-    """
-    delivery_station = (5, 0)
-    
-    # If goal is delivery station, use normal pathfinding
-    if goal == delivery_station:
-        return create_varied_path(start, goal, grid_size, bot_id, current_time)
-    
-    # If start is delivery station, use normal pathfinding
-    if start == delivery_station:
-        return create_varied_path(start, goal, grid_size, bot_id, current_time)
-    
-    # For other paths, avoid delivery station area
-    def is_delivery_station_area(x, y):
-        return x == 5 and y == 0
+            def choose(excluded):
+                return plan_return(fleet.occupancy, bin_demand.scores(sim_clock.now()), bin_obj.id, delivery_station,
+                                   next_cell, avoid=[*other_bot_cells(fleet, bot), *excluded])
+
+            yield from set_down(fleet, bot, bin_obj, choose, layout, parking_z)
+            bin_obj.status = "available"
+            release_bin_locks(db, bot.id, [bin_obj.id])
+            fleet.broadcast(bots_ws_manager, {
+                "event": "bin_return",
+                "bin_id": bin_obj.id,
+                "x": bin_obj.x,
+                "y": bin_obj.y,
+                "z": bin_obj.z_location
+            })
+            fleet.broadcast(bots_ws_manager, {
+                "event": "status_update",
+                "bin_id": bin_obj.id,
+                "bin_status": "available"
+            })
+            continue
+
+        # 4. Deliver bin at delivery station and pick every order line stored in it
+        logger.debug(f"[DEBUG] Bot {bot.id} delivering bin {bin_obj.id} at delivery station")
+        bot.status = "delivering"
+        bot.carried_bin_id = None
+
+        # Broadcast bin drop event (bin disappears from bot and grid)
+        fleet.broadcast(bots_ws_manager, {
+            "event": "bin_drop",
+            "bot_id": bot.id,
+            "bin_id": bin_obj.id,
+            "delivery_x": delivery_station[0],
+            "delivery_y": delivery_station[1],
+            "delivery_z": bot.current_location_z
+        })
+        logger.info(f"[ORDER {order_id}] Picking {len(visit.items)} items from bin {bin_obj.id} at {delivery_station}")
+        delivery_ports.begin_service(delivery_station, bot.id, fleet.now)
+        yield from fleet.wait(service_seconds)
+        delivery_ports.finish(delivery_station, bot.id, fleet.now)
+
+        # 5. Put the bin back on the best stack with room, re-choosing until one takes it
+        bot.carried_bin_id = bin_obj.id
+        bot.status = "returning"
+        fleet.broadcast(bots_ws_manager, {
+            "event": "bin_return_move",
+            "bin_id": bin_obj.id,
+            "x": delivery_station[0],
+            "y": delivery_station[1],
+            "z": bot.current_location_z
+        })
+        demand = bin_demand.scores(sim_clock.now())
+
+        def choose(excluded):
+            return plan_return(fleet.occupancy, demand, bin_obj.id, delivery_station, next_cell,
+                               avoid=[*other_bot_cells(fleet, bot), *excluded])
+
+        yield from set_down(fleet, bot, bin_obj, choose, layout, parking_z)
+        bin_obj.status = "available"
+        logger.info(f"[BIN RESTORE] Bin {bin_obj.id} returned to ({bin_obj.x}, {bin_obj.y}, {bin_obj.z_location}) and set to 'available'")
+        # Release bin lock
+        release_bin_locks(db, bot.id, [bin_obj.id])
+        order.updated_at = sim_clock.utcnow()  # progress, for the packing timeout watchdog
+        fleet.broadcast(bots_ws_manager, {
+            "event": "bin_return",
+            "bin_id": bin_obj.id,
+            "x": bin_obj.x,
+            "y": bin_obj.y,
+            "z": bin_obj.z_location
+        })
+        fleet.broadcast(bots_ws_manager, {
+            "event": "status_update",
+            "bin_id": bin_obj.id,
+            "bin_status": "available"
+        })
+
+    # 6. Complete order and return to idle
+    # Bins skipped above (unreachable or still buried) keep their lock until now
+    release_bin_locks(db, bot.id)
+    retrieval_stats.record(order_id, retrieved, rehandles, failed_digs)
+    logger.info(f"[DIG-OUT] Order {order_id}: {retrieved} bins retrieved with {rehandles} rehandles")
+    # Lines whose bin was skipped were not picked: the order is only partly (or not at all) filled
+    if not unfilled:
+        order.status = "packed"
+    else:
+        order.status = "partial" if unfilled < len(order_items) else "failed"
+        logger.warning(f"[ORDER {order_id}] {unfilled} of {len(order_items)} lines not picked, order {order.status}")
+    order.updated_at = sim_clock.utcnow()
+    # Broadcast order status update to /ws/orders
+    queue_order_status(fleet, order)
     
-    # Use A* with delivery station as obstacle
-    path = whca_star(start, goal, grid_size, bot_id, current_time)
-    if not path:
-        return None
+    # Return to parking spot after completing all items
+    bot.status = "returning"
+    yield from drive(fleet, bot, parking_spot, layout, parking_z)
     
-    # Check if path goes through delivery station
-    for x, y in path:
-        if is_delivery_station_area(x, y):
-            # Try alternative path by going around delivery station
-            alternative_path = create_alternative_path_around_delivery(start, goal, grid_size, bot_id, current_time)
-            return alternative_path
+    # Set bot to idle
+    bot.status = "idle"
+    bot.assigned_order_id = None
+    bot.destination_bin = None
+    bot.path = []
+    bot.full_path = None
+    queue_bot_status(fleet, bot)
     
-    return path
+    logger.debug(f"[DEBUG] Bot {bot.id} returned to idle state")
 
-def create_alternative_path_around_delivery(start, goal, grid_size, bot_id, current_time):
-    """
-    Create alternative path that goes around the delivery station
-    """
-    # Try different waypoints to avoid delivery station
-    waypoints = [
-        (4, 1), (4, 2), (4, 3), (4, 4), (4, 5),  # Left of delivery station
-        (3, 1), (3, 2), (3, 3), (3, 4), (3, 5),  # Further left
-        (2, 1), (2, 2), (2, 3), (2, 4), (2, 5),  # Even further left
-    ]
-    
-    for waypoint in waypoints:
-        # Check if waypoint is reachable
-        path1 = whca_star(start, waypoint, grid_size, bot_id, current_time)
-        if path1:
-            path2 = whca_star(waypoint, goal, grid_size, bot_id, current_time + len(path1))
-            if path2:
-                # Combine paths (remove duplicate waypoint)
-                return path1[:-1] + path2
-    
-    # If no alternative found, return original path
-    return create_varied_path(start, goal, grid_size, bot_id, current_time)
+# Random variation added to WHCA* heuristics for less repetitive routes (0 = cached routes);
+# drawn from sim_clock.rng, so a seeded clock repeats the same routes
+ROUTE_VARIATION = float(os.environ.get("AUTOSTORE_ROUTE_VARIATION", "0"))
 
-def create_path_avoiding_obstacles(start, goal, grid_size, bot_id, current_time):
+def create_path_avoiding_delivery_station(start, goal, layout, bot_id, current_time):
     """
-    Create path that avoids obstacles by using different strategies
+    Create path that avoids every delivery port other than its own start or goal
     """
-    # Strategy 1: Try with increased clearance
-    path = whca_star(start, goal, grid_size, bot_id, current_time)
-    if path:
-        return path
-    
-    # Strategy 2: Try with different time offset
-    for time_offset in [10, 20, 30, 50, 100]:
-        path = whca_star(start, goal, grid_size, bot_id, current_time + time_offset)
-        if path:
-            return path
-    
-    # Strategy 3: Try with different waypoints
-    waypoints = [
-        (start[0] + 1, start[1]), (start[0] - 1, start[1]),
-        (start[0], start[1] + 1), (start[0], start[1] - 1),
-        (goal[0] + 1, goal[1]), (goal[0] - 1, goal[1]),
-        (goal[0], goal[1] + 1), (goal[0], goal[1] - 1),
-    ]
-    
-    for waypoint in waypoints:
-        if 0 <= waypoint[0] < grid_size[0] and 0 <= waypoint[1] < grid_size[1]:
-            path1 = whca_star(start, waypoint, grid_size, bot_id, current_time)
-            if path1:
-                path2 = whca_star(waypoint, goal, grid_size, bot_id, current_time + len(path1))
-                if path2:
-                    return path1[:-1] + path2
-    
-    # Strategy 4: Fallback to direct path
-    return [start, goal]
+    ports = frozenset(p for p in layout.ports if p != start and p != goal)
+    if ROUTE_VARIATION > 0:
+        return whca_star_varied(start, goal, layout, bot_id, current_time, variation_factor=ROUTE_VARIATION,
+                                blocked=ports, rng=sim_clock.rng)
+    # Cached static route, repaired around reservations, with the other ports as obstacles
+    return cached_whca_star(start, goal, layout, bot_id, current_time, blocked=ports)
 
 @router.get("/orders/")
-def list_orders(db: Session = Depends(get_db)):
-    orders = db.query(Order).all()
+async def list_orders(db: AsyncSession = Depends(get_async_db)):
+    orders = (await db.scalars(select(Order).options(selectinload(Order.items).selectinload(OrderProduct.product)))).all()
     result = []
     for order in orders:
         result.append({
@@ -1028,27 +1175,9 @@ def list_orders(db: Session = Depends(get_db)):
     return result 
 
 @router.get("/bots/")
-def list_bots(db: Session = Depends(get_db)):
-    bots = db.query(Bot).all()
-    result = []
-    for bot in bots:
-        result.append({
-            "id": bot.id,
-            "x": bot.x,
-            "y": bot.y,
-            "z": bot.current_location_z,  # Map current_location_z to z for frontend compatibility
-            "current_location_z": bot.current_location_z,
-            "status": bot.status,
-            "assigned_order_id": bot.assigned_order_id,
-            "destination_bin": bot.destination_bin,
-            "path": bot.path,
-            "full_path": json.loads(bot.full_path) if bot.full_path else [],
-            "carried_bin_id": bot.carried_bin_id,  # Include carried bin information
-        })
-    return result 
-
-# Move this to after tables are created
-# reset_all_bins_available()
+def list_bots(request: Request):
+    # Served from the snapshot cache; unchanged polls get 304 Not Modified
+    return snapshot_cache.respond(request, "bots")
 
 def reset_all_bins_available():
     """Reset all bins to available status on startup"""
@@ -1065,39 +1194,38 @@ def reset_all_bins_available():
     finally:
         db.close()
 
-reset_all_bins_available() 
-
 @router.post("/admin/reset_bins/")
-async def admin_reset_bins(db: Session = Depends(get_db)):
+async def admin_reset_bins(db: AsyncSession = Depends(get_async_db)):
     from models.bin_locks import BinLock
-    bins = db.query(Bin).all()
+    bins = (await db.scalars(select(Bin))).all()
     # Step 0: Delete all bin locks
-    db.query(BinLock).delete()
-    db.commit()
+    await db.execute(delete(BinLock))
+    await db.commit()
     # Step 1: Set all bins to 'available' and broadcast
     for bin_obj in bins:
         bin_obj.status = "available"
-        db.commit()
-        db.refresh(bin_obj)
+        await db.commit()
         await bots_ws_manager.broadcast({"event": "status_update", "bin_id": bin_obj.id, "bin_status": "available"})
     logger.debug("[DEBUG] All bins reset to 'available' and all bin locks deleted via admin endpoint.")
     return {"message": "All bins reset to available and all locks deleted"} 
 
 @router.post("/admin/clear_orders/")
-async def admin_clear_orders(db: Session = Depends(get_db)):
-    db.query(OrderProduct).delete()
-    db.query(Order).delete()
-    db.commit()
+async def admin_clear_orders(db: AsyncSession = Depends(get_async_db)):
+    await db.execute(delete(OrderProduct))
+    await db.execute(delete(Order))
+    await db.commit()
     return {"message": "All orders and order history cleared."} 
 
 @router.websocket("/ws/orders")
 async def ws_orders(websocket: WebSocket):
     await orders_ws_manager.connect(websocket)
     try:
-        await websocket.send_json({"event": "connected", "message": "WebSocket connection established"})
+        await orders_ws_manager.send(websocket, {"event": "connected", "message": "WebSocket connection established"})
         while True:
             data = await websocket.receive_text()
             if data == "ping":
-                await websocket.send_json({"event": "ping"})
+                await orders_ws_manager.send(websocket, {"event": "ping"})
     except WebSocketDisconnect:
+        pass
+    finally:
         orders_ws_manager.disconnect(websocket) 
\ No newline at end of file
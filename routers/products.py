@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from db.database import SessionLocal
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.database import get_async_db
 from models.products import Product
 from models.bins import Bin
 from typing import List
@@ -10,33 +11,26 @@ from pydantic import BaseModel
 
 router = APIRouter(prefix="/products", tags=["products"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 class RefillRequest(BaseModel):
     bin_id: int
     product_id: int
     quantity: int = 1
 
 @router.get("/", response_model=List[ProductOut])
-def list_products(db: Session = Depends(get_db)):
-    return db.query(Product).all()
+async def list_products(db: AsyncSession = Depends(get_async_db)):
+    return (await db.scalars(select(Product))).all()
 
 @router.post("/refill")
-def refill_bin(refill_data: RefillRequest, db: Session = Depends(get_db)):
+async def refill_bin(refill_data: RefillRequest, db: AsyncSession = Depends(get_async_db)):
     """Refill a bin by updating last refill date for existing products"""
     try:
         # Check if bin exists
-        bin_obj = db.query(Bin).filter(Bin.id == refill_data.bin_id).first()
+        bin_obj = await db.get(Bin, refill_data.bin_id)
         if not bin_obj:
             raise HTTPException(status_code=404, detail=f"Bin {refill_data.bin_id} not found")
         
         # Get all products assigned to this bin
-        bin_products = db.query(Product).filter(Product.bin_id == refill_data.bin_id).all()
+        bin_products = (await db.scalars(select(Product).where(Product.bin_id == refill_data.bin_id))).all()
         
         if not bin_products:
             raise HTTPException(status_code=404, detail=f"No products assigned to Bin {refill_data.bin_id}")
@@ -49,8 +43,7 @@ def refill_bin(refill_data: RefillRequest, db: Session = Depends(get_db)):
         # Update bin status to available
         bin_obj.status = "available"
         
-        db.commit()
-        db.refresh(bin_obj)
+        await db.commit()
         
         # Get product names for response
         product_names = [p.name for p in bin_products]
@@ -65,18 +58,18 @@ def refill_bin(refill_data: RefillRequest, db: Session = Depends(get_db)):
         }
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to refill bin: {str(e)}")
 
 @router.post("/refill-multiple")
-def refill_multiple_bins(refill_data: List[RefillRequest], db: Session = Depends(get_db)):
+async def refill_multiple_bins(refill_data: List[RefillRequest], db: AsyncSession = Depends(get_async_db)):
     """Refill multiple bins at once"""
     results = []
     
     for refill_item in refill_data:
         try:
             # Check if bin exists
-            bin_obj = db.query(Bin).filter(Bin.id == refill_item.bin_id).first()
+            bin_obj = await db.get(Bin, refill_item.bin_id)
             if not bin_obj:
                 results.append({
                     "bin_id": refill_item.bin_id,
@@ -85,7 +78,7 @@ def refill_multiple_bins(refill_data: List[RefillRequest], db: Session = Depends
                 })
                 continue
             # Get the product in this bin matching the refill_item.product_id
-            product = db.query(Product).filter(Product.bin_id == refill_item.bin_id, Product.id == refill_item.product_id).first()
+            product = await db.scalar(select(Product).where(Product.bin_id == refill_item.bin_id, Product.id == refill_item.product_id))
             if not product:
                 results.append({
                     "bin_id": refill_item.bin_id,
@@ -118,5 +111,5 @@ def refill_multiple_bins(refill_data: List[RefillRequest], db: Session = Depends
                 "message": f"Error: {str(e)}"
             })
     
-    db.commit()
+    await db.commit()
     return {"results": results} 
\ No newline at end of file
@@ -0,0 +1,170 @@
+import asyncio
+import contextlib
+import datetime
+import heapq
+import itertools
+import os
+import random
+import time
+from typing import List, Optional, Tuple
+
+# How simulated time relates to wall-clock time:
+#   realtime - one simulated second per second
+#   scaled   - scale simulated seconds per second (e.g. 100x)
+#   fast     - as fast as possible: time jumps to the next sleeper once every task is waiting
+CLOCK_MODES = ("realtime", "scaled", "fast")
+
+class SimClock:
+    """Simulated time for the fleet tick loop, re-slotting, watchdogs and order replay.
+
+    Every pacing loop sleeps on the clock instead of asyncio directly, and reads
+    the time from now() (seconds since the clock started). In fast mode
+    sleepers are kept in a heap: a driver task lets the event loop settle
+    (settle_yields passes with nothing awaited but the clock), then moves time
+    to the earliest deadline and wakes its sleepers. Since nothing waits on
+    wall time, a run depends only on its inputs, the seeded rng and how the
+    database worker thread interleaves with the loop. Code that awaits real
+    I/O (an async database call, offloaded work) runs inside busy() so time
+    does not jump while it waits.
+    """
+
+    def __init__(self, mode: str = "realtime", scale: float = 1.0, seed: Optional[int] = None,
+                 settle_yields: int = 20):
+        if mode not in CLOCK_MODES:
+            raise ValueError(f"Unknown clock mode {mode!r}, expected one of {CLOCK_MODES}")
+        if mode == "scaled" and scale <= 0:
+            raise ValueError(f"Clock scale must be positive, got {scale}")
+        self.mode = mode
+        self.scale = scale if mode == "scaled" else 1.0
+        self.settle_yields = settle_yields
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.epoch = datetime.datetime.utcnow()
+        self._started = time.monotonic()
+        self._now = 0.0  # simulated seconds, fast mode only
+        self._sleepers: List[Tuple[float, int, asyncio.Future]] = []  # (deadline, seq, future)
+        self._seq = itertools.count()
+        self._pending: Optional[asyncio.Event] = None
+        self._driver: Optional[asyncio.Task] = None
+        self._busy = 0
+        self._idle: Optional[asyncio.Event] = None
+        self.jumps = 0
+
+    @property
+    def fast(self) -> bool:
+        return self.mode == "fast"
+
+    def reset(self, seed: Optional[int] = None):
+        """Restart simulated time at zero and reseed the rng (e.g. before a replay)."""
+        self._sleepers = [entry for entry in self._sleepers if not entry[2].done()]
+        if self._sleepers:
+            raise RuntimeError("Cannot reset the clock while tasks are sleeping on it")
+        self.seed = seed
+        self.rng.seed(seed)
+        self.epoch = datetime.datetime.utcnow()
+        self._started = time.monotonic()
+        self._now = 0.0
+        self.jumps = 0
+
+    def now(self) -> float:
+        """Simulated seconds since the clock started."""
+        if self.fast:
+            return self._now
+        return (time.monotonic() - self._started) * self.scale
+
+    def utcnow(self) -> datetime.datetime:
+        """Simulated wall-clock time, for timestamps compared against now()."""
+        return self.epoch + datetime.timedelta(seconds=self.now())
+
+    def wall_seconds(self, seconds: float) -> float:
+        """Wall-clock time that seconds of simulated time take (0 in fast mode)."""
+        return 0.0 if self.fast else seconds / self.scale
+
+    async def sleep(self, seconds: float):
+        """Sleep for seconds of simulated time."""
+        seconds = max(0.0, seconds)
+        if not self.fast:
+            await asyncio.sleep(seconds / self.scale)
+            return
+        loop = asyncio.get_running_loop()
+        if self._driver is None or self._driver.done() or self._driver.get_loop() is not loop:
+            # First sleeper on this loop (e.g. a new TestClient): sleepers of an old loop are dropped
+            self._sleepers.clear()
+            self._pending = asyncio.Event()
+            self._idle = asyncio.Event()
+            self._driver = loop.create_task(self._drive())
+        future = loop.create_future()
+        heapq.heappush(self._sleepers, (self._now + seconds, next(self._seq), future))
+        self._pending.set()
+        await future
+
+    async def sleep_until(self, deadline: float):
+        """Sleep until now() reaches deadline (returns at once if it already has)."""
+        await self.sleep(deadline - self.now())
+
+    @contextlib.asynccontextmanager
+    async def busy(self):
+        """Hold simulated time still while the body awaits something other than the clock."""
+        self._busy += 1
+        try:
+            yield
+        finally:
+            self._busy -= 1
+            if not self._busy and self._idle is not None:
+                self._idle.set()
+
+    async def _drive(self):
+        while True:
+            # Let every task that can run without the clock run first
+            for _ in range(self.settle_yields):
+                await asyncio.sleep(0)
+            if self._busy:
+                self._idle.clear()
+                await self._idle.wait()
+                continue
+            if not self._sleepers:
+                self._pending.clear()
+                await self._pending.wait()
+                continue
+            deadline = self._sleepers[0][0]
+            if deadline > self._now:
+                self._now = deadline
+                self.jumps += 1
+            while self._sleepers and self._sleepers[0][0] <= self._now:
+                _, _, future = heapq.heappop(self._sleepers)
+                if not future.done():  # cancelled sleepers are simply dropped
+                    future.set_result(None)
+
+    async def stop(self):
+        if self._driver is not None:
+            self._driver.cancel()
+            try:
+                await self._driver
+            except asyncio.CancelledError:
+                pass
+            self._driver = None
+        for _, _, future in self._sleepers:
+            future.cancel()
+        self._sleepers.clear()
+
+    def status(self) -> dict:
+        return {
+            "mode": self.mode,
+            "scale": self.scale,
+            "seed": self.seed,
+            "sim_seconds": self.now(),
+            "wall_seconds": time.monotonic() - self._started,
+            "sleepers": len(self._sleepers),
+            "busy": self._busy,
+            "jumps": self.jumps,
+        }
+
+def _seed_from_env() -> Optional[int]:
+    seed = os.environ.get("AUTOSTORE_SEED")
+    return int(seed) if seed else None
+
+sim_clock = SimClock(
+    mode=os.environ.get("AUTOSTORE_CLOCK", "realtime"),
+    scale=float(os.environ.get("AUTOSTORE_CLOCK_SCALE", "100")),
+    seed=_seed_from_env(),
+)
@@ -0,0 +1,309 @@
+import json
+import logging
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from fastapi import Request, Response
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from db.database import SessionLocal
+from models.bin_locks import BinLock
+from models.bins import Bin
+from models.bots import Bot
+
+logger = logging.getLogger(__name__)
+
+# Columns mirrored in memory for each tracked model
+BOT_FIELDS = ("x", "y", "current_location_z", "status", "assigned_order_id",
+              "destination_bin", "path", "full_path", "carried_bin_id")
+BIN_FIELDS = ("x", "y", "z_location", "status")
+LOCK_FIELDS = ("status",)
+TRACKED = {Bot: ("bot", BOT_FIELDS), Bin: ("bin", BIN_FIELDS), BinLock: ("lock", LOCK_FIELDS)}
+
+VALID_BOT_STATUSES = ["idle", "packing", "moving", "carrying", "delivering", "returning"]
+
+def _copy(value):
+    # JSON columns hold lists that missions may reuse; keep our own copy
+    return list(value) if isinstance(value, list) else value
+
+def bot_row(bot: dict) -> dict:
+    """Row served by GET /bots/ (routers/orders.py)."""
+    return {
+        "id": bot["id"],
+        "x": bot["x"],
+        "y": bot["y"],
+        "z": bot["current_location_z"],  # Map current_location_z to z for frontend compatibility
+        "current_location_z": bot["current_location_z"],
+        "status": bot["status"],
+        "assigned_order_id": bot["assigned_order_id"],
+        "destination_bin": bot["destination_bin"],
+        "path": bot["path"],
+        "full_path": json.loads(bot["full_path"]) if bot["full_path"] else [],
+        "carried_bin_id": bot["carried_bin_id"],
+    }
+
+def bot_status_row(bot: dict) -> dict:
+    """Row served by GET /bots (routers/bots.py)."""
+    return {
+        "id": bot["id"],
+        "status": bot["status"] if bot["status"] in VALID_BOT_STATUSES else "idle",
+        "x": bot["x"],
+        "y": bot["y"],
+        "z": bot["current_location_z"],
+        "assigned_order_id": bot["assigned_order_id"],
+        "destination_bin": bot["destination_bin"],
+        "path": bot["path"] or [],
+        "full_path": json.loads(bot["full_path"]) if bot["full_path"] else [],
+    }
+
+def bin_in_use_by(bot: dict) -> Optional[int]:
+    """Bin id a bot is assumed to be carrying, going by its destination_bin ([x, y, z, bin_id])."""
+    destination = bot["destination_bin"]
+    if destination and bot["status"] in ["moving", "delivering", "carrying"]:
+        if isinstance(destination, list) and len(destination) > 3:
+            return destination[3] or None
+    return None
+
+class Snapshot:
+    """One cached list endpoint: rows keyed by id, serialized once per version."""
+
+    def __init__(self, name: str, epoch: int):
+        self.name = name
+        self.epoch = epoch
+        self.rows: Dict[int, dict] = {}
+        self.version = 0
+        self._body = b"[]"
+        self._body_version = 0
+
+    def put(self, key: int, row: dict):
+        if self.rows.get(key) != row:
+            self.rows[key] = row
+            self.version += 1
+
+    def remove(self, key: int):
+        if self.rows.pop(key, None) is not None:
+            self.version += 1
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.name}-{self.epoch}-{self.version}"'
+
+    def body(self) -> bytes:
+        if self._body_version != self.version:
+            self._body = json.dumps([self.rows[key] for key in sorted(self.rows)]).encode()
+            self._body_version = self.version
+        return self._body
+
+class SnapshotCache:
+    """Versioned, pre-serialized snapshots of the bots and bins list endpoints.
+
+    Bot, Bin and BinLock rows are mirrored in memory and kept current from
+    SQLAlchemy session events (changed columns only, applied on commit) and from
+    the fleet scheduler's position buffer. Each change rebuilds just the affected
+    rows and bumps the snapshot version; the JSON body is serialized at most once
+    per version and served with an ETag, so unchanged polls get a 304.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.epoch = int(time.time())  # keeps ETags from a previous process from matching
+        self.bots: Dict[int, dict] = {}
+        self.bins: Dict[int, dict] = {}
+        self.lock_status: Dict[int, str] = {}
+        self.bot_bins: Dict[int, int] = {}  # {bot_id: bin_id the bot is assumed to carry}
+        self.snapshots = {name: Snapshot(name, self.epoch) for name in ("bots", "bot_status", "bins")}
+        self.loaded = False
+        self.hits = 0
+        self.not_modified = 0
+        self.reloads = 0
+
+    # --- Loading ---
+
+    def load(self):
+        """(Re)build every snapshot from the database."""
+        db = SessionLocal()
+        try:
+            bots = {bot.id: {"id": bot.id, **{f: _copy(getattr(bot, f)) for f in BOT_FIELDS}} for bot in db.query(Bot).all()}
+            bins = {b.id: {"id": b.id, **{f: getattr(b, f) for f in BIN_FIELDS}} for b in db.query(Bin).all()}
+            locks = {bl.id: bl.status for bl in db.query(BinLock).all()}
+        finally:
+            db.close()
+        with self._lock:
+            self.bots, self.bins, self.lock_status = bots, bins, locks
+            self.bot_bins = {bot_id: bin_id for bot_id, bot in bots.items()
+                             if (bin_id := bin_in_use_by(bot)) is not None}
+            for snapshot in self.snapshots.values():
+                for key in list(snapshot.rows):
+                    if key not in (bots if snapshot.name != "bins" else bins):
+                        snapshot.remove(key)
+            for bot_id in bots:
+                self._refresh_bot(bot_id)
+            for bin_id in bins:
+                self._refresh_bin(bin_id)
+            self.loaded = True
+            self.reloads += 1
+        logger.info(f"[SNAPSHOT] Loaded {len(bots)} bots, {len(bins)} bins, {len(locks)} bin locks")
+
+    def invalidate(self):
+        """Reload from the database on the next request (after bulk UPDATE/DELETE statements)."""
+        with self._lock:
+            self.loaded = False
+
+    # --- Incremental updates ---
+
+    def _refresh_bot(self, bot_id: int):
+        bot = self.bots.get(bot_id)
+        if bot is None:
+            self.snapshots["bots"].remove(bot_id)
+            self.snapshots["bot_status"].remove(bot_id)
+            return
+        self.snapshots["bots"].put(bot_id, bot_row(bot))
+        self.snapshots["bot_status"].put(bot_id, bot_status_row(bot))
+
+    def _refresh_bin(self, bin_id: int):
+        b = self.bins.get(bin_id)
+        if b is None:
+            self.snapshots["bins"].remove(bin_id)
+            return
+        # Carried by a bot > locked for a bot (reserved, but not picked up) > available
+        if b["status"] == "in-use" or bin_id in self.bot_bins.values():
+            status = "in-use"
+        elif self.lock_status.get(bin_id) == "Locked":
+            status = "locked"
+        else:
+            status = "available"
+        self.snapshots["bins"].put(bin_id, {
+            "id": bin_id,
+            "x": b["x"],
+            "y": b["y"],
+            "z_location": b["z_location"],
+            "status": status
+        })
+
+    def apply(self, kind: str, key: int, fields: Optional[dict]):
+        """Apply changed columns of one row; fields=None means the row was deleted."""
+        with self._lock:
+            if kind == "bot":
+                self._apply_bot(key, fields)
+            elif kind == "bin":
+                if fields is None:
+                    self.bins.pop(key, None)
+                else:
+                    self.bins.setdefault(key, {"id": key, **dict.fromkeys(BIN_FIELDS)}).update(fields)
+                self._refresh_bin(key)
+            elif kind == "lock":
+                if fields is None:
+                    self.lock_status.pop(key, None)
+                elif "status" in fields:
+                    self.lock_status[key] = fields["status"]
+                self._refresh_bin(key)
+
+    def _apply_bot(self, bot_id: int, fields: Optional[dict]):
+        if fields is None:
+            self.bots.pop(bot_id, None)
+        else:
+            self.bots.setdefault(bot_id, {"id": bot_id, **dict.fromkeys(BOT_FIELDS)}).update(fields)
+        self._refresh_bot(bot_id)
+        # A bot's destination/status decides whether a bin shows as in-use
+        previous = self.bot_bins.pop(bot_id, None)
+        current = bin_in_use_by(self.bots[bot_id]) if bot_id in self.bots else None
+        if current is not None:
+            self.bot_bins[bot_id] = current
+        if previous != current:
+            for bin_id in (previous, current):
+                if bin_id is not None:
+                    self._refresh_bin(bin_id)
+
+    def bot_moved(self, bot_id: int, x: int, y: int, z: int):
+        """Position update from the fleet scheduler, ahead of the bulk database flush."""
+        self.apply("bot", bot_id, {"x": x, "y": y, "current_location_z": z})
+
+    def bin_moved(self, bin_id: int, x: int, y: int, z: int):
+        self.apply("bin", bin_id, {"x": x, "y": y, "z_location": z})
+
+    # --- Serving ---
+
+    def rows(self, name: str) -> Tuple[int, Dict[int, dict]]:
+        """Current (version, {id: row}) of a snapshot; rows are replaced, never mutated, on change."""
+        if not self.loaded:
+            self.load()
+        with self._lock:
+            snapshot = self.snapshots[name]
+            return snapshot.version, dict(snapshot.rows)
+
+    def respond(self, request: Request, name: str) -> Response:
+        """Serve a snapshot, or 304 Not Modified if the client's ETag is current."""
+        if not self.loaded:
+            self.load()
+        with self._lock:
+            snapshot = self.snapshots[name]
+            etag = snapshot.etag
+            headers = {"ETag": etag, "Cache-Control": "no-cache"}
+            if_none_match = request.headers.get("if-none-match")
+            if if_none_match and _etag_matches(if_none_match, etag):
+                self.not_modified += 1
+                return Response(status_code=304, headers=headers)
+            self.hits += 1
+            return Response(content=snapshot.body(), media_type="application/json", headers=headers)
+
+    def status(self) -> dict:
+        return {
+            "versions": {name: s.version for name, s in self.snapshots.items()},
+            "hits": self.hits,
+            "not_modified": self.not_modified,
+            "reloads": self.reloads,
+        }
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return etag in candidates or f"W/{etag}" in candidates
+
+# Global snapshot cache instance
+snapshot_cache = SnapshotCache()
+
+# --- Session hooks: capture changed columns at flush, apply them once committed ---
+
+def _pending(session) -> list:
+    return session.info.setdefault("snapshot_changes", [])
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session, flush_context):
+    pending = _pending(session)
+    for obj in list(session.new) + list(session.dirty):
+        tracked = TRACKED.get(type(obj))
+        if tracked is None:
+            continue
+        kind, fields = tracked
+        state = inspect(obj)
+        changed = {f: _copy(getattr(obj, f)) for f in fields
+                   if obj in session.new or state.attrs[f].history.has_changes()}
+        if changed:
+            pending.append((kind, obj.id, changed))
+    for obj in session.deleted:
+        tracked = TRACKED.get(type(obj))
+        if tracked is not None:
+            pending.append((tracked[0], obj.id, None))
+
+@event.listens_for(Session, "do_orm_execute")
+def _watch_bulk_statements(orm_execute_state):
+    # Query.update()/delete() bypass the unit of work, so fall back to a full reload
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        if any(mapper.class_ in TRACKED for mapper in orm_execute_state.all_mappers):
+            orm_execute_state.session.info["snapshot_reload"] = True
+
+@event.listens_for(Session, "after_commit")
+def _apply_changes(session):
+    changes = session.info.pop("snapshot_changes", [])
+    if session.info.pop("snapshot_reload", False):
+        snapshot_cache.invalidate()
+    for kind, key, fields in changes:
+        snapshot_cache.apply(kind, key, fields)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session):
+    session.info.pop("snapshot_changes", None)
+    session.info.pop("snapshot_reload", None)
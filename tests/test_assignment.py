@@ -0,0 +1,71 @@
+import itertools
+import random
+
+import numpy as np
+import pytest
+
+from utils.assignment import assign, build_cost_matrix, hungarian
+from utils.grid_layout import GridLayout
+
+
+def brute_force(cost):
+    rows, cols = cost.shape
+    if rows <= cols:
+        return min(sum(cost[i, j] for i, j in enumerate(perm))
+                   for perm in itertools.permutations(range(cols), rows))
+    return brute_force(cost.T)
+
+
+def total(cost, pairs):
+    return sum(cost[i, j] for i, j in pairs)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_brute_force_on_small_matrices(seed):
+    rng = random.Random(seed)
+    rows, cols = rng.randint(1, 5), rng.randint(1, 5)
+    cost = np.array([[rng.randint(0, 20) for _ in range(cols)] for _ in range(rows)], dtype=float)
+
+    pairs = hungarian(cost)
+
+    assert len(pairs) == min(rows, cols)
+    assert len({i for i, _ in pairs}) == len({j for _, j in pairs}) == len(pairs)
+    assert total(cost, pairs) == pytest.approx(brute_force(cost))
+
+
+def test_more_bots_than_orders_leaves_the_farthest_bots_idle():
+    cost = np.array([[9.0, 9.0], [1.0, 5.0], [8.0, 8.0], [4.0, 1.0]])
+
+    assert hungarian(cost) == [(1, 0), (3, 1)]
+
+
+def test_more_orders_than_bots_picks_the_cheapest_orders():
+    cost = np.array([[7.0, 2.0, 6.0], [3.0, 1.0, 9.0]])
+
+    assert hungarian(cost) == [(0, 1), (1, 0)]
+
+
+def test_global_assignment_beats_greedy():
+    # Greedy gives bot 0 its nearest order (cost 1) and bot 1 the leftover (cost 10)
+    cost = np.array([[1.0, 2.0], [1.0, 10.0]])
+
+    assert hungarian(cost) == [(0, 1), (1, 0)]
+
+
+def test_empty_inputs():
+    assert hungarian(np.zeros((0, 3))) == []
+    assert assign([], [[(0, 0)]], GridLayout(3, 3)) == []
+    assert assign([(0, 0)], [], GridLayout(3, 3)) == []
+
+
+def test_cost_is_the_distance_to_the_nearest_bin_of_the_order():
+    layout = GridLayout(5, 5, blocked=[(1, 0), (1, 1), (1, 2), (1, 3)])
+    bots = [(0, 0), (4, 4)]
+    orders = [[(2, 0)], [(0, 4), (4, 3)]]
+
+    cost = build_cost_matrix(bots, orders, layout)
+
+    # Around the wall through (1, 4): 4 up, 2 across, 4 down
+    assert cost[0, 0] == 10
+    assert cost[0, 1] == 4 and cost[1, 1] == 1
+    assert [(i, j) for i, j, _ in assign(bots, orders, layout)] == [(0, 1), (1, 0)]
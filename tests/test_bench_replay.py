@@ -0,0 +1,22 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_fast_replay_has_no_lock_errors(tmp_path):
+    # Tick commits run on the scheduler's worker thread in fast mode too, so order
+    # creation holding a write transaction on the loop never deadlocks them
+    output = tmp_path / "result.json"
+    run = subprocess.run(
+        [sys.executable, "bench_replay.py", "--clock", "fast", "--hours", "0.5", "--rate", "60",
+         "--seed", "3", "--verbose", "--output", str(output)],
+        cwd=ROOT, capture_output=True, text=True, timeout=300,
+    )
+
+    assert run.returncode == 0, run.stderr[-2000:]
+    assert "database is locked" not in run.stdout + run.stderr
+    orders = json.loads(output.read_text())["orders"]
+    assert orders["created"] == orders["arrived"]
@@ -0,0 +1,86 @@
+import asyncio
+import json
+
+import pytest
+
+import bot_stream as bot_stream_module
+from bot_stream import BotStreamPublisher
+from snapshot_cache import SnapshotCache
+
+
+class FakeSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+
+def place(cache, bot_id, x, y, status="idle"):
+    cache.apply("bot", bot_id, {"x": x, "y": y, "current_location_z": 0, "status": status})
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = SnapshotCache()
+    cache.loaded = True
+    monkeypatch.setattr(bot_stream_module, "snapshot_cache", cache)
+    return cache
+
+
+def test_deltas_are_numbered_without_gaps(cache):
+    stream = BotStreamPublisher()
+    place(cache, 1, 0, 0)
+
+    first = stream.diff()
+    assert stream.diff() is None  # nothing changed: no message, no sequence number used
+    place(cache, 1, 1, 0)
+    second = stream.diff()
+
+    assert (first["seq"], second["seq"]) == (1, 2)
+    assert stream.seq == 2
+
+
+def test_delta_holds_only_changed_bots_and_fields(cache):
+    stream = BotStreamPublisher()
+    place(cache, 1, 0, 0)
+    place(cache, 2, 3, 3)
+    stream.diff()
+
+    place(cache, 2, 3, 4, status="moving")
+    cache.apply("bot", 3, None)  # never published: no removal either
+    delta = stream.diff()
+
+    assert delta["event"] == "bots_delta"
+    assert delta["bots"] == [{"id": 2, "y": 4, "status": "moving"}]
+    assert delta["removed"] == []
+
+    cache.apply("bot", 1, None)
+    assert stream.diff()["removed"] == [1]
+
+
+def test_subscribers_get_a_snapshot_first_and_on_resync(cache):
+    stream = BotStreamPublisher()
+    place(cache, 1, 0, 0)
+    socket = FakeSocket()
+
+    async def scenario():
+        await stream.subscribe(socket)
+        place(cache, 1, 1, 0)
+        await stream.publish()
+        await stream.send_snapshot(socket)  # the client asked for a resync
+        await asyncio.sleep(0)
+        stream.unsubscribe(socket)
+
+    asyncio.run(scenario())
+
+    snapshot, delta, resync = socket.sent
+    assert snapshot["event"] == "bots_update" and snapshot["seq"] == 1
+    assert [(bot["id"], bot["x"]) for bot in snapshot["bots"]] == [(1, 0)]
+    assert delta == {"event": "bots_delta", "seq": 2, "bots": [{"id": 1, "x": 1}], "removed": []}
+    assert resync["event"] == "bots_update" and resync["seq"] == 2
+    assert [(bot["id"], bot["x"]) for bot in resync["bots"]] == [(1, 1)]
+    assert (stream.deltas_sent, stream.snapshots_sent) == (1, 2)
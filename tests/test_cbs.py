@@ -0,0 +1,93 @@
+import pytest
+
+from joint_planner import JointPlanner
+from utils import cbs as cbs_module
+from utils.cbs import cbs, find_conflicts
+from utils.grid_layout import GridLayout
+from utils.occupancy import OccupancyIndex
+from utils.pick_sequence import grid_distance
+
+
+def assert_valid(paths, agents, layout):
+    assert find_conflicts(paths) == []
+    for path, (start, goal) in zip(paths, agents):
+        assert path[0] == start and path[-1] == goal
+        for a, b in zip(path, path[1:]):
+            assert a == b or b in layout.neighbors(*a)
+
+
+def test_swap_uses_the_side_pocket():
+    layout = GridLayout(3, 2, ports=[(2, 1)])
+    agents = [((0, 0), (2, 0)), ((2, 0), (0, 0))]
+    stats = {}
+
+    paths = cbs(agents, layout, frozenset(layout.ports), stats=stats)
+
+    assert stats["solved"]
+    assert_valid(paths, agents, layout)
+
+
+@pytest.mark.parametrize("suboptimality", [1.2, 1.5, 2.0])
+def test_crossing_fleet_stays_within_the_bound(suboptimality):
+    layout = GridLayout(5, 5, ports=[(4, 4)])
+    agents = [((0, 2), (4, 2)), ((4, 2), (0, 2)), ((2, 0), (2, 4)), ((2, 4), (2, 0)), ((0, 0), (4, 0))]
+    blocked = frozenset(layout.ports)
+    optimal, bounded = {}, {}
+
+    cbs(agents, layout, blocked, max_nodes=500, stats=optimal)
+    paths = cbs(agents, layout, blocked, max_nodes=500, suboptimality=suboptimality, stats=bounded)
+
+    assert optimal["solved"] and bounded["solved"]
+    assert_valid(paths, agents, layout)
+    assert optimal["cost"] >= sum(grid_distance(start, goal, layout) for start, goal in agents)
+    assert bounded["cost"] <= suboptimality * optimal["cost"]
+
+
+def test_search_is_deterministic():
+    layout = GridLayout(5, 5, ports=[(4, 4)])
+    agents = [((0, 2), (4, 2)), ((4, 2), (0, 2)), ((2, 0), (2, 4))]
+
+    runs = [cbs(agents, layout, frozenset(layout.ports), suboptimality=1.5) for _ in range(3)]
+
+    assert runs[0] == runs[1] == runs[2]
+
+
+def test_head_on_in_a_corridor_has_no_joint_solution():
+    layout = GridLayout(5, 1, ports=[(4, 0)])
+    stats = {}
+
+    paths = cbs([((0, 0), (3, 0)), ((3, 0), (0, 0))], layout, frozenset(layout.ports), max_nodes=50, stats=stats)
+
+    assert paths is None
+    assert stats == {"nodes": 50, "solved": False}
+
+
+
+def test_failed_root_replan_has_no_solution(monkeypatch):
+    layout = GridLayout(3, 2, ports=[(2, 1)])
+    search = cbs_module.space_time_astar
+    calls = []
+
+    def first_pass_only(*args, **kwargs):
+        calls.append(args[:2])
+        return search(*args, **kwargs) if len(calls) <= 2 else None
+
+    monkeypatch.setattr(cbs_module, "space_time_astar", first_pass_only)
+
+    assert cbs([((0, 0), (2, 0)), ((2, 0), (0, 0))], layout, frozenset(layout.ports)) is None
+    assert len(calls) == 3
+
+def test_joint_planner_falls_back_to_sequential_plans():
+    layout = GridLayout(5, 1, ports=[(4, 0)])
+    occupancy = OccupancyIndex(layout)
+    occupancy.place_bot(1, 0, 0)
+    occupancy.place_bot(2, 3, 0)
+    planner = JointPlanner(max_nodes=50)
+    planner.request(1, (3, 0))
+    planner.request(2, (0, 0))
+
+    planner.replan(0, occupancy, layout)
+
+    assert planner.failures == 1 and planner.replans == 1
+    assert planner.plans[1][0] == (0, 0) and planner.plans[2][0] == (3, 0)
+    assert all(cell != (4, 0) for plan in planner.plans.values() for cell in plan)
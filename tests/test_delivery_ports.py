@@ -0,0 +1,86 @@
+from delivery_ports import DeliveryPorts
+from utils.grid_layout import GridLayout
+from utils.occupancy import OccupancyIndex
+
+
+def ports_for(layout):
+    ports = DeliveryPorts()
+    ports.configure(layout, tick_interval=1.0)
+    return ports
+
+
+def test_orders_go_to_the_port_with_the_least_expected_wait():
+    layout = GridLayout(6, 1, ports=[(0, 0, 2.0), (5, 0, 2.0)])
+    ports = ports_for(layout)
+
+    # Nearest port first
+    assert ports.route(1, [(1, 0)], layout) == (0, 0)
+    assert ports.ports[(0, 0)].promised == {1: 1}
+    # Promised picking makes the far port cheaper: 6 steps of travel vs 10s promised
+    ports.ports[(0, 0)].promised[1] = 5
+    assert ports.route(2, [(2, 0)], layout) == (5, 0)
+    assert ports.best_port([(2, 0)], layout, exclude=[(5, 0)]) == (0, 0)
+    assert ports.best_port([(2, 0)], layout, exclude=[(0, 0), (5, 0)]) is None
+
+
+def test_slow_ports_cost_their_service_time():
+    layout = GridLayout(6, 1, ports=[(0, 0, 30.0), (5, 0, 2.0)])
+    ports = ports_for(layout)
+
+    assert ports.route(1, [(1, 0)], layout) == (5, 0)
+    assert ports.service_seconds((0, 0), layout) == 30.0
+
+
+def test_bots_enter_the_port_in_arrival_order():
+    layout = GridLayout(4, 1, ports=[(3, 0)])
+    ports = ports_for(layout)
+    occupancy = OccupancyIndex(layout)
+    for bot_id in (2, 1):
+        ports.route(bot_id, [(0, 0)], layout)
+        ports.arrive((3, 0), bot_id, now=0)
+    ports.arrive((3, 0), 2, now=1)  # already queued
+
+    assert list(ports.ports[(3, 0)].queue) == [2, 1]
+    assert ports.may_enter((3, 0), 2, occupancy)
+    assert not ports.may_enter((3, 0), 1, occupancy)
+
+    # The head still waits while another bot stands on the port cell
+    occupancy.place_bot(9, 3, 0)
+    assert not ports.may_enter((3, 0), 2, occupancy)
+    occupancy.remove_bot(9)
+
+    ports.begin_service((3, 0), 2, now=3)
+    ports.finish((3, 0), 2, now=5)
+    assert ports.may_enter((3, 0), 1, occupancy)
+
+    port = ports.ports[(3, 0)]
+    assert port.bins_served == 1 and port.wait_ticks == 3
+    assert port.promised == {1: 1}
+
+
+def test_release_bot_drops_it_from_every_port():
+    layout = GridLayout(6, 1, ports=[(0, 0), (5, 0)])
+    ports = ports_for(layout)
+    ports.route(1, [(1, 0)], layout)
+    ports.arrive((0, 0), 1, now=0)
+    ports.arrive((0, 0), 2, now=0)
+    ports.ports[(5, 0)].promised[1] = 2
+
+    ports.release_bot(1)
+
+    assert list(ports.ports[(0, 0)].queue) == [2]
+    assert all(1 not in port.promised for port in ports.ports.values())
+    assert ports.may_enter((0, 0), 2, OccupancyIndex(layout))
+
+
+def test_reroute_moves_the_promised_bins_to_another_port():
+    layout = GridLayout(6, 1, ports=[(0, 0), (5, 0)])
+    ports = ports_for(layout)
+    ports.route(1, [(1, 0), (2, 0)], layout)
+    ports.arrive((0, 0), 1, now=0)
+
+    assert ports.reroute((0, 0), 1, [(1, 0), (2, 0)], layout, now=4) == (5, 0)
+    assert not ports.ports[(0, 0)].queue and not ports.ports[(0, 0)].promised
+    assert ports.ports[(5, 0)].promised == {1: 2}
+    assert ports.reroute((5, 0), 1, [(1, 0)], layout, now=5, exclude=[(0, 0)]) is None
+    assert ports.ports[(5, 0)].promised == {1: 2}
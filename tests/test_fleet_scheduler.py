@@ -0,0 +1,142 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import models.bin_locks, models.orders, models.products  # noqa: F401 - tables for create_all
+from db.database import Base
+from fleet_scheduler import FleetScheduler
+from models.bins import Bin
+from models.bots import Bot
+from utils import astar
+from utils.astar import ReservationTable
+from utils.grid_layout import GridLayout
+from utils.occupancy import OccupancyIndex
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'fleet.db'}")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine, expire_on_commit=False)
+    db = Session()
+    db.add_all([Bot(id=1, x=0, y=0, status="idle"), Bot(id=2, x=3, y=3, status="idle"),
+                Bin(id=1, x=0, y=0, z_location=0, status="available")])
+    db.commit()
+    db.close()
+    yield Session
+    engine.dispose()
+
+
+@pytest.fixture
+def scheduler(session_factory, monkeypatch):
+    monkeypatch.setattr(astar, "reservation_table", ReservationTable(window_size=5))
+    scheduler = FleetScheduler()
+    scheduler.db = session_factory()
+    scheduler.occupancy = OccupancyIndex(GridLayout(4, 4, ports=[(3, 0)]))
+    scheduler.occupancy.rebuild(scheduler.db.query(Bot).all(), scheduler.db.query(Bin).all())
+    yield scheduler
+    scheduler.db.close()
+
+
+def carry_bin(scheduler, bot_id, cells):
+    bot = scheduler.db.get(Bot, bot_id)
+    bot.status = "carrying"
+    bot.carried_bin_id = 1
+    yield
+    for x, y in cells:
+        scheduler.move_bot(bot, x, y)
+        yield
+    bot.status = "idle"
+    bot.carried_bin_id = None
+
+
+def run(scheduler, ticks):
+    async def steps():
+        for _ in range(ticks):
+            await scheduler.step()
+    asyncio.run(steps())
+
+
+def test_missions_finish_when_a_commit_fails(scheduler, session_factory):
+    db = scheduler.db
+    commit = db.commit
+    failures = []
+
+    def flaky_commit():
+        # The last move and the end of the mission
+        if scheduler.now in (5, 6):
+            failures.append(scheduler.now)
+            raise RuntimeError("database is locked")
+        commit()
+
+    db.commit = flaky_commit
+    scheduler.submit(1, carry_bin(scheduler, 1, [(1, 0), (2, 0), (2, 1), (2, 2)]))
+
+    run(scheduler, ticks=8)
+
+    assert failures == [5, 6]
+    assert not scheduler.missions
+    assert scheduler.occupancy.bot_cells[1] == (2, 2)
+    bot = db.get(Bot, 1)
+    assert (bot.x, bot.y, bot.status, bot.carried_bin_id) == (2, 2, "idle", None)
+    check = session_factory()
+    bot, bin_obj = check.get(Bot, 1), check.get(Bin, 1)
+    assert (bot.x, bot.y, bot.status, bot.carried_bin_id) == (2, 2, "idle", None)
+    assert (bin_obj.x, bin_obj.y) == (2, 2)
+    check.close()
+
+
+def test_replacing_a_mission_closes_it(scheduler, caplog):
+    closed = []
+
+    def make_way():
+        try:
+            while True:
+                yield
+        finally:
+            closed.append("make_way")
+
+    scheduler.submit(2, make_way(), preemptible=True)
+    run(scheduler, ticks=1)
+    scheduler.submit(2, carry_bin(scheduler, 2, [(3, 2)]))
+
+    assert closed == ["make_way"]
+    assert "already has a mission" not in caplog.text
+    run(scheduler, ticks=3)
+    assert not scheduler.missions
+    assert scheduler.occupancy.bot_cells[2] == (3, 2)
+
+
+def staged(scheduler, *moves):
+    """Place bots and stage their moves: (bot_id, (x, y) now, (x, y) next); next None stays put."""
+    scheduler.occupancy = OccupancyIndex(GridLayout(4, 1, ports=[(3, 0)]))
+    staged_moves = []
+    for bot_id, source, target in moves:
+        scheduler.occupancy.place_bot(bot_id, *source)
+        if target is not None:
+            staged_moves.append((SimpleNamespace(id=bot_id, x=source[0], y=source[1]), *target, 0))
+    return sorted(bot.id for bot, _, _, _ in scheduler._resolve_conflicts(staged_moves))
+
+
+def test_swapping_bots_are_both_held(scheduler):
+    assert staged(scheduler, (1, (0, 0), (1, 0)), (2, (1, 0), (0, 0))) == []
+    assert scheduler.conflicts_held == 2
+
+
+def test_a_bot_may_follow_another_into_the_cell_it_leaves(scheduler):
+    assert staged(scheduler, (1, (0, 0), (1, 0)), (2, (1, 0), (2, 0))) == [1, 2]
+    assert scheduler.conflicts_held == 0
+
+
+def test_holding_a_bot_holds_the_bot_following_it(scheduler):
+    moves = [(1, (0, 0), (1, 0)), (2, (1, 0), (2, 0)), (3, (2, 0), None)]
+    assert staged(scheduler, *moves) == []
+    assert scheduler.conflicts_held == 2
+
+
+def test_head_on_bots_entering_one_cell_let_the_first_through(scheduler):
+    assert staged(scheduler, (1, (0, 0), (1, 0)), (2, (2, 0), (1, 0))) == [1]
+    assert scheduler.conflicts_held == 1
@@ -0,0 +1,38 @@
+from utils.grid_layout import GridLayout
+from utils.heuristics import HeuristicCache, descend, reverse_bfs
+
+
+def test_heuristic_maps_are_kept_per_layout():
+    cache = HeuristicCache()
+    first, second = GridLayout(4, 4), GridLayout(4, 4, blocked=[(1, 0), (1, 1), (1, 2)])
+
+    for _ in range(2):
+        open_map = cache.get((0, 0), first)
+        walled_map = cache.get((0, 0), second)
+
+    assert cache.misses == 2 and cache.hits == 2
+    assert open_map[2, 0] == 2
+    assert walled_map[2, 0] == 8  # around the wall through row 3
+
+
+def test_least_recently_used_map_is_evicted():
+    cache = HeuristicCache(max_goals=2)
+    layout = GridLayout(3, 3)
+    cache.get((0, 0), layout)
+    cache.get((1, 1), layout)
+    cache.get((0, 0), layout)
+
+    cache.get((2, 2), layout)
+
+    assert set(cache.maps) == {(layout.version, (0, 0), frozenset()), (layout.version, (2, 2), frozenset())}
+
+
+def test_blocked_cells_get_a_distance_but_are_not_passed_through():
+    layout = GridLayout(3, 3)
+
+    distances = reverse_bfs((0, 0), layout, frozenset({(1, 0), (1, 1)}))
+
+    assert distances[1, 0] == 1  # a bot on it can still step off
+    assert distances[2, 0] == 6  # around through row 2
+    assert descend((2, 0), (0, 0), layout, distances, frozenset({(1, 0), (1, 1)})) == [
+        (2, 1), (2, 2), (1, 2), (0, 2), (0, 1), (0, 0)]
@@ -0,0 +1,90 @@
+import pytest
+
+from utils import astar
+from utils.astar import ReservationTable, cached_whca_star, hold_position
+from utils.grid_layout import GridLayout
+from utils.path_cache import PathCache
+
+
+@pytest.fixture
+def table(monkeypatch):
+    table = ReservationTable(window_size=5)
+    monkeypatch.setattr(astar, "reservation_table", table)
+    return table
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = PathCache(max_routes=8)
+    monkeypatch.setattr(astar, "path_cache", cache)
+    return cache
+
+
+def test_miss_builds_the_route_and_hit_reuses_it(cache):
+    layout = GridLayout(4, 4)
+
+    route = cache.get((0, 0), (3, 2), layout)
+
+    assert route[0] == (0, 0) and route[-1] == (3, 2) and len(route) == 6
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert cache.get((0, 0), (3, 2), layout) is route
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_blocked_cells_are_part_of_the_key(cache):
+    layout = GridLayout(4, 4)
+    open_route = cache.get((0, 0), (2, 0), layout)
+
+    detour = cache.get((0, 0), (2, 0), layout, blocked=frozenset({(1, 0)}))
+
+    assert open_route == ((0, 0), (1, 0), (2, 0))
+    assert (1, 0) not in detour and len(detour) == 5
+    assert cache.misses == 2
+
+
+def test_unreachable_goal_is_none(cache):
+    layout = GridLayout(3, 3, blocked=[(1, 0), (1, 1), (1, 2)])
+
+    assert cache.get((0, 0), (2, 2), layout) is None
+
+
+def test_least_recently_used_route_is_evicted(cache):
+    layout = GridLayout(4, 4)
+    goals = [(x, y) for x in range(3) for y in range(3)]  # one more than max_routes
+    for goal in goals[:8]:
+        cache.get((3, 3), goal, layout)
+    cache.get((3, 3), goals[0], layout)  # now the most recently used
+
+    cache.get((3, 3), goals[8], layout)
+
+    assert len(cache.routes) == 8
+    assert ((3, 3), goals[1], frozenset(), layout.version) not in cache.routes
+    assert ((3, 3), goals[0], frozenset(), layout.version) in cache.routes
+
+
+def test_layout_change_misses_without_clearing_the_cache(cache):
+    layout = GridLayout(4, 4)
+    other = GridLayout(4, 4)
+    cache.get((0, 0), (2, 0), layout)
+    cache.get((0, 0), (3, 3), other)
+
+    layout.set_blocked([(1, 0)])
+    detour = cache.get((0, 0), (2, 0), layout)
+
+    assert (1, 0) not in detour
+    assert cache.misses == 3
+    # The other layout's route is still cached; the stale one ages out of the LRU
+    assert cache.get((0, 0), (3, 3), other) is not None and cache.hits == 1
+    assert len(cache.routes) == 3
+
+
+def test_repair_never_doubles_back_over_the_kept_route(table, cache):
+    layout = GridLayout(6, 6, ports=[(5, 0)])
+    cache.routes[((4, 5), (5, 0), frozenset(), layout.version)] = ((4, 5), (5, 5), (5, 4), (5, 3), (5, 2), (5, 1), (5, 0))
+    hold_position(2, (5, 4), 0)  # an idle bot on the cached route
+
+    path = cached_whca_star((4, 5), (5, 0), layout, bot_id=1)
+
+    assert path[0] == (4, 5) and path[-1] == (5, 0)
+    assert (5, 4) not in path
+    assert path.count((4, 5)) == 1
@@ -0,0 +1,36 @@
+import itertools
+import random
+
+import pytest
+
+from utils.grid_layout import GridLayout
+from utils.pick_sequence import BinVisit, route_length, sequence_visits
+
+LAYOUT = GridLayout(8, 8, ports=[(7, 0)])
+START, PORT, END = (0, 7), (7, 0), (0, 6)
+
+
+def cost(visits, returns):
+    return route_length(START, [v.cell for v in visits], PORT, END, LAYOUT, [returns[v.bin_id] for v in visits])
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_sequence_plans_from_the_return_columns(seed):
+    rng = random.Random(seed)
+    count = rng.randint(2, 6)
+    cells = rng.sample([(x, y) for x in range(7) for y in range(8)], 2 * count)
+    visits = [BinVisit(i, cells[i], []) for i in range(count)]
+    returns = {i: cells[count + i] for i in range(count)}
+    best = min(cost(order, returns) for order in itertools.permutations(visits))
+
+    exact = sequence_visits(START, visits, PORT, END, LAYOUT, returns=returns)
+    heuristic = sequence_visits(START, visits, PORT, END, LAYOUT, exact_limit=0, returns=returns)
+
+    assert cost(exact, returns) == best
+    assert sorted(v.bin_id for v in heuristic) == list(range(count))
+    assert cost(heuristic, returns) >= best
+
+
+def test_route_length_counts_the_port_and_return_legs():
+    # start -> bin (3) -> port (4 + 3) -> return column (4) -> end (3 + 3)
+    assert route_length((0, 0), [(3, 0)], (7, 3), (0, 0), LAYOUT, [(3, 3)]) == 3 + 7 + 4 + 6
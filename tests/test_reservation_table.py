@@ -0,0 +1,85 @@
+import pytest
+
+from utils import astar
+from utils.astar import ReservationTable, whca_star
+from utils.grid_layout import GridLayout
+
+
+@pytest.fixture
+def table(monkeypatch):
+    table = ReservationTable(window_size=5)
+    monkeypatch.setattr(astar, "reservation_table", table)
+    return table
+
+
+def test_release_before_keeps_the_window_ahead(table):
+    for t in range(6):
+        table.reserve_cell(t, 0, t, bot_id=1)
+    table.reserve_cell(0, 1, 1, bot_id=2)
+
+    table.release_before(1, 3)
+
+    assert sorted(table.get_bot_reservations(1)) == [(3, 0, 3), (4, 0, 4), (5, 0, 5)]
+    assert table.get_bot_reservations(2) == [(0, 1, 1)]
+    assert len(table) == 4
+    assert not table.is_reserved(1, 0, 1, bot_id=2)
+
+
+def test_release_bot_only_touches_its_own_cells(table):
+    table.reserve_cell(0, 0, 1, bot_id=1)
+    table.reserve_cell(1, 0, 2, bot_id=1)
+    table.reserve_cell(1, 0, 1, bot_id=2)
+
+    table.release_bot(1)
+
+    assert table.get_bot_reservations(1) == []
+    assert table.is_reserved(1, 0, 1, bot_id=1)
+    assert len(table) == 1
+    table.release_bot(1)  # releasing again is a no-op
+    assert len(table) == 1
+
+
+def test_vertex_conflict_is_refused(table):
+    assert table.reserve_cell(2, 2, 4, bot_id=1)
+    assert not table.reserve_cell(2, 2, 4, bot_id=2)
+    assert table.reserve_cell(2, 2, 4, bot_id=1)  # a bot may re-reserve its own cell
+    assert table.is_reserved(2, 2, 4, bot_id=2)
+    assert not table.is_reserved(2, 2, 5, bot_id=2)
+
+
+def test_swap_is_refused(table):
+    # Bot 1 moves (0, 0) -> (1, 0) at t=1; bot 2 may not move (1, 0) -> (0, 0) at the same time
+    assert table.reserve_cell(1, 0, 1, bot_id=1, from_cell=(0, 0))
+    assert not table.reserve_cell(0, 0, 1, bot_id=2, from_cell=(1, 0))
+
+
+def test_expired_buckets_are_dropped(table):
+    table.reserve_cell(0, 0, 1, bot_id=1)
+    table.reserve_cell(0, 0, 9, bot_id=1)
+
+    table.clear_expired_reservations(10)
+
+    assert table.get_bot_reservations(1) == [(0, 0, 9)]
+    assert len(table) == 1
+
+
+def test_rolling_horizon_reserves_only_the_window(table):
+    layout = GridLayout(20, 1, ports=[(19, 0)])
+
+    path = whca_star((0, 0), (19, 0), layout, bot_id=1, current_time=0)
+
+    assert path == [(x, 0) for x in range(20)]
+    reserved_times = {t for _, _, t in table.get_bot_reservations(1)}
+    assert reserved_times == set(range(table.window_size + 1))
+
+
+def test_route_waits_for_a_reserved_cell(table):
+    layout = GridLayout(5, 1, ports=[(4, 0)])
+    table.reserve_cell(2, 0, 2, bot_id=2)
+
+    path = whca_star((0, 0), (4, 0), layout, bot_id=1, current_time=0)
+
+    assert path[0] == (0, 0) and path[-1] == (4, 0)
+    assert path[2] != (2, 0)
+    for t, (x, y) in enumerate(path):
+        assert not table.is_reserved(x, y, t, bot_id=1)
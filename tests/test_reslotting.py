@@ -0,0 +1,116 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from reslotter import BinReslotter
+from utils.grid_layout import GridLayout
+from utils.occupancy import OccupancyIndex
+from utils.reslotting import BinDemand, plan_migrations, plan_return
+
+
+def stacked(layout, columns):
+    """Occupancy with {cell: [bin ids, bottom first]}."""
+    occupancy = OccupancyIndex(layout)
+    for cell, bins in columns.items():
+        for bin_id in bins:
+            occupancy.add_bin(bin_id, *cell)
+    return occupancy
+
+
+def test_demand_decays_with_its_half_life():
+    demand = BinDemand(half_life=10.0)
+    demand.record(1, 4.0, now=0.0)
+    demand.record(1, 1.0, now=10.0)
+
+    assert demand.score(1, now=10.0) == pytest.approx(3.0)
+    assert demand.scores(now=20.0) == {1: pytest.approx(1.5)}
+    assert demand.score(2, now=20.0) == 0.0
+
+
+def test_hot_bin_moves_to_the_top_of_a_stack_near_the_port():
+    layout = GridLayout(5, 1, stack_height=4, ports=[(4, 0)])
+    occupancy = stacked(layout, {(0, 0): [1, 2], (3, 0): [3]})
+
+    moves = plan_migrations(occupancy, {1: 5.0}, port=(4, 0))
+
+    assert len(moves) == 1
+    move = moves[0]
+    assert (move.bin_id, move.source) == (1, (0, 0))
+    # (3, 0) would bury a cold bin, which costs nothing: the nearest column wins
+    assert move.target == (3, 0)
+    assert move.gain > 0
+
+
+def test_cold_or_excluded_bins_stay_put():
+    layout = GridLayout(5, 1, stack_height=4, ports=[(4, 0)])
+    occupancy = stacked(layout, {(0, 0): [1], (3, 0): [2]})
+
+    assert plan_migrations(occupancy, {2: 5.0}, port=(4, 0)) == []  # already next to the port
+    assert plan_migrations(occupancy, {1: 5.0}, port=(4, 0), exclude=[1]) == []
+    assert plan_migrations(occupancy, {1: 0.01}, port=(4, 0)) == []  # gain below min_gain
+
+
+def test_burying_a_hot_bin_is_avoided():
+    layout = GridLayout(5, 1, stack_height=4, ports=[(4, 0)])
+    occupancy = stacked(layout, {(0, 0): [1], (3, 0): [2]})
+
+    moves = plan_migrations(occupancy, {1: 5.0, 2: 50.0}, port=(4, 0), exclude=[2])
+
+    assert [move.target for move in moves] == [(2, 0)]
+
+
+def test_plans_run_on_the_worker_and_migrations_start_on_the_loop():
+    threads = {}
+
+    def cycle(view):
+        threads["cycle"] = threading.current_thread()
+        return [("migration", view)]
+
+    def launch(planned):
+        threads["launch"] = threading.current_thread()
+        return len(planned)
+
+    async def scenario():
+        executor = ThreadPoolExecutor(max_workers=1)
+
+        async def offload(fn, *args):
+            return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+        reslotter = BinReslotter(cycle, offload=offload, prepare=lambda: 7, launch=launch)
+        started = await reslotter.run_pass()
+        executor.shutdown()
+        return reslotter, started
+
+    reslotter, started = asyncio.run(scenario())
+
+    assert started == 1 and reslotter.migrations_started == 1
+    assert threads["cycle"] is not threading.main_thread()
+    assert threads["launch"] is threading.main_thread()
+
+
+def test_hot_bins_return_near_the_port_and_cold_ones_near_the_next_stop():
+    layout = GridLayout(5, 1, stack_height=4, ports=[(4, 0)])
+    occupancy = stacked(layout, {})
+
+    assert plan_return(occupancy, {1: 5.0}, 1, port=(4, 0), next_cell=(0, 0)) == (3, 0)
+    assert plan_return(occupancy, {}, 1, port=(4, 0), next_cell=(0, 0)) == (0, 0)
+
+
+def test_returns_skip_hot_stacks_full_stacks_and_avoided_cells():
+    layout = GridLayout(5, 1, stack_height=2, ports=[(4, 0)])
+    occupancy = stacked(layout, {(3, 0): [2]})
+
+    # Burying hot bin 2 costs more than the extra travel
+    assert plan_return(occupancy, {2: 50.0}, 1, port=(4, 0)) == (2, 0)
+    occupancy = stacked(layout, {(3, 0): [2, 3]})
+    assert plan_return(occupancy, {}, 1, port=(4, 0)) == (2, 0)
+    assert plan_return(occupancy, {}, 1, port=(4, 0), avoid=[(2, 0)]) == (1, 0)
+
+
+def test_no_return_column_when_every_stack_is_full():
+    layout = GridLayout(3, 1, stack_height=1, ports=[(2, 0)])
+    occupancy = stacked(layout, {(0, 0): [2], (1, 0): [3]})
+
+    assert plan_return(occupancy, {}, 1, port=(2, 0)) is None
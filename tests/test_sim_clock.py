@@ -0,0 +1,92 @@
+import asyncio
+import time
+
+import pytest
+
+from sim_clock import SimClock
+
+
+def test_realtime_clock_follows_the_wall_clock():
+    clock = SimClock("realtime")
+
+    async def scenario():
+        wall = time.monotonic()
+        await clock.sleep(0.05)
+        return time.monotonic() - wall
+
+    waited = asyncio.run(scenario())
+    assert waited >= 0.05
+    assert clock.now() == pytest.approx(waited, abs=0.02)
+    assert clock.wall_seconds(2.0) == 2.0
+
+
+def test_scaled_clock_runs_scale_times_faster():
+    clock = SimClock("scaled", scale=100)
+
+    async def scenario():
+        wall = time.monotonic()
+        await clock.sleep(5.0)  # 50ms of wall time
+        return time.monotonic() - wall
+
+    waited = asyncio.run(scenario())
+    assert 0.05 <= waited < 1.0
+    assert clock.now() >= 5.0
+    assert clock.wall_seconds(5.0) == pytest.approx(0.05)
+
+
+def test_fast_clock_jumps_to_each_deadline_in_order():
+    clock = SimClock("fast")
+    woken = []
+
+    async def sleeper(name, seconds):
+        await clock.sleep(seconds)
+        woken.append((name, clock.now()))
+
+    async def scenario():
+        wall = time.monotonic()
+        await asyncio.gather(sleeper("b", 3600), sleeper("a", 60), sleeper("c", 3600))
+        await clock.sleep_until(30)  # already past: returns at once
+        await clock.stop()
+        return time.monotonic() - wall
+
+    assert asyncio.run(scenario()) < 1.0
+    assert woken == [("a", 60.0), ("b", 3600.0), ("c", 3600.0)]
+    assert clock.now() == 3600.0 and clock.jumps == 2
+    assert clock.wall_seconds(3600) == 0.0
+
+
+def test_fast_clock_holds_still_while_busy():
+    clock = SimClock("fast")
+
+    async def worker():
+        async with clock.busy():
+            await asyncio.sleep(0.02)  # real I/O: simulated time must not move
+            return clock.now()
+
+    async def scenario():
+        ticker = asyncio.create_task(clock.sleep(10))
+        seen = await worker()
+        await ticker
+        await clock.stop()
+        return seen
+
+    assert asyncio.run(scenario()) == 0.0
+    assert clock.now() == 10.0
+
+
+def test_rng_is_deterministic_per_seed():
+    first, second = SimClock("fast", seed=7), SimClock(seed=7)
+    draws = [first.rng.random() for _ in range(5)]
+
+    assert draws == [second.rng.random() for _ in range(5)]
+    assert draws != [SimClock(seed=8).rng.random() for _ in range(5)]
+    first.reset(seed=7)
+    assert [first.rng.random() for _ in range(5)] == draws
+    assert first.now() == 0.0
+
+
+def test_invalid_modes_are_rejected():
+    with pytest.raises(ValueError):
+        SimClock("warp")
+    with pytest.raises(ValueError):
+        SimClock("scaled", scale=0)
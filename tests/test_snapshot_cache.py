@@ -0,0 +1,93 @@
+import json
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from starlette.requests import Request
+
+import models.orders, models.products  # noqa: F401 - tables for create_all
+import snapshot_cache as snapshot_module
+from db.database import Base
+from models.bin_locks import BinLock
+from models.bins import Bin
+from models.bots import Bot
+from snapshot_cache import SnapshotCache
+
+
+def request(etag=None):
+    headers = [(b"if-none-match", etag.encode())] if etag else []
+    return Request({"type": "http", "method": "GET", "path": "/bots/", "headers": headers})
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = SnapshotCache()
+    cache.loaded = True  # rows come from apply() and the session hooks, not the app database
+    monkeypatch.setattr(snapshot_module, "snapshot_cache", cache)
+    return cache
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'snapshot.db'}")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def test_if_none_match_with_the_current_etag_is_not_modified(cache):
+    cache.apply("bot", 1, {"x": 0, "y": 0, "current_location_z": 0, "status": "idle"})
+    first = cache.respond(request(), "bots")
+
+    again = cache.respond(request(first.headers["etag"]), "bots")
+
+    assert first.status_code == 200
+    assert json.loads(first.body)[0]["status"] == "idle"
+    assert again.status_code == 304 and again.body == b""
+    assert again.headers["etag"] == first.headers["etag"]
+    assert (cache.hits, cache.not_modified) == (1, 1)
+
+
+def test_etag_lists_and_wildcards_match(cache):
+    etag = cache.respond(request(), "bins").headers["etag"]
+
+    assert cache.respond(request(f'"other", W/{etag}'), "bins").status_code == 304
+    assert cache.respond(request("*"), "bins").status_code == 304
+    assert cache.respond(request('"bins-0-0"'), "bins").status_code == 200
+
+
+def test_etag_changes_only_when_the_rows_change(cache):
+    cache.apply("bot", 1, {"x": 0, "y": 0, "current_location_z": 0, "status": "idle"})
+    etag = cache.respond(request(), "bots").headers["etag"]
+
+    cache.bot_moved(1, 0, 0, 0)  # same position: no new version
+    assert cache.respond(request(etag), "bots").status_code == 304
+
+    cache.bot_moved(1, 1, 0, 0)
+    moved = cache.respond(request(etag), "bots")
+    assert moved.status_code == 200
+    assert moved.headers["etag"] != etag
+    assert json.loads(moved.body)[0]["x"] == 1
+
+
+def test_committed_changes_reach_the_snapshot_and_rolled_back_ones_do_not(cache, db):
+    db.add_all([Bot(id=1, x=0, y=0, status="idle"), Bin(id=7, x=2, y=2, z_location=0, status="available")])
+    db.commit()
+    bots_etag = cache.respond(request(), "bots").headers["etag"]
+    bins_etag = cache.respond(request(), "bins").headers["etag"]
+
+    db.get(Bot, 1).status = "moving"
+    db.flush()
+    db.rollback()
+    assert cache.respond(request(bots_etag), "bots").status_code == 304
+
+    db.get(Bot, 1).status = "moving"
+    db.add(BinLock(id=7, used_by=1, status="Locked"))
+    db.commit()
+
+    bots = cache.respond(request(bots_etag), "bots")
+    bins = cache.respond(request(bins_etag), "bins")
+    assert bots.status_code == 200 and json.loads(bots.body)[0]["status"] == "moving"
+    assert bins.status_code == 200 and json.loads(bins.body)[0]["status"] == "locked"
@@ -0,0 +1,61 @@
+from utils.grid_layout import GridLayout
+from utils.occupancy import OccupancyIndex
+from utils.stacks import plan_dig_out, relocation_target
+
+
+def stacked(layout, columns):
+    """Occupancy with {cell: [bin ids, bottom first]}."""
+    occupancy = OccupancyIndex(layout)
+    for cell, bins in columns.items():
+        for bin_id in bins:
+            occupancy.add_bin(bin_id, *cell)
+    return occupancy
+
+
+def test_one_rehandle_per_bin_above_topmost_first():
+    layout = GridLayout(4, 1, stack_height=4, ports=[(3, 0)])
+    occupancy = stacked(layout, {(0, 0): [1, 2, 3]})
+
+    plan = plan_dig_out(occupancy, 1, (0, 0))
+
+    assert plan.rehandles == 2
+    assert [r.bin_id for r in plan.relocations] == [3, 2]
+    assert all(r.source == (0, 0) for r in plan.relocations)
+    # Both go to the nearest column, stacking up as the plan grows; never the port
+    assert [(r.target, r.z) for r in plan.relocations] == [((1, 0), 0), ((1, 0), 1)]
+    assert plan.steps == 4
+
+
+def test_top_bin_needs_no_rehandles():
+    layout = GridLayout(3, 1, ports=[(2, 0)])
+    occupancy = stacked(layout, {(0, 0): [1, 2]})
+
+    assert plan_dig_out(occupancy, 2, (0, 0)).rehandles == 0
+
+
+def test_avoided_columns_are_not_buried():
+    layout = GridLayout(4, 1, stack_height=4, ports=[(3, 0)])
+    occupancy = stacked(layout, {(0, 0): [1, 2], (1, 0): [7]})
+
+    plan = plan_dig_out(occupancy, 1, (0, 0), avoid=[(1, 0)])
+
+    assert [r.target for r in plan.relocations] == [(2, 0)]
+    assert plan.avoid == [(1, 0)]
+
+
+def test_no_free_capacity_returns_none():
+    layout = GridLayout(3, 1, stack_height=2, ports=[(2, 0)])
+    # The only other storage column is full
+    occupancy = stacked(layout, {(0, 0): [1, 2], (1, 0): [3, 4]})
+
+    assert plan_dig_out(occupancy, 1, (0, 0)) is None
+    assert relocation_target(occupancy, (0, 0)) is None
+
+
+def test_capacity_runs_out_part_way_through_the_plan():
+    layout = GridLayout(3, 1, stack_height=3, ports=[(2, 0)])
+    occupancy = stacked(layout, {(0, 0): [1, 2, 3], (1, 0): [4, 5]})
+
+    # Room for one blocker, but two are on top of bin 1
+    assert plan_dig_out(occupancy, 1, (0, 0)) is None
+    assert plan_dig_out(occupancy, 2, (0, 0)).rehandles == 1
@@ -0,0 +1,92 @@
+import asyncio
+import json
+
+from ws_manager import ConnectionManager
+
+
+class FakeSocket:
+    def __init__(self, blocked=False):
+        self.sent = []
+        self.unblocked = asyncio.Event()
+        if not blocked:
+            self.unblocked.set()
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        await self.unblocked.wait()
+        self.sent.append(json.loads(text))
+
+
+class DeadSocket(FakeSocket):
+    async def send_text(self, text):
+        raise RuntimeError("connection closed")
+
+
+def move(bot_id, x):
+    return {"event": "bot_move", "bot_id": bot_id, "x": x, "y": 0}
+
+
+def test_slow_client_does_not_hold_up_the_others():
+    async def scenario():
+        manager = ConnectionManager(max_queue=4)
+        slow, fast = FakeSocket(blocked=True), FakeSocket()
+        await manager.connect(slow)
+        await manager.connect(fast)
+        for i in range(10):
+            await manager.broadcast({"event": "status_update", "order_id": i})
+            await asyncio.sleep(0)
+        return manager, slow, fast
+
+    manager, slow, fast = asyncio.run(scenario())
+
+    assert [m["order_id"] for m in fast.sent] == list(range(10))
+    client = manager.clients[slow]
+    # The first message is stuck in send_text; the queue keeps only the newest ones
+    assert len(client.queue) == 4
+    assert [json.loads(text)["order_id"] for _, text in client.queue] == [6, 7, 8, 9]
+    assert client.dropped == 5
+    assert manager.metrics()["dropped"] == 5
+
+
+def test_queued_moves_of_the_same_bot_are_coalesced():
+    async def scenario():
+        manager = ConnectionManager(max_queue=4)
+        slow = FakeSocket(blocked=True)
+        await manager.connect(slow)
+        await manager.broadcast({"event": "status_update", "order_id": 1})
+        await asyncio.sleep(0)  # the writer takes it and blocks on the socket
+        for x in range(5):
+            await manager.broadcast(move(1, x))
+        await manager.broadcast(move(2, 0))
+        client = manager.clients[slow]
+        queued = [json.loads(text) for _, text in client.queue]
+        slow.unblocked.set()
+        await asyncio.sleep(0.01)
+        return client, queued, slow
+
+    client, queued, slow = asyncio.run(scenario())
+
+    assert queued == [move(1, 4), move(2, 0)]
+    assert client.coalesced == 4 and client.dropped == 0
+    assert slow.sent == [{"event": "status_update", "order_id": 1}, move(1, 4), move(2, 0)]
+
+
+def test_dead_client_is_removed_and_the_rest_still_get_messages():
+    async def scenario():
+        manager = ConnectionManager()
+        dead, alive = DeadSocket(), FakeSocket()
+        await manager.connect(dead)
+        await manager.connect(alive)
+        await manager.broadcast(move(1, 1))
+        await asyncio.sleep(0.01)
+        await manager.broadcast(move(1, 2))
+        await asyncio.sleep(0.01)
+        return manager, dead, alive
+
+    manager, dead, alive = asyncio.run(scenario())
+
+    assert not manager.is_connected(dead)
+    assert manager.dead_removed == 1
+    assert alive.sent == [move(1, 1), move(1, 2)]
@@ -0,0 +1,85 @@
+from typing import List, Sequence, Tuple, Union
+
+import numpy as np
+
+from utils.grid_layout import GridLayout, as_layout
+from utils.heuristics import heuristic_cache
+
+Cell = Tuple[int, int]
+
+def build_cost_matrix(bot_cells: Sequence[Cell], order_bins: Sequence[Sequence[Cell]],
+                      grid: Union[GridLayout, Tuple[int, int]]) -> np.ndarray:
+    """Cost of sending each bot (rows) to each order (columns).
+
+    The cost is the true grid distance from the bot to the nearest bin of the
+    order, read for all bots at once from the cached reverse-BFS table of each
+    bin. Bins unreachable from a bot keep the table's sentinel, which dwarfs
+    any real distance.
+    """
+    layout = as_layout(grid)
+    xs = np.fromiter((c[0] for c in bot_cells), dtype=np.intp, count=len(bot_cells))
+    ys = np.fromiter((c[1] for c in bot_cells), dtype=np.intp, count=len(bot_cells))
+    cost = np.empty((len(bot_cells), len(order_bins)), dtype=np.float64)
+    for j, cells in enumerate(order_bins):
+        distances = [heuristic_cache.get(cell, layout)[xs, ys] for cell in cells]
+        cost[:, j] = np.minimum.reduce(distances) if distances else np.inf
+    return cost
+
+def hungarian(cost: np.ndarray) -> List[Tuple[int, int]]:
+    """Minimum-cost assignment of rows to columns (rectangular allowed).
+
+    Shortest-augmenting-path Hungarian algorithm, O(n^2 m), with the inner scan
+    over columns vectorized. Returns (row, column) pairs; with more rows than
+    columns (or vice versa) the surplus rows (columns) stay unassigned.
+    """
+    cost = np.asarray(cost, dtype=np.float64)
+    if cost.size == 0:
+        return []
+    transposed = cost.shape[0] > cost.shape[1]
+    if transposed:
+        cost = cost.T
+    n, m = cost.shape
+    # Potentials and matching use 1-based columns; column 0 is a virtual start
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    match = np.zeros(m + 1, dtype=np.intp)  # match[j]: row (1-based) assigned to column j, 0 if free
+    way = np.zeros(m + 1, dtype=np.intp)
+    for i in range(1, n + 1):
+        match[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = match[j0]
+            free = ~used[1:]
+            reduced = cost[i0 - 1] - u[i0] - v[1:]
+            better = free & (reduced < minv[1:])
+            minv[1:][better] = reduced[better]
+            way[1:][better] = j0
+            candidates = np.where(free, minv[1:], np.inf)
+            j1 = int(np.argmin(candidates)) + 1
+            delta = candidates[j1 - 1]
+            u[match[used]] += delta
+            v[used] -= delta
+            minv[1:][free] -= delta
+            j0 = j1
+            if match[j0] == 0:
+                break
+        # Flip the augmenting path back to the start
+        while j0:
+            j1 = way[j0]
+            match[j0] = match[j1]
+            j0 = j1
+    pairs = [(int(match[j]) - 1, j - 1) for j in range(1, m + 1) if match[j]]
+    if transposed:
+        pairs = [(col, row) for row, col in pairs]
+    return sorted(pairs)
+
+def assign(bot_cells: Sequence[Cell], order_bins: Sequence[Sequence[Cell]],
+           grid: Union[GridLayout, Tuple[int, int]]) -> List[Tuple[int, int, float]]:
+    """Batch-assign bots to orders; returns (bot index, order index, cost) triples."""
+    if not bot_cells or not order_bins:
+        return []
+    cost = build_cost_matrix(bot_cells, order_bins, grid)
+    return [(i, j, float(cost[i, j])) for i, j in hungarian(cost)]
@@ -1,80 +1,213 @@
 import heapq
-from typing import List, Tuple, Set, Optional
+from array import array
+from typing import Dict, FrozenSet, List, Tuple, Set, Optional, Union
 import time
 import random
+from utils.grid_layout import GridLayout, as_layout
+from utils.heuristics import descend, heuristic_cache
+from utils.path_cache import path_cache
 
 class ReservationTable:
-    """Tracks cell reservations for collision avoidance in WHCA*"""
+    """Tracks cell reservations for collision avoidance in WHCA*.
+
+    Reservations are bucketed by time step ({t: {(x, y): bot_id}}) and indexed
+    per bot ({bot_id: {t: {(x, y), ...}}}), so expiry drops whole buckets and
+    releasing a bot only touches that bot's own cells.
+    """
     
     def __init__(self, window_size: int = 5):
         self.window_size = window_size
-        self.reservations = {}  # {(x, y, t): bot_id}
+        self.buckets: Dict[int, Dict[Tuple[int, int], int]] = {}  # {t: {(x, y): bot_id}}
+        self.bot_index: Dict[int, Dict[int, Set[Tuple[int, int]]]] = {}  # {bot_id: {t: {(x, y)}}}
         self.bot_positions = {}  # {bot_id: (x, y, t)}
+        self._bucket_times: List[int] = []  # min-heap of bucket time steps
+        self._count = 0
+    
+    def __len__(self) -> int:
+        return self._count
+    
+    @property
+    def reservations(self) -> Dict[Tuple[int, int, int], int]:
+        """Flat {(x, y, t): bot_id} view, for debugging only."""
+        return {(x, y, t): bid for t, bucket in self.buckets.items()
+                for (x, y), bid in bucket.items()}
+    
+    def _set(self, x: int, y: int, t: int, bot_id: int):
+        bucket = self.buckets.get(t)
+        if bucket is None:
+            bucket = self.buckets[t] = {}
+            heapq.heappush(self._bucket_times, t)
+        previous = bucket.get((x, y))
+        if previous == bot_id:
+            return
+        if previous is None:
+            self._count += 1
+        else:
+            self._unindex(previous, x, y, t)
+        bucket[(x, y)] = bot_id
+        self.bot_index.setdefault(bot_id, {}).setdefault(t, set()).add((x, y))
+    
+    def _unindex(self, bot_id: int, x: int, y: int, t: int):
+        by_time = self.bot_index.get(bot_id)
+        if not by_time:
+            return
+        cells = by_time.get(t)
+        if cells is not None:
+            cells.discard((x, y))
+            if not cells:
+                del by_time[t]
+        if not by_time:
+            del self.bot_index[bot_id]
     
     def reserve_cell(self, x: int, y: int, t: int, bot_id: int, from_cell=None):
         """Reserve a cell at time t for bot_id. Returns True if successful.
         Also reserves the cell the bot is leaving (from_cell) for t as a tail reservation to prevent following and swap collisions."""
-        key = (x, y, t)
-        if key in self.reservations and self.reservations[key] != bot_id:
-            return False  # Cell already reserved by another bot
-        # Prevent swap collision: check if another bot is moving from (x, y) to (from_cell) at t
-        if from_cell:
-            swap_key = (from_cell[0], from_cell[1], t)
-            if swap_key in self.reservations and self.reservations[swap_key] != bot_id:
-                return False
-        self.reservations[key] = bot_id
+        bucket = self.buckets.get(t)
+        if bucket:
+            owner = bucket.get((x, y))
+            if owner is not None and owner != bot_id:
+                return False  # Cell already reserved by another bot
+            # Prevent swap collision: check if another bot is moving from (x, y) to (from_cell) at t
+            if from_cell:
+                owner = bucket.get((from_cell[0], from_cell[1]))
+                if owner is not None and owner != bot_id:
+                    return False
+        self._set(x, y, t, bot_id)
         self.bot_positions[bot_id] = (x, y, t)
         # Tail reservation: reserve the cell the bot is leaving for t as well
         if from_cell:
-            tail_key = (from_cell[0], from_cell[1], t)
-            self.reservations[tail_key] = bot_id
+            self._set(from_cell[0], from_cell[1], t, bot_id)
         return True
     
     def is_reserved(self, x: int, y: int, t: int, bot_id: int) -> bool:
         """Check if cell is reserved by another bot at time t."""
-        key = (x, y, t)
-        return key in self.reservations and self.reservations[key] != bot_id
+        bucket = self.buckets.get(t)
+        if not bucket:
+            return False
+        owner = bucket.get((x, y))
+        return owner is not None and owner != bot_id
     
     def clear_expired_reservations(self, current_time: int):
-        """Remove reservations older than window_size."""
-        expired_keys = [key for key in self.reservations.keys() 
-                       if key[2] < current_time - self.window_size]
-        for key in expired_keys:
-            del self.reservations[key]
+        """Remove reservations older than window_size by dropping whole time buckets."""
+        cutoff = current_time - self.window_size
+        bucket_times = self._bucket_times
+        while bucket_times and bucket_times[0] < cutoff:
+            t = heapq.heappop(bucket_times)
+            bucket = self.buckets.pop(t, None)
+            if not bucket:
+                continue
+            self._count -= len(bucket)
+            for bid in set(bucket.values()):
+                by_time = self.bot_index.get(bid)
+                if by_time is not None:
+                    by_time.pop(t, None)
+                    if not by_time:
+                        del self.bot_index[bid]
     
     def get_bot_reservations(self, bot_id: int) -> List[Tuple[int, int, int]]:
         """Get all reservations for a specific bot."""
-        return [(x, y, t) for (x, y, t), bid in self.reservations.items() 
-                if bid == bot_id]
+        return [(x, y, t) for t, cells in self.bot_index.get(bot_id, {}).items()
+                for (x, y) in cells]
+    
+    def release_before(self, bot_id: int, t: int):
+        """Drop bot_id's reservations for time steps before t, keeping its window ahead."""
+        by_time = self.bot_index.get(bot_id)
+        if not by_time:
+            return
+        for past in [step for step in by_time if step < t]:
+            bucket = self.buckets.get(past)
+            for cell in by_time.pop(past):
+                if bucket is not None and bucket.get(cell) == bot_id:
+                    del bucket[cell]
+                    self._count -= 1
+            if bucket is not None and not bucket:
+                del self.buckets[past]
+        if not by_time:
+            del self.bot_index[bot_id]
+
+    def release_bot(self, bot_id: int):
+        """Drop every reservation held by bot_id, touching only that bot's cells."""
+        by_time = self.bot_index.pop(bot_id, None)
+        if not by_time:
+            return
+        for t, cells in by_time.items():
+            bucket = self.buckets.get(t)
+            if bucket is None:
+                continue
+            for cell in cells:
+                if bucket.get(cell) == bot_id:
+                    del bucket[cell]
+                    self._count -= 1
+            if not bucket:
+                # The stale heap entry is skipped when it is popped in clear_expired_reservations
+                del self.buckets[t]
 
 # Global reservation table instance
 reservation_table = ReservationTable(window_size=5)
 
+def _rebuild_path(node_pos: List[Tuple[int, int]], node_parent: array, index: int) -> List[Tuple[int, int]]:
+    """Walk parent pointers back from node index to the root and return the path."""
+    path = []
+    while index >= 0:
+        path.append(node_pos[index])
+        index = node_parent[index]
+    path.reverse()
+    return path
+
+def _reserve_path(path: List[Tuple[int, int]], bot_id: int, current_time: int):
+    """Reserve the window ahead of the bot along path, with tail reservation.
+
+    Only the first window_size steps are reserved, replacing whatever the bot
+    held before; the rest of the route is reserved as the bot replans.
+    """
+    reservation_table.release_bot(bot_id)
+    for i, (x, y) in enumerate(path[:reservation_table.window_size + 1]):
+        from_cell = path[i - 1] if i > 0 else None
+        reservation_table.reserve_cell(x, y, current_time + i, bot_id, from_cell=from_cell)
+
 def whca_star_varied(start: Tuple[int, int], goal: Tuple[int, int], 
-                     grid_size: Tuple[int, int], bot_id: int, 
-                     current_time: int = 0, variation_factor: float = 0.3) -> Optional[List[Tuple[int, int]]]:
+                     grid: Union[GridLayout, Tuple[int, int]], bot_id: int, 
+                     current_time: int = 0, variation_factor: float = 0.3,
+                     stats: Optional[dict] = None,
+                     blocked: Optional[FrozenSet[Tuple[int, int]]] = None,
+                     rng: Optional[random.Random] = None) -> Optional[List[Tuple[int, int]]]:
     """
     WHCA* implementation with path variation to avoid repetitive movement patterns.
-    Adds randomization to make bot movement more realistic and interesting.
+    Adds randomization to make bot movement more realistic and interesting; pass a
+    seeded rng (e.g. sim_clock.rng) for reproducible routes.
     """
-    width, height = grid_size
+    rng = rng or random
+    layout = as_layout(grid)
+    neighbor_table = layout.neighbor_table
+    goal_is_free = layout.is_free(*goal)
     
     # Clear expired reservations
     reservation_table.clear_expired_reservations(current_time)
     
-    # Priority queue for A* search
+    # True-distance heuristic table for this goal (reverse BFS, cached per goal)
+    blocked_cells = blocked or frozenset()
+    distances = heuristic_cache.get(goal, layout, blocked_cells)
+    if distances[start] == heuristic_cache.unreachable(distances):
+        return None  # Goal cannot be reached around the blocked cells
+    
+    # Search nodes are stored as parallel arrays (position, parent index); the
+    # path is only rebuilt from parent pointers once the goal is popped
+    node_pos = [start]
+    node_parent = array('l', [-1])
+    # Priority queue for A* search: (f_score, g_score, node_index)
     open_set = []
-    # (f_score, g_score, current_pos, time_step, path)
-    heapq.heappush(open_set, (0, 0, start, current_time, [start]))
+    heapq.heappush(open_set, (0, 0, 0))
     
     # Track visited states to avoid cycles
     visited = set()
+    # Reservations are honoured up to here; beyond it the route is planned without them
+    horizon = current_time + reservation_table.window_size
     
     # Heuristic function with randomization
     def heuristic(pos: Tuple[int, int]) -> int:
-        base_distance = abs(pos[0] - goal[0]) + abs(pos[1] - goal[1])
+        base_distance = distances.item(pos)
         # Add small random variation to break ties and create different paths
-        random_factor = random.uniform(-variation_factor, variation_factor)
+        random_factor = rng.uniform(-variation_factor, variation_factor)
         return base_distance + random_factor
     
     # Get valid neighbors with randomization
@@ -82,13 +215,14 @@ def whca_star_varied(start: Tuple[int, int], goal: Tuple[int, int],
         x, y = pos
         neighbors = []
         # Randomize the order of directions to create path variation
-        directions = [(0, 1), (1, 0), (0, -1), (-1, 0)]
-        random.shuffle(directions)
+        candidates = list(neighbor_table[x][y])
+        if not goal_is_free and abs(x - goal[0]) + abs(y - goal[1]) == 1:
+            candidates.append(goal)
+        rng.shuffle(candidates)
         
-        for dx, dy in directions:
-            nx, ny = x + dx, y + dy
-            # Check grid bounds
-            if 0 <= nx < width and 0 <= ny < height:
+        for nx, ny in candidates:
+            # Layout neighbours are in bounds and free; also skip per-call blocked cells
+            if (nx, ny) == goal or (nx, ny) not in blocked_cells:
                 # Check if cell is reserved at time t+1 (target cell) or t+1 (from_cell for swap)
                 if not reservation_table.is_reserved(nx, ny, t + 1, bot_id) and not reservation_table.is_reserved(x, y, t + 1, bot_id):
                     neighbors.append(((nx, ny), t + 1))
@@ -97,64 +231,95 @@ def whca_star_varied(start: Tuple[int, int], goal: Tuple[int, int],
             neighbors.append((pos, t + 1))
         return neighbors
     
+    expanded = 0
     while open_set:
-        f_score, g_score, current_pos, current_t, path = heapq.heappop(open_set)
-        # Check if we reached the goal
-        if current_pos == goal:
-            # Reserve the path for this bot, with tail reservation
-            for i, (x, y) in enumerate(path):
-                from_cell = path[i - 1] if i > 0 else None
-                reservation_table.reserve_cell(x, y, current_time + i, bot_id, from_cell=from_cell)
+        f_score, g_score, node_index = heapq.heappop(open_set)
+        current_pos = node_pos[node_index]
+        current_t = current_time + g_score  # every move or wait costs one time step
+        # At the goal, or at the end of the window: the heuristic is the true
+        # remaining distance, so the rest of the route follows it downhill
+        if current_pos == goal or current_t >= horizon:
+            path = _rebuild_path(node_pos, node_parent, node_index)
+            path += descend(current_pos, goal, layout, distances, blocked_cells)
+            _reserve_path(path, bot_id, current_time)
+            if stats is not None:
+                stats['expanded'] = expanded
+                stats['generated'] = len(node_pos)
             return path
         # Create state key for visited tracking
         state_key = (current_pos, current_t)
         if state_key in visited:
             continue
         visited.add(state_key)
+        expanded += 1
         # Explore neighbors
         for neighbor_pos, neighbor_t in get_neighbors(current_pos, current_t):
-            if neighbor_t > current_time + reservation_table.window_size:
-                continue  # Don't plan beyond window
             new_g_score = g_score + 1
             new_f_score = new_g_score + heuristic(neighbor_pos)
             neighbor_state = (neighbor_pos, neighbor_t)
             if neighbor_state not in visited:
-                new_path = path + [neighbor_pos]
-                heapq.heappush(open_set, (new_f_score, new_g_score, neighbor_pos, neighbor_t, new_path))
+                node_pos.append(neighbor_pos)
+                node_parent.append(node_index)
+                heapq.heappush(open_set, (new_f_score, new_g_score, len(node_pos) - 1))
+    if stats is not None:
+        stats['expanded'] = expanded
+        stats['generated'] = len(node_pos)
     return None  # No path found
 
 def whca_star(start: Tuple[int, int], goal: Tuple[int, int], 
-               grid_size: Tuple[int, int], bot_id: int, 
-               current_time: int = 0) -> Optional[List[Tuple[int, int]]]:
+               grid: Union[GridLayout, Tuple[int, int]], bot_id: int, 
+               current_time: int = 0, stats: Optional[dict] = None,
+               blocked: Optional[FrozenSet[Tuple[int, int]]] = None) -> Optional[List[Tuple[int, int]]]:
     """
     WHCA* implementation with enhanced collision avoidance.
     Prevents head-on, following, and corner collisions, and handles reservation race conditions.
+    Cells in blocked (e.g. the delivery station) are never entered unless they are the goal,
+    and the heuristic is the cached true distance to the goal around them.
+    Reservations are only searched within the window; a node at the end of the window
+    is completed along the true-distance table, so routes of any length are found and
+    only the windowed prefix is reserved. Callers replan as the bot moves (rolling horizon).
+    If stats is given, it is filled with the number of expanded and generated nodes.
     """
-    width, height = grid_size
+    layout = as_layout(grid)
+    neighbor_table = layout.neighbor_table
+    goal_is_free = layout.is_free(*goal)
     
     # Clear expired reservations
     reservation_table.clear_expired_reservations(current_time)
     
-    # Priority queue for A* search
+    # True-distance heuristic table for this goal (reverse BFS, cached per goal)
+    blocked_cells = blocked or frozenset()
+    distances = heuristic_cache.get(goal, layout, blocked_cells)
+    if distances[start] == heuristic_cache.unreachable(distances):
+        return None  # Goal cannot be reached around the blocked cells
+    
+    # Search nodes are stored as parallel arrays (position, parent index); the
+    # path is only rebuilt from parent pointers once the goal is popped
+    node_pos = [start]
+    node_parent = array('l', [-1])
+    # Priority queue for A* search: (f_score, g_score, node_index)
     open_set = []
-    # (f_score, g_score, current_pos, time_step, path)
-    heapq.heappush(open_set, (0, 0, start, current_time, [start]))
+    heapq.heappush(open_set, (0, 0, 0))
     
     # Track visited states to avoid cycles
     visited = set()
+    # Reservations are honoured up to here; beyond it the route is planned without them
+    horizon = current_time + reservation_table.window_size
     
-    # Heuristic function (Manhattan distance)
+    # Heuristic function (true distance to goal)
     def heuristic(pos: Tuple[int, int]) -> int:
-        return abs(pos[0] - goal[0]) + abs(pos[1] - goal[1])
+        return distances.item(pos)
     
     # Get valid neighbors
     def get_neighbors(pos: Tuple[int, int], t: int) -> List[Tuple[Tuple[int, int], int]]:
         x, y = pos
         neighbors = []
-        for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0)]:  # 4-directional movement
-            nx, ny = x + dx, y + dy
-            # Check grid bounds
-            if 0 <= nx < width and 0 <= ny < height:
+        candidates = neighbor_table[x][y]  # free 4-directional moves from the layout
+        if not goal_is_free and abs(x - goal[0]) + abs(y - goal[1]) == 1:
+            candidates += (goal,)
+        for nx, ny in candidates:
+            # Skip per-call blocked cells unless it is the goal itself
+            if (nx, ny) == goal or (nx, ny) not in blocked_cells:
                 # Check if cell is reserved at time t+1 (target cell) or t+1 (from_cell for swap)
                 if not reservation_table.is_reserved(nx, ny, t + 1, bot_id) and not reservation_table.is_reserved(x, y, t + 1, bot_id):
                     neighbors.append(((nx, ny), t + 1))
@@ -163,67 +328,111 @@ def whca_star(start: Tuple[int, int], goal: Tuple[int, int],
             neighbors.append((pos, t + 1))
         return neighbors
     
+    expanded = 0
     while open_set:
-        f_score, g_score, current_pos, current_t, path = heapq.heappop(open_set)
-        # Check if we reached the goal
-        if current_pos == goal:
-            # Reserve the path for this bot, with tail reservation
-            for i, (x, y) in enumerate(path):
-                from_cell = path[i - 1] if i > 0 else None
-                reservation_table.reserve_cell(x, y, current_time + i, bot_id, from_cell=from_cell)
+        f_score, g_score, node_index = heapq.heappop(open_set)
+        current_pos = node_pos[node_index]
+        current_t = current_time + g_score  # every move or wait costs one time step
+        # At the goal, or at the end of the window: the heuristic is the true
+        # remaining distance, so the rest of the route follows it downhill
+        if current_pos == goal or current_t >= horizon:
+            path = _rebuild_path(node_pos, node_parent, node_index)
+            path += descend(current_pos, goal, layout, distances, blocked_cells)
+            _reserve_path(path, bot_id, current_time)
+            if stats is not None:
+                stats['expanded'] = expanded
+                stats['generated'] = len(node_pos)
             return path
         # Create state key for visited tracking
         state_key = (current_pos, current_t)
         if state_key in visited:
             continue
         visited.add(state_key)
+        expanded += 1
         # Explore neighbors
         for neighbor_pos, neighbor_t in get_neighbors(current_pos, current_t):
-            if neighbor_t > current_time + reservation_table.window_size:
-                continue  # Don't plan beyond window
             new_g_score = g_score + 1
             new_f_score = new_g_score + heuristic(neighbor_pos)
             neighbor_state = (neighbor_pos, neighbor_t)
             if neighbor_state not in visited:
-                new_path = path + [neighbor_pos]
-                heapq.heappush(open_set, (new_f_score, new_g_score, neighbor_pos, neighbor_t, new_path))
+                node_pos.append(neighbor_pos)
+                node_parent.append(node_index)
+                heapq.heappush(open_set, (new_f_score, new_g_score, len(node_pos) - 1))
+    if stats is not None:
+        stats['expanded'] = expanded
+        stats['generated'] = len(node_pos)
     return None  # No path found
 
+def _first_conflict(route, bot_id: int, current_time: int) -> Optional[int]:
+    """Index of the first step of route, within the window, that the reservation table forbids."""
+    for i in range(1, min(len(route), reservation_table.window_size + 1)):
+        (px, py), (x, y) = route[i - 1], route[i]
+        t = current_time + i
+        if reservation_table.is_reserved(x, y, t, bot_id) or reservation_table.is_reserved(px, py, t, bot_id):
+            return i
+    return None
+
+def cached_whca_star(start: Tuple[int, int], goal: Tuple[int, int],
+                     grid: Union[GridLayout, Tuple[int, int]], bot_id: int,
+                     current_time: int = 0, blocked: Optional[FrozenSet[Tuple[int, int]]] = None,
+                     stats: Optional[dict] = None) -> Optional[List[Tuple[int, int]]]:
+    """
+    WHCA* on top of the path cache: the static route from start to goal is reused
+    and only repaired where it conflicts with reservations.
+    If no step in the window is reserved by another bot the cached route is taken
+    as is; otherwise the route is kept up to the step before the first conflict and
+    WHCA* replans from there, or from start if that repair would lead back over
+    the kept steps. Reserves the window like whca_star.
+    """
+    planning_started = time.perf_counter()
+    layout = as_layout(grid)
+    reservation_table.clear_expired_reservations(current_time)
+    route = path_cache.get(start, goal, layout, blocked)
+    if route is None:
+        return None
+    conflict = _first_conflict(route, bot_id, current_time)
+    search_ms = None
+    path = list(route)
+    if conflict is not None:
+        started = time.perf_counter()
+        keep = conflict - 1
+        repair = whca_star(route[keep], goal, layout, bot_id, current_time + keep, stats, blocked)
+        # No repair from there, or one that doubles back over the kept steps (a bot
+        # driving there and back forever): plan the whole window from start instead
+        if keep > 0 and (repair is None or not set(repair[1:]).isdisjoint(route[:keep])):
+            repair, keep = whca_star(start, goal, layout, bot_id, current_time, stats, blocked), 0
+        search_ms = (time.perf_counter() - started) * 1000
+        path = list(route[:keep]) + repair if repair is not None else None
+    if path is not None:
+        _reserve_path(path, bot_id, current_time)
+    path_cache.record_plan(search_ms, (time.perf_counter() - planning_started) * 1000)
+    return path
+
 def create_varied_path(start: Tuple[int, int], goal: Tuple[int, int], 
-                      grid_size: Tuple[int, int], bot_id: int, 
+                      grid: Union[GridLayout, Tuple[int, int]], bot_id: int, 
                       current_time: int = 0) -> Optional[List[Tuple[int, int]]]:
     """
-    Creates varied paths by using different pathfinding strategies randomly.
-    This prevents bots from always taking the same route.
+    Path for a bot between two cells. Routes are served from the path cache and only
+    repaired where they conflict with reservations (cached_whca_star); use
+    whca_star_varied directly for randomised routes.
     """
-    strategies = [
-        lambda: whca_star_varied(start, goal, grid_size, bot_id, current_time, 0.2),
-        lambda: whca_star_varied(start, goal, grid_size, bot_id, current_time, 0.4),
-        lambda: whca_star_varied(start, goal, grid_size, bot_id, current_time, 0.6),
-        lambda: whca_star(start, goal, grid_size, bot_id, current_time)
-    ]
-    
-    # Randomly select a strategy
-    strategy = random.choice(strategies)
-    path = strategy()
-    
-    # If no path found, try the original WHCA* as fallback
-    if not path:
-        path = whca_star(start, goal, grid_size, bot_id, current_time)
-    
-    return path
+    return cached_whca_star(start, goal, grid, bot_id, current_time)
 
 def astar_grid(start: Tuple[int, int], goal: Tuple[int, int], 
-                obstacles: Set[Tuple[int, int]], grid_size: Tuple[int, int]) -> Optional[List[Tuple[int, int]]]:
+                obstacles: Set[Tuple[int, int]], grid_size: Tuple[int, int],
+                stats: Optional[dict] = None) -> Optional[List[Tuple[int, int]]]:
     """
     Original A* implementation (kept for backward compatibility).
     Use whca_star for collision-aware pathfinding.
     """
     width, height = grid_size
     
-    # Priority queue for A* search
+    # Parallel-array search nodes, see whca_star
+    node_pos = [start]
+    node_parent = array('l', [-1])
+    # Priority queue for A* search: (f_score, g_score, node_index)
     open_set = []
-    heapq.heappush(open_set, (0, 0, start, [start]))
+    heapq.heappush(open_set, (0, 0, 0))
     
     # Track visited positions
     visited = set()
@@ -246,26 +455,36 @@ def astar_grid(start: Tuple[int, int], goal: Tuple[int, int],
         
         return neighbors
     
+    expanded = 0
     while open_set:
-        f_score, g_score, current_pos, path = heapq.heappop(open_set)
+        f_score, g_score, node_index = heapq.heappop(open_set)
+        current_pos = node_pos[node_index]
         
         # Check if we reached the goal
         if current_pos == goal:
-            return path
+            if stats is not None:
+                stats['expanded'] = expanded
+                stats['generated'] = len(node_pos)
+            return _rebuild_path(node_pos, node_parent, node_index)
         
         # Check if already visited
         if current_pos in visited:
             continue
         visited.add(current_pos)
+        expanded += 1
         
         # Explore neighbors
         for neighbor_pos in get_neighbors(current_pos):
             if neighbor_pos not in visited:
                 new_g_score = g_score + 1
                 new_f_score = new_g_score + heuristic(neighbor_pos)
-                new_path = path + [neighbor_pos]
-                heapq.heappush(open_set, (new_f_score, new_g_score, neighbor_pos, new_path))
+                node_pos.append(neighbor_pos)
+                node_parent.append(node_index)
+                heapq.heappush(open_set, (new_f_score, new_g_score, len(node_pos) - 1))
     
+    if stats is not None:
+        stats['expanded'] = expanded
+        stats['generated'] = len(node_pos)
     return None  # No path found
 
 def update_bot_reservations(bot_id: int, current_pos: Tuple[int, int], 
@@ -274,11 +493,8 @@ def update_bot_reservations(bot_id: int, current_pos: Tuple[int, int],
     Update reservations for a bot that's moving from current_pos to target_pos.
     This should be called each time a bot moves.
     """
-    # Clear old reservations for this bot
-    old_reservations = reservation_table.get_bot_reservations(bot_id)
-    for x, y, t in old_reservations:
-        if (x, y, t) in reservation_table.reservations:
-            del reservation_table.reservations[(x, y, t)]
+    # Drop this bot's past reservations; the window it reserved ahead stays
+    reservation_table.release_before(bot_id, current_time)
     
     # Add new reservation for target position
     reservation_table.reserve_cell(target_pos[0], target_pos[1], current_time, bot_id)
@@ -286,10 +502,21 @@ def update_bot_reservations(bot_id: int, current_pos: Tuple[int, int],
     # Clear expired reservations
     reservation_table.clear_expired_reservations(current_time)
 
+def hold_position(bot_id: int, cell: Tuple[int, int], current_time: int):
+    """Reserve cell for a bot standing still, over the window from current_time.
+
+    Without it a stationary bot is invisible to WHCA*; the holds are dropped as
+    soon as the bot plans a path of its own.
+    """
+    for t in range(current_time, current_time + reservation_table.window_size + 1):
+        reservation_table.reserve_cell(cell[0], cell[1], t, bot_id)
+
 def get_reservation_table_status() -> dict:
     """Get current status of the reservation table for debugging."""
     return {
         'reservations': reservation_table.reservations,
+        'reservation_count': len(reservation_table),
+        'time_buckets': len(reservation_table.buckets),
         'bot_positions': reservation_table.bot_positions,
         'window_size': reservation_table.window_size
     } 
\ No newline at end of file
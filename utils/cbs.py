@@ -0,0 +1,201 @@
+import heapq
+from collections import defaultdict
+from typing import Dict, FrozenSet, List, Optional, Sequence, Set, Tuple, Union
+
+from utils.grid_layout import GridLayout, as_layout
+from utils.heuristics import heuristic_cache
+
+Cell = Tuple[int, int]
+Path = List[Cell]
+# (cell, t) pairs an agent may not occupy
+Constraints = FrozenSet[Tuple[Cell, int]]
+
+def at(path: Path, t: int) -> Cell:
+    """Cell of an agent at time t; agents stay on their goal once they reach it."""
+    return path[t] if t < len(path) else path[-1]
+
+def find_conflicts(paths: Sequence[Path], first_only: bool = False) -> List[Tuple[int, int, Cell, int, int]]:
+    """Conflicts between paths, in time order, as (i, j, cell, t_i, t_j).
+
+    Agent i is in cell at t_i and agent j at t_j: either the same tick (vertex
+    conflict) or j left the cell on the tick i enters it (following, which also
+    covers swaps). Bots only enter cells that were free at the start of a tick,
+    the same rule as the reservation table's tail reservations.
+    """
+    conflicts = []
+    horizon = max((len(p) for p in paths), default=0)
+    previous: Dict[Cell, int] = {}
+    for t in range(horizon):
+        current: Dict[Cell, int] = {}
+        for i, path in enumerate(paths):
+            cell = at(path, t)
+            j = current.get(cell)
+            if j is not None:
+                conflicts.append((j, i, cell, t, t))
+            else:
+                current[cell] = i
+            j = previous.get(cell)
+            if j is not None and j != i and at(paths[j], t) != cell:
+                conflicts.append((i, j, cell, t, t - 1))
+            if conflicts and first_only:
+                return conflicts[:1]
+        previous = current
+    return conflicts
+
+class Traffic:
+    """Other agents' paths, to count the conflicts a (cell, t) step would add."""
+
+    def __init__(self, paths: Sequence[Path] = (), skip: int = -1):
+        self.slots: Dict[Tuple[Cell, int], int] = defaultdict(int)
+        self.parked: Dict[Cell, int] = {}  # goal -> first tick it is held after the path ends
+        for i, path in enumerate(paths):
+            if i != skip:
+                self.add(path)
+
+    def add(self, path: Path):
+        for t, cell in enumerate(path):
+            self.slots[(cell, t)] += 1
+            self.slots[(cell, t + 1)] += 1  # following into a cell just left
+        self.parked[path[-1]] = min(self.parked.get(path[-1], len(path) + 1), len(path) + 1)
+
+    def count(self, cell: Cell, t: int) -> int:
+        parked = self.parked.get(cell)
+        return self.slots.get((cell, t), 0) + (parked is not None and t >= parked)
+
+def space_time_astar(start: Cell, goal: Cell, layout: GridLayout, constraints: Constraints = frozenset(),
+                     blocked: FrozenSet[Cell] = frozenset(), obstacles: FrozenSet[Cell] = frozenset(),
+                     max_t: Optional[int] = None, traffic: Optional[Traffic] = None,
+                     suboptimality: float = 1.0) -> Optional[Path]:
+    """Shortest path from start to goal over (cell, time) under CBS constraints.
+
+    Waiting is allowed. blocked cells are part of the cached true-distance
+    heuristic; obstacles (e.g. bots standing still) are only avoided by the
+    search, so they do not fragment the heuristic cache. The goal counts once
+    no later constraint forbids staying there. Ties on path length go to the
+    path with the fewest conflicts with traffic, the other agents' paths,
+    which keeps CBS splits down. With suboptimality w > 1 the search
+    instead takes the fewest-conflict path no longer than w x the lower bound
+    on its length, falling back to the shortest path if there is none.
+    """
+    distances = heuristic_cache.get(goal, layout, blocked)
+    unreachable = heuristic_cache.unreachable(distances)
+    if distances.item(start) == unreachable or (start, 0) in constraints:
+        return None
+    goal_free_after = max((t for cell, t in constraints if cell == goal), default=-1)
+    if max_t is None:
+        max_t = max(goal_free_after, distances.item(start)) + len(constraints) + layout.width + layout.depth
+    bound = max_t
+    if suboptimality > 1.0:
+        bound = int(suboptimality * max(goal_free_after + 1, distances.item(start)))
+    neighbor_table = layout.neighbor_table
+    traffic = traffic or Traffic()
+    focal = bound < max_t
+
+    parents: Dict[Tuple[Cell, int], Optional[Tuple[Cell, int]]] = {(start, 0): None}
+    open_set = [(0, distances.item(start), 0, start) if focal else (distances.item(start), 0, 0, start)]
+    closed: Set[Tuple[Cell, int]] = set()
+    while open_set:
+        key, tie, t, cell = heapq.heappop(open_set)
+        conflicts = key if focal else tie
+        state = (cell, t)
+        if state in closed:
+            continue
+        closed.add(state)
+        if cell == goal and t > goal_free_after:
+            path = []
+            while state is not None:
+                path.append(state[0])
+                state = parents[state]
+            return path[::-1]
+        if t >= max_t:
+            continue
+        x, y = cell
+        nt = t + 1
+        for nxt in neighbor_table[x][y] + (cell,):
+            if nxt != goal and (nxt in blocked or nxt in obstacles):
+                continue
+            nstate = (nxt, nt)
+            if nstate in constraints or nstate in parents:
+                continue
+            h = distances.item(nxt)
+            if h == unreachable or (focal and nt + h > bound):
+                continue
+            parents[nstate] = state
+            nconflicts = conflicts + traffic.count(nxt, nt)
+            heapq.heappush(open_set, (nconflicts, nt + h, nt, nxt) if focal else (nt + h, nconflicts, nt, nxt))
+    if focal:
+        return space_time_astar(start, goal, layout, constraints, blocked, obstacles, max_t, traffic)
+    return None
+
+class _Node:
+    __slots__ = ("constraints", "paths", "cost", "conflicts")
+
+    def __init__(self, constraints: List[Constraints], paths: List[Path]):
+        self.constraints = constraints
+        self.paths = paths
+        self.cost = sum(len(p) - 1 for p in paths)
+        self.conflicts = len(find_conflicts(paths))
+
+def cbs(agents: Sequence[Tuple[Cell, Cell]], grid: Union[GridLayout, Tuple[int, int]],
+        blocked: FrozenSet[Cell] = frozenset(), obstacles: FrozenSet[Cell] = frozenset(),
+        max_nodes: int = 500, suboptimality: float = 1.0, stats: Optional[dict] = None) -> Optional[List[Path]]:
+    """Conflict-Based Search: conflict-free paths for all (start, goal) agents at once.
+
+    The high level takes the first conflict of a node's paths and branches on
+    it, forbidding the cell at that tick to one agent or the other and
+    replanning only that agent. With suboptimality w > 1 the node to expand is
+    the one with the fewest conflicts among those costing at most w x the
+    cheapest, and the low level picks fewest-conflict paths within the same
+    bound (the two focal lists of ECBS), trading bounded extra cost for far
+    fewer expansions in dense fleets. Returns one path per agent, or None if there is
+    no solution within max_nodes expansions.
+    """
+    layout = as_layout(grid)
+    if stats is not None:
+        stats.clear()
+        stats.update(nodes=0, solved=False)
+    # Root: plan agents one by one around the paths so far, then replan each
+    # once around all the others
+    paths: List[Path] = []
+    traffic = Traffic()
+    for start, goal in agents:
+        path = space_time_astar(start, goal, layout, blocked=blocked, obstacles=obstacles,
+                                traffic=traffic, suboptimality=suboptimality)
+        if path is None:
+            return None
+        paths.append(path)
+        traffic.add(path)
+    for agent, (start, goal) in enumerate(agents):
+        path = space_time_astar(start, goal, layout, blocked=blocked, obstacles=obstacles,
+                                traffic=Traffic(paths, skip=agent), suboptimality=suboptimality)
+        if path is None:
+            return None
+        paths[agent] = path
+    open_list = [_Node([frozenset()] * len(agents), paths)]
+    expanded = 0
+    while open_list and expanded < max_nodes:
+        best = min(n.cost for n in open_list)
+        node = min((n for n in open_list if n.cost <= best * suboptimality), key=lambda n: (n.conflicts, n.cost))
+        open_list.remove(node)
+        conflict = find_conflicts(node.paths, first_only=True)
+        if not conflict:
+            if stats is not None:
+                stats.update(nodes=expanded, solved=True, cost=node.cost)
+            return node.paths
+        expanded += 1
+        i, j, cell, t_i, t_j = conflict[0]
+        for agent, t in ((i, t_i), (j, t_j)):
+            constraints = node.constraints[agent] | {(cell, t)}
+            start, goal = agents[agent]
+            path = space_time_astar(start, goal, layout, constraints, blocked, obstacles,
+                                    traffic=Traffic(node.paths, skip=agent), suboptimality=suboptimality)
+            if path is None:
+                continue
+            child_constraints = list(node.constraints)
+            child_constraints[agent] = constraints
+            child_paths = list(node.paths)
+            child_paths[agent] = path
+            open_list.append(_Node(child_constraints, child_paths))
+    if stats is not None:
+        stats.update(nodes=expanded)
+    return None
@@ -0,0 +1,162 @@
+import itertools
+import json
+import logging
+import os
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+Cell = Tuple[int, int]
+
+# Path of the JSON layout loaded at startup; override with AUTOSTORE_GRID_LAYOUT
+DEFAULT_LAYOUT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "grid_layout.json")
+
+# Globally unique layout versions, so caches keyed by version never confuse two layouts
+_versions = itertools.count(1)
+
+class GridLayout:
+    """Static description of the storage grid shared by every planner and router.
+
+    Holds the grid dimensions, per-column stack heights, delivery ports (each
+    with a picking service time in seconds per bin), parking
+    cells and permanently blocked cells. Passability is kept in a NumPy array
+    indexed [x, y], and the free 4-neighbours of every cell are precomputed from
+    it so planners do table lookups instead of bounds/obstacle checks.
+    """
+
+    def __init__(self, width: int, depth: int, stack_height: int = 6,
+                 ports: Optional[Iterable[Cell]] = None,
+                 parking: Optional[Iterable[Tuple[int, int, int]]] = None,
+                 blocked: Optional[Iterable[Cell]] = None,
+                 stack_heights: Optional[Iterable[Tuple[int, int, int]]] = None,
+                 port_service_seconds: float = 2.0):
+        self.width = width
+        self.depth = depth
+        self.stack_height = stack_height
+        self.port_service_seconds = port_service_seconds
+        # Ports are (x, y) or (x, y, service seconds)
+        ports = [tuple(p) for p in (ports or [(width - 1, 0)])]
+        self.ports: List[Cell] = [(p[0], p[1]) for p in ports]
+        self.port_service: Dict[Cell, float] = {
+            (p[0], p[1]): float(p[2]) if len(p) > 2 else port_service_seconds for p in ports
+        }
+        self.parking: List[Tuple[int, int, int]] = [tuple(p) for p in (parking or [])]
+        # Maximum number of bins per column, [x, y]
+        self.stack_heights = np.full((width, depth), stack_height, dtype=np.int16)
+        for x, y, height in stack_heights or []:
+            self.stack_heights[x, y] = height
+        self.passable = np.ones((width, depth), dtype=bool)
+        self.version = 0
+        self.set_blocked(blocked or [])
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return (self.width, self.depth)
+
+    @property
+    def delivery_station(self) -> Cell:
+        """The primary delivery port."""
+        return self.ports[0]
+
+    @property
+    def blocked(self) -> List[Cell]:
+        return [(int(x), int(y)) for x, y in np.argwhere(~self.passable)]
+
+    def set_blocked(self, cells: Iterable[Cell]):
+        """Replace the set of permanently blocked cells and rebuild the neighbour table."""
+        self.passable[:, :] = True
+        for x, y in cells:
+            self.passable[x, y] = False
+        self._build_neighbor_table()
+        self.version = next(_versions)
+
+    def _build_neighbor_table(self):
+        # Pad with a blocked border so out-of-bounds neighbours read as impassable
+        padded = np.zeros((self.width + 2, self.depth + 2), dtype=bool)
+        padded[1:-1, 1:-1] = self.passable
+        directions = ((0, 1), (1, 0), (0, -1), (-1, 0))
+        # free[d][x, y] is True when moving from (x, y) in direction d lands on a free cell
+        free = [padded[1 + dx:self.width + 1 + dx, 1 + dy:self.depth + 1 + dy].tolist() for dx, dy in directions]
+        self.neighbor_table: List[List[Tuple[Cell, ...]]] = [
+            [tuple((x + dx, y + dy) for (dx, dy), ok in zip(directions, free) if ok[x][y])
+             for y in range(self.depth)]
+            for x in range(self.width)
+        ]
+
+    def in_bounds(self, x: int, y: int) -> bool:
+        return 0 <= x < self.width and 0 <= y < self.depth
+
+    def is_free(self, x: int, y: int) -> bool:
+        return 0 <= x < self.width and 0 <= y < self.depth and bool(self.passable[x, y])
+
+    def neighbors(self, x: int, y: int) -> Tuple[Cell, ...]:
+        """Free 4-neighbours of (x, y)."""
+        return self.neighbor_table[x][y]
+
+    def parking_for(self, bot_id: int) -> Tuple[int, int, int]:
+        """Parking cell (x, y, z) for a bot; bots without a configured spot spread along the last column."""
+        if 1 <= bot_id <= len(self.parking):
+            return self.parking[bot_id - 1]
+        return (self.width - 1, bot_id % max(1, self.depth - 1), 0)
+
+    def to_dict(self) -> Dict:
+        overrides = [[int(x), int(y), int(self.stack_heights[x, y])]
+                     for x, y in np.argwhere(self.stack_heights != self.stack_height)]
+        return {
+            "width": self.width,
+            "depth": self.depth,
+            "stack_height": self.stack_height,
+            "stack_heights": overrides,
+            "port_service_seconds": self.port_service_seconds,
+            "ports": [list(p) if self.port_service[p] == self.port_service_seconds else [*p, self.port_service[p]]
+                      for p in self.ports],
+            "parking": [list(p) for p in self.parking],
+            "blocked": [list(c) for c in self.blocked],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "GridLayout":
+        return cls(
+            width=data["width"],
+            depth=data["depth"],
+            stack_height=data.get("stack_height", 6),
+            ports=data.get("ports"),
+            parking=data.get("parking"),
+            blocked=data.get("blocked"),
+            stack_heights=data.get("stack_heights"),
+            port_service_seconds=data.get("port_service_seconds", 2.0),
+        )
+
+    def __repr__(self):
+        return (f"<GridLayout {self.width}x{self.depth}x{self.stack_height} ports={self.ports} "
+                f"parking={len(self.parking)} blocked={int((~self.passable).sum())}>")
+
+_open_layouts: Dict[Cell, GridLayout] = {}
+
+def as_layout(grid: Union[GridLayout, Cell]) -> GridLayout:
+    """Accept either a GridLayout or a bare (width, depth) tuple for an open grid."""
+    if isinstance(grid, GridLayout):
+        return grid
+    layout = _open_layouts.get(tuple(grid))
+    if layout is None:
+        layout = _open_layouts[tuple(grid)] = GridLayout(grid[0], grid[1])
+    return layout
+
+_grid_layout: Optional[GridLayout] = None
+
+def load_grid_layout(path: Optional[str] = None) -> GridLayout:
+    """Load the grid layout from JSON and make it the shared instance."""
+    global _grid_layout
+    path = path or os.environ.get("AUTOSTORE_GRID_LAYOUT", DEFAULT_LAYOUT_PATH)
+    with open(path) as f:
+        _grid_layout = GridLayout.from_dict(json.load(f))
+    logger.info(f"[GRID] Loaded {_grid_layout} from {path}")
+    return _grid_layout
+
+def get_grid_layout() -> GridLayout:
+    """The shared grid layout, loaded on first use."""
+    if _grid_layout is None:
+        return load_grid_layout()
+    return _grid_layout
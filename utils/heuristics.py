@@ -0,0 +1,102 @@
+from collections import OrderedDict, deque
+from typing import Dict, FrozenSet, List, Optional, Tuple, Union
+
+import numpy as np
+
+from utils.grid_layout import GridLayout, as_layout
+
+Cell = Tuple[int, int]
+
+class HeuristicCache:
+    """True-distance heuristic tables for the WHCA* planners.
+
+    For each goal cell a reverse BFS from the goal gives the exact obstacle-aware
+    distance to every cell of the grid. Maps are stored as compact NumPy arrays
+    indexed [x, y], keyed by the layout version, goal and extra obstacles, so
+    planners working on different layouts share the cache without clearing each
+    other's maps; maps of an outdated layout are evicted as least recently used.
+    """
+
+    def __init__(self, max_goals: int = 1024):
+        self.max_goals = max_goals
+        self.maps: "OrderedDict[Tuple[int, Cell, FrozenSet[Cell]], np.ndarray]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def unreachable(table: np.ndarray) -> int:
+        """Sentinel distance stored for cells that cannot reach the goal."""
+        return int(np.iinfo(table.dtype).max)
+
+    def get(self, goal: Cell, grid: Union[GridLayout, Tuple[int, int]],
+            blocked: Optional[FrozenSet[Cell]] = None) -> np.ndarray:
+        """Return the distance map for goal, computing it on first use.
+
+        blocked holds extra per-call obstacles on top of the layout's own blocked cells.
+        """
+        layout = as_layout(grid)
+        key = (layout.version, goal, blocked or frozenset())
+        table = self.maps.get(key)
+        if table is not None:
+            self.maps.move_to_end(key)
+            self.hits += 1
+            return table
+        self.misses += 1
+        table = reverse_bfs(goal, layout, blocked or frozenset())
+        self.maps[key] = table
+        if len(self.maps) > self.max_goals:
+            self.maps.popitem(last=False)
+        return table
+
+    def invalidate(self):
+        """Drop every map."""
+        self.maps.clear()
+
+    def status(self) -> Dict[str, int]:
+        return {
+            'goals': len(self.maps),
+            'bytes': sum(table.nbytes for table in self.maps.values()),
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+def reverse_bfs(goal: Cell, layout: GridLayout, blocked: FrozenSet[Cell]) -> np.ndarray:
+    """Breadth-first search outward from goal over the layout's free cells.
+
+    Cells in blocked get a distance (a bot standing on one can still step off it)
+    but are never expanded, so no route passes through them.
+    """
+    width, height = layout.size
+    dtype = np.uint16 if width * height < np.iinfo(np.uint16).max else np.uint32
+    unreachable = int(np.iinfo(dtype).max)
+    neighbor_table = layout.neighbor_table
+    dist = [unreachable] * (width * height)
+    gx, gy = goal
+    dist[gx * height + gy] = 0
+    queue = deque([goal])
+    while queue:
+        x, y = queue.popleft()
+        d = dist[x * height + y] + 1
+        for nx, ny in neighbor_table[x][y]:
+            if dist[nx * height + ny] == unreachable:
+                dist[nx * height + ny] = d
+                if (nx, ny) not in blocked:
+                    queue.append((nx, ny))
+    return np.array(dist, dtype=dtype).reshape(width, height)
+
+def descend(pos: Cell, goal: Cell, layout: GridLayout, distances: np.ndarray,
+            blocked: FrozenSet[Cell] = frozenset()) -> List[Cell]:
+    """Route from pos (excluded) to goal down a reverse_bfs distance table, ignoring reservations."""
+    route = []
+    d = distances.item(pos)
+    while d > 1:
+        x, y = pos
+        pos = next(n for n in layout.neighbor_table[x][y] if n not in blocked and distances.item(n) == d - 1)
+        route.append(pos)
+        d -= 1
+    if d == 1:
+        route.append(goal)
+    return route
+
+# Global heuristic cache instance
+heuristic_cache = HeuristicCache()
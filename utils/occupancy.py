@@ -0,0 +1,126 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from utils.grid_layout import GridLayout
+
+Cell = Tuple[int, int]
+
+class OccupancyIndex:
+    """Live spatial index of the grid used for obstacle checks during motion.
+
+    Tracks which bot stands on each cell ({(x, y): bot_id}) and the bins
+    stacked in each column, both as ordered bin ids (bottom first, matching
+    ascending z_location) and as a height array indexed [x, y] for vectorized
+    queries. A cell is blocked when
+    another bot is on it, or when its column holds more bins than the layout
+    allows, i.e. a bin has been left on top of the rails. The movement engine
+    keeps the index current, so checks never touch the database.
+    """
+
+    def __init__(self, layout: GridLayout):
+        self.layout = layout
+        self.cell_to_bot: Dict[Cell, int] = {}
+        self.bot_cells: Dict[int, Cell] = {}
+        self.column_heights = np.zeros(layout.size, dtype=np.int16)
+        self.stacks: Dict[Cell, List[int]] = {}
+        # Bins beyond capacity block the cell; bins dropped at a port sit in the port, not on the rails
+        self.capacity = layout.stack_heights.copy()
+        for x, y in layout.ports:
+            self.capacity[x, y] = np.iinfo(np.int16).max
+
+    def copy(self) -> "OccupancyIndex":
+        """Detached copy, for readers on another thread while missions keep changing this one."""
+        other = OccupancyIndex.__new__(OccupancyIndex)
+        other.layout = self.layout
+        other.cell_to_bot = dict(self.cell_to_bot)
+        other.bot_cells = dict(self.bot_cells)
+        other.column_heights = self.column_heights.copy()
+        other.stacks = {cell: list(stack) for cell, stack in self.stacks.items()}
+        other.capacity = self.capacity
+        return other
+
+    def rebuild(self, bots: Iterable, bins: Iterable):
+        """Reset the index from Bot and Bin rows (bins being carried are not in a column)."""
+        self.cell_to_bot.clear()
+        self.bot_cells.clear()
+        self.column_heights[:, :] = 0
+        self.stacks.clear()
+        carried = set()
+        for bot in bots:
+            self.place_bot(bot.id, bot.x, bot.y)
+            if bot.carried_bin_id:
+                carried.add(bot.carried_bin_id)
+        stacked = [b for b in bins if b.id not in carried]
+        # Stored positions are taken as they are, even a column over capacity or a port
+        for bin_obj in sorted(stacked, key=lambda b: (b.z_location or 0, b.id)):
+            self._push(bin_obj.id, bin_obj.x, bin_obj.y)
+
+    # --- Bots ---
+
+    def place_bot(self, bot_id: int, x: int, y: int):
+        """Record bot_id at (x, y), clearing the cell it was on before."""
+        previous = self.bot_cells.get(bot_id)
+        if previous is not None and self.cell_to_bot.get(previous) == bot_id:
+            del self.cell_to_bot[previous]
+        self.bot_cells[bot_id] = (x, y)
+        self.cell_to_bot[(x, y)] = bot_id
+
+    def remove_bot(self, bot_id: int):
+        cell = self.bot_cells.pop(bot_id, None)
+        if cell is not None and self.cell_to_bot.get(cell) == bot_id:
+            del self.cell_to_bot[cell]
+
+    def bot_at(self, x: int, y: int) -> Optional[int]:
+        return self.cell_to_bot.get((x, y))
+
+    # --- Bin columns ---
+
+    def add_bin(self, bin_id: int, x: int, y: int) -> int:
+        """Put bin_id on top of column (x, y), which must have room (see has_room); returns its z level."""
+        assert self.has_room(x, y), f"Column ({x}, {y}) has no room for bin {bin_id}"
+        return self._push(bin_id, x, y)
+
+    def _push(self, bin_id: int, x: int, y: int) -> int:
+        if not self.layout.in_bounds(x, y):
+            return 0
+        stack = self.stacks.setdefault((x, y), [])
+        stack.append(bin_id)
+        self.column_heights[x, y] = len(stack)
+        return len(stack) - 1
+
+    def remove_bin(self, bin_id: int, x: int, y: int):
+        """Take bin_id out of column (x, y); bins above it (if any) drop one level."""
+        stack = self.stacks.get((x, y))
+        if stack and bin_id in stack:
+            stack.remove(bin_id)
+            self.column_heights[x, y] = len(stack)
+
+    def stack_height(self, x: int, y: int) -> int:
+        return int(self.column_heights[x, y])
+
+    def has_room(self, x: int, y: int) -> bool:
+        """A bin can be set down on (x, y): a storage column (not a port) below capacity."""
+        if not self.layout.in_bounds(x, y) or not self.layout.passable[x, y] or (x, y) in self.layout.ports:
+            return False
+        return bool(self.column_heights[x, y] < self.capacity[x, y])
+
+    def top_bin(self, x: int, y: int) -> Optional[int]:
+        stack = self.stacks.get((x, y))
+        return stack[-1] if stack else None
+
+    def bins_above(self, bin_id: int, x: int, y: int) -> List[int]:
+        """Bins stacked on top of bin_id in column (x, y), topmost first."""
+        stack = self.stacks.get((x, y), [])
+        if bin_id not in stack:
+            return []
+        return stack[stack.index(bin_id) + 1:][::-1]
+
+    # --- Queries ---
+
+    def is_blocked(self, x: int, y: int, ignore_bot_id: Optional[int] = None) -> bool:
+        """O(1): another bot is on (x, y), or its column overflows onto the rails."""
+        bot_id = self.cell_to_bot.get((x, y))
+        if bot_id is not None and bot_id != ignore_bot_id:
+            return True
+        return bool(self.column_heights[x, y] > self.capacity[x, y])
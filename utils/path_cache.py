@@ -0,0 +1,90 @@
+import time
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Optional, Tuple, Union
+
+from utils.grid_layout import GridLayout, as_layout
+from utils.heuristics import descend, heuristic_cache
+
+Cell = Tuple[int, int]
+Route = Tuple[Cell, ...]
+
+class PathCache:
+    """LRU cache of static routes, the reservation-free shortest path between two cells.
+
+    Bots keep driving between the same few cells (parking, ports, popular
+    bins), so the static route is built once per (start, goal, blocked cells,
+    layout version) and reused; routes of an older layout are no longer looked
+    up and age out of the LRU. At plan time only the part of
+    the route that conflicts with reservations is repaired (see
+    utils.astar.cached_whca_star). Plans are counted as clean (the cached
+    route was used as is) or repaired, and the time saved is estimated from
+    the measured cost of building routes and of WHCA* repair searches.
+    """
+
+    def __init__(self, max_routes: int = 1024):
+        self.max_routes = max_routes
+        self.routes: "OrderedDict[Tuple[Cell, Cell, FrozenSet[Cell], int], Route]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.clean = 0
+        self.repaired = 0
+        self.build_ms = 0.0  # total time spent building routes on misses
+        self.search_ms = 0.0  # total time spent in repair searches
+        self.plan_ms = 0.0  # total time spent planning with cached routes, repairs included
+
+    def get(self, start: Cell, goal: Cell, grid: Union[GridLayout, Tuple[int, int]],
+            blocked: Optional[FrozenSet[Cell]] = None) -> Optional[Route]:
+        """Static route from start to goal around blocked, or None if the goal is unreachable."""
+        layout = as_layout(grid)
+        blocked = blocked or frozenset()
+        key = (start, goal, blocked, layout.version)
+        route = self.routes.get(key)
+        if route is not None:
+            self.routes.move_to_end(key)
+            self.hits += 1
+            return route
+        self.misses += 1
+        started = time.perf_counter()
+        distances = heuristic_cache.get(goal, layout, blocked)
+        if distances.item(start) == heuristic_cache.unreachable(distances):
+            return None
+        route = (start, *descend(start, goal, layout, distances, blocked))
+        self.build_ms += (time.perf_counter() - started) * 1000
+        self.routes[key] = route
+        if len(self.routes) > self.max_routes:
+            self.routes.popitem(last=False)
+        return route
+
+    def record_plan(self, search_ms: Optional[float] = None, plan_ms: float = 0.0):
+        """Count a plan from a cached route; search_ms is the repair search time if it needed one."""
+        self.plan_ms += plan_ms
+        if search_ms is None:
+            self.clean += 1
+        else:
+            self.repaired += 1
+            self.search_ms += search_ms
+
+    def invalidate(self):
+        """Drop every route."""
+        self.routes.clear()
+
+    def status(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        build_mean = self.build_ms / self.misses if self.misses else 0.0
+        search_mean = self.search_ms / self.repaired if self.repaired else 0.0
+        return {
+            'routes': len(self.routes),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'clean_plans': self.clean,
+            'repaired_plans': self.repaired,
+            'build_ms_mean': build_mean,
+            'repair_ms_mean': search_mean,
+            'plan_ms_total': self.plan_ms,
+            # Hits skip building the route, clean plans skip the WHCA* search
+            'saved_ms': self.hits * build_mean + self.clean * search_mean,
+        }
+
+# Global path cache instance
+path_cache = PathCache()
@@ -0,0 +1,175 @@
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from utils.grid_layout import GridLayout, as_layout
+from utils.heuristics import heuristic_cache
+
+Cell = Tuple[int, int]
+
+# Orders with up to this many distinct bins are sequenced exactly (Held-Karp)
+EXACT_LIMIT = 10
+
+class BinVisit:
+    """One stop of a pick route: a bin fetched once for every order line stored in it."""
+
+    def __init__(self, bin_id: int, cell: Cell, items: List):
+        self.bin_id = bin_id
+        self.cell = cell
+        self.items = items
+
+    def __repr__(self):
+        return f"<BinVisit bin={self.bin_id} cell={self.cell} items={len(self.items)}>"
+
+def grid_distance(a: Cell, b: Cell, grid: Union[GridLayout, Tuple[int, int]]) -> int:
+    """True grid distance in moves, from the cached reverse-BFS table of b."""
+    table = heuristic_cache.get(b, grid)
+    d = table.item(a)
+    if d == heuristic_cache.unreachable(table):
+        return abs(a[0] - b[0]) + abs(a[1] - b[1]) + table.size  # unreachable: worse than any real route
+    return d
+
+def distance_matrix(cells: Sequence[Cell], grid: Union[GridLayout, Tuple[int, int]],
+                    targets: Optional[Sequence[Cell]] = None) -> np.ndarray:
+    """Grid distances from each of cells to each of targets (default: pairwise), one BFS table per target."""
+    targets = cells if targets is None else targets
+    matrix = np.zeros((len(cells), len(targets)), dtype=np.int64)
+    for j, b in enumerate(targets):
+        for i, a in enumerate(cells):
+            matrix[i, j] = grid_distance(a, b, grid)
+    return matrix
+
+def group_by_bin(lines: Iterable[Tuple[object, int, Cell]]) -> List[BinVisit]:
+    """Group (item, bin_id, bin cell) order lines so each bin is visited once, keeping first-seen order."""
+    visits: "OrderedDict[int, BinVisit]" = OrderedDict()
+    for item, bin_id, cell in lines:
+        if bin_id not in visits:
+            visits[bin_id] = BinVisit(bin_id, cell, [])
+        visits[bin_id].items.append(item)
+    return list(visits.values())
+
+def route_length(start: Cell, stops: Sequence[Cell], port: Cell, end: Cell,
+                 grid: Union[GridLayout, Tuple[int, int]], returns: Optional[Sequence[Cell]] = None) -> int:
+    """Grid steps of a pick route: start -> (bin -> port -> return column) for each stop -> end.
+
+    The bot carries every bin to the port and puts it back on its return
+    column (returns, one per stop; default: the slot it came from) before
+    driving on to the next bin. The bin -> port -> return column legs are the
+    same in any order; the legs from each return column to the next bin, and
+    the first and last legs, depend on the visiting order.
+    """
+    returns = stops if returns is None else returns
+    steps = 0
+    position = start
+    for cell, back in zip(stops, returns):
+        steps += grid_distance(position, cell, grid) + grid_distance(cell, port, grid) + grid_distance(port, back, grid)
+        position = back
+    return steps + grid_distance(position, end, grid)
+
+def _held_karp(dist: np.ndarray) -> List[int]:
+    """Exact shortest open path from node 0 through 1..k-2 to node k-1 (dist may be asymmetric)."""
+    n = dist.shape[0] - 2
+    d = dist.tolist()
+    full = (1 << n) - 1
+    inf = float("inf")
+    # cost[mask][j]: cheapest path from start covering mask and ending at stop j
+    cost = [[inf] * n for _ in range(1 << n)]
+    parent = [[-1] * n for _ in range(1 << n)]
+    for j in range(n):
+        cost[1 << j][j] = d[0][j + 1]
+    for mask in range(1, 1 << n):
+        row = cost[mask]
+        for j in range(n):
+            c = row[j]
+            if c == inf or not (mask >> j) & 1:
+                continue
+            for k in range(n):
+                if (mask >> k) & 1:
+                    continue
+                nxt = mask | (1 << k)
+                nc = c + d[j + 1][k + 1]
+                if nc < cost[nxt][k]:
+                    cost[nxt][k] = nc
+                    parent[nxt][k] = j
+    last = min(range(n), key=lambda j: cost[full][j] + d[j + 1][n + 1])
+    order = []
+    mask = full
+    while last != -1:
+        order.append(last)
+        mask, last = mask ^ (1 << last), parent[mask][last]
+    return order[::-1]
+
+def _nearest_neighbour_2opt(dist: np.ndarray) -> List[int]:
+    """Greedy open path from node 0, improved with 2-opt moves until none helps.
+
+    dist may be asymmetric, so a reversed segment is costed along its new direction.
+    """
+    n = dist.shape[0] - 2
+    d = dist.tolist()
+    remaining = set(range(1, n + 1))
+    tour = [0]
+    while remaining:
+        nearest = min(remaining, key=lambda k: d[tour[-1]][k])
+        tour.append(nearest)
+        remaining.remove(nearest)
+    tour.append(n + 1)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, n):
+            for j in range(i + 1, n + 1):
+                # Reverse tour[i..j]: every edge from tour[i-1] to tour[j+1] changes
+                candidate = tour[i - 1:i] + tour[j:i - 1:-1] + tour[j + 1:j + 2]
+                current = tour[i - 1:j + 2]
+                if _path_cost(d, candidate) < _path_cost(d, current):
+                    tour[i:j + 1] = candidate[1:-1]
+                    improved = True
+    return [node - 1 for node in tour[1:-1]]
+
+def _path_cost(d: List[List[int]], nodes: List[int]) -> int:
+    return sum(d[a][b] for a, b in zip(nodes, nodes[1:]))
+
+def sequence_visits(start: Cell, visits: List[BinVisit], port: Cell, end: Cell,
+                    grid: Union[GridLayout, Tuple[int, int]], exact_limit: int = EXACT_LIMIT,
+                    returns: Optional[Dict[int, Cell]] = None) -> List[BinVisit]:
+    """Order bin visits to minimise total travel (see route_length).
+
+    returns maps bin ids to the column each bin is expected to go back on after
+    the port (default: its own slot); the bot leaves for the next bin from there.
+    """
+    if len(visits) <= 1:
+        return list(visits)
+    layout = as_layout(grid)
+    returns = returns or {}
+    # Rows: where the bot sets off from (start, then each bin's return column);
+    # columns: where it drives to (each bin, then end). The port legs are the same in any order
+    sources = [start] + [returns.get(v.bin_id, v.cell) for v in visits]
+    targets = [v.cell for v in visits] + [end]
+    legs = distance_matrix(sources, layout, targets)
+    dist = np.zeros((len(visits) + 2, len(visits) + 2), dtype=np.int64)
+    dist[:-1, 1:] = legs
+    order = _held_karp(dist) if len(visits) <= exact_limit else _nearest_neighbour_2opt(dist)
+    return [visits[i] for i in order]
+
+def plan_picks(start: Cell, lines: Iterable[Tuple[object, int, Cell]], port: Cell, end: Cell,
+               grid: Union[GridLayout, Tuple[int, int]], exact_limit: int = EXACT_LIMIT,
+               returns: Optional[Dict[int, Cell]] = None) -> List[BinVisit]:
+    """Group order lines by bin and sequence the bin visits for a bot starting at start and parking at end.
+
+    returns: expected return column per bin id, as for sequence_visits.
+    """
+    return sequence_visits(start, group_by_bin(lines), port, end, grid, exact_limit, returns)
+
+def sequence_metrics(start: Cell, lines: List[Tuple[object, int, Cell]], port: Cell, end: Cell,
+                     grid: Union[GridLayout, Tuple[int, int]]) -> Dict[str, int]:
+    """Route lengths of one order: one trip per line, one per bin in database order, and optimised."""
+    visits = group_by_bin(lines)
+    planned = sequence_visits(start, visits, port, end, grid)
+    return {
+        "lines": len(lines),
+        "bins": len(visits),
+        "per_line_steps": route_length(start, [cell for _, _, cell in lines], port, end, grid),
+        "grouped_steps": route_length(start, [v.cell for v in visits], port, end, grid),
+        "optimized_steps": route_length(start, [v.cell for v in planned], port, end, grid),
+    }
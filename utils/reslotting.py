@@ -0,0 +1,154 @@
+import math
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from utils.heuristics import heuristic_cache
+from utils.occupancy import OccupancyIndex
+
+Cell = Tuple[int, int]
+
+# Grid-step equivalent of lifting one blocker off a stack and setting it down elsewhere
+REHANDLE_STEPS = 4.0
+
+class BinDemand:
+    """Recent demand per bin: units ordered, decayed exponentially with a half-life in seconds."""
+
+    def __init__(self, half_life: float = 3600.0):
+        self.half_life = half_life
+        self._scores: Dict[int, Tuple[float, float]] = {}  # bin_id -> (score, as of)
+
+    def _decayed(self, score: float, since: float, now: float) -> float:
+        return score * math.pow(0.5, max(0.0, now - since) / self.half_life)
+
+    def seed(self, counts: Iterable[Tuple[int, float]], now: Optional[float] = None):
+        """Start from historical (bin_id, units) counts, e.g. summed Product.sale_count."""
+        now = time.monotonic() if now is None else now
+        self._scores = {}
+        for bin_id, units in counts:
+            if bin_id is not None and units:
+                self.record(bin_id, units, now)
+
+    def record(self, bin_id: int, units: float = 1.0, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        score, since = self._scores.get(bin_id, (0.0, now))
+        self._scores[bin_id] = (self._decayed(score, since, now) + units, now)
+
+    def score(self, bin_id: int, now: Optional[float] = None) -> float:
+        now = time.monotonic() if now is None else now
+        score, since = self._scores.get(bin_id, (0.0, now))
+        return self._decayed(score, since, now)
+
+    def scores(self, now: Optional[float] = None) -> Dict[int, float]:
+        now = time.monotonic() if now is None else now
+        return {bin_id: self._decayed(score, since, now) for bin_id, (score, since) in self._scores.items()}
+
+class Migration:
+    """One re-slotting move: lift bin_id out of source and set it on top of target."""
+
+    def __init__(self, bin_id: int, source: Cell, target: Cell, gain: float):
+        self.bin_id = bin_id
+        self.source = source
+        self.target = target
+        self.gain = gain
+
+    def __repr__(self):
+        return f"<Migration bin={self.bin_id} {self.source}->{self.target} gain={self.gain:.1f}>"
+
+def port_costs(occupancy: OccupancyIndex, port: Cell) -> np.ndarray:
+    """Round-trip grid steps between each column and the port; inf where unusable for storage."""
+    layout = occupancy.layout
+    table = heuristic_cache.get(port, layout)
+    costs = 2.0 * table.astype(np.float64)
+    costs[(table == heuristic_cache.unreachable(table)) | ~layout.passable] = np.inf
+    for x, y in layout.ports:
+        costs[x, y] = np.inf
+    return costs
+
+def retrieval_cost(occupancy: OccupancyIndex, bin_id: int, cell: Cell, costs: np.ndarray) -> float:
+    """Expected steps to bring a bin to the port: the round trip plus its dig-out."""
+    return float(costs[cell]) + REHANDLE_STEPS * len(occupancy.bins_above(bin_id, *cell))
+
+def column_demand(occupancy: OccupancyIndex, demand: Dict[int, float]) -> np.ndarray:
+    """Summed demand of the bins stacked in each column."""
+    totals = np.zeros(occupancy.layout.size)
+    for cell, stack in occupancy.stacks.items():
+        totals[cell] = sum(demand.get(bin_id, 0.0) for bin_id in stack)
+    return totals
+
+def plan_return(occupancy: OccupancyIndex, demand: Dict[int, float], bin_id: int, port: Cell,
+                next_cell: Optional[Cell] = None, avoid: Iterable[Cell] = ()) -> Optional[Cell]:
+    """Column to put a bin back on after picking, or None if every stack is full.
+
+    Scores every column with room by the bot's travel now (port -> column ->
+    next_cell, the next bin or the parking spot) plus the expected future cost
+    of the choice: the bin's demand x its round trip to the port, and the
+    demand of the bins it would bury x one rehandle. Hot bins therefore land
+    near the port, cold ones on the nearest low-demand stack. Columns in avoid
+    (e.g. under other bots) are skipped.
+    """
+    layout = occupancy.layout
+    costs = port_costs(occupancy, port)
+    scores = costs / 2 + REHANDLE_STEPS * column_demand(occupancy, demand)
+    if demand.get(bin_id, 0.0) > 0:  # 0 x inf would be nan, which argmin picks over every column
+        scores = scores + demand[bin_id] * costs
+    if next_cell is not None:
+        table = heuristic_cache.get(next_cell, layout)
+        scores = scores + table.astype(np.float64)
+        scores[table == heuristic_cache.unreachable(table)] = np.inf
+    scores[occupancy.column_heights >= occupancy.capacity] = np.inf
+    for cell in avoid:
+        scores[cell] = np.inf
+    index = np.unravel_index(int(np.argmin(scores)), scores.shape)
+    if not np.isfinite(scores[index]):
+        return None
+    return (int(index[0]), int(index[1]))
+
+def plan_migrations(occupancy: OccupancyIndex, demand: Dict[int, float], port: Cell, max_moves: int = 1,
+                    exclude: Iterable[int] = (), candidates: int = 20, min_gain: float = 1.0) -> List[Migration]:
+    """Pick up to max_moves hot bins to move onto the top of stacks near the port.
+
+    Each of the hottest bins (by demand) is scored against every column with
+    free capacity: demand x steps saved per retrieval, minus the cost of
+    burying the bins already in the target column (their demand x one
+    rehandle). Moves with the best net gain above min_gain are kept; the
+    target heights and column demand are updated as moves are planned.
+    """
+    costs = port_costs(occupancy, port)
+    heights = occupancy.column_heights.astype(np.float64)
+    buried = column_demand(occupancy, demand)
+    cell_of = {bin_id: cell for cell, stack in occupancy.stacks.items() for bin_id in stack}
+
+    exclude = set(exclude)
+    hot = sorted((b for b in demand if b in cell_of and b not in exclude and demand[b] > 0),
+                 key=lambda b: demand[b], reverse=True)[:candidates]
+    moves: List[Migration] = []
+    moved_cells = set()
+    for bin_id in hot:
+        if len(moves) >= max_moves:
+            break
+        source = cell_of[bin_id]
+        if source in moved_cells:
+            continue  # the stack changes when a bin is dug out of it; replan next pass
+        score = demand[bin_id]
+        current = retrieval_cost(occupancy, bin_id, source, costs)
+        if not math.isfinite(current):
+            continue
+        gains = score * (current - costs) - REHANDLE_STEPS * buried
+        gains[heights >= occupancy.capacity] = -np.inf
+        gains[source] = -np.inf
+        for cell in moved_cells:
+            gains[cell] = -np.inf
+        target = np.unravel_index(int(np.argmax(gains)), gains.shape)
+        gain = float(gains[target])
+        if not gain > min_gain:
+            continue
+        target = (int(target[0]), int(target[1]))
+        moves.append(Migration(bin_id, source, target, gain))
+        moved_cells.update((source, target))
+        heights[target] += 1
+        buried[target] += score
+    return moves
+
+bin_demand = BinDemand()
@@ -0,0 +1,129 @@
+from collections import deque
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from utils.heuristics import heuristic_cache
+from utils.occupancy import OccupancyIndex
+
+Cell = Tuple[int, int]
+
+# Grid steps a relocation may add to land its bin one level lower
+HEIGHT_WEIGHT = 1.0
+
+class Relocation:
+    """One rehandle: move bin_id from the top of source to the top of target, landing at level z."""
+
+    def __init__(self, bin_id: int, source: Cell, target: Cell, z: int, steps: int):
+        self.bin_id = bin_id
+        self.source = source
+        self.target = target
+        self.z = z
+        self.steps = steps
+
+    def __repr__(self):
+        return f"<Relocation bin={self.bin_id} {self.source}->{self.target} z={self.z}>"
+
+class DigOutPlan:
+    """Relocations that uncover a buried bin, topmost blocker first."""
+
+    def __init__(self, bin_id: int, cell: Cell, relocations: List[Relocation], avoid: Iterable[Cell] = ()):
+        self.bin_id = bin_id
+        self.cell = cell
+        self.relocations = relocations
+        self.avoid = list(avoid)
+
+    @property
+    def rehandles(self) -> int:
+        return len(self.relocations)
+
+    @property
+    def steps(self) -> int:
+        """Grid steps spent rehandling: to each relocation column and back."""
+        return sum(2 * r.steps for r in self.relocations)
+
+def relocation_scores(occupancy: OccupancyIndex, source: Cell, heights: np.ndarray,
+                      avoid: Iterable[Cell] = (), height_weight: float = HEIGHT_WEIGHT) -> Tuple[np.ndarray, np.ndarray]:
+    """Score every column as a drop site for a bin lifted from source.
+
+    The score is the grid distance from source plus height_weight per bin
+    already in the column, so near, low stacks win. Columns that are full,
+    unreachable, blocked, ports, the source itself or in avoid score inf.
+    Returns (scores, distances).
+    """
+    layout = occupancy.layout
+    table = heuristic_cache.get(source, layout)
+    distances = table.astype(np.float64)
+    scores = distances + height_weight * heights
+    invalid = (table == heuristic_cache.unreachable(table)) | (heights >= occupancy.capacity) | ~layout.passable
+    scores[invalid] = np.inf
+    for x, y in list(layout.ports) + [source] + list(avoid):
+        if layout.in_bounds(x, y):
+            scores[x, y] = np.inf
+    return scores, distances
+
+def plan_dig_out(occupancy: OccupancyIndex, bin_id: int, cell: Cell,
+                 avoid: Iterable[Cell] = (), height_weight: float = HEIGHT_WEIGHT) -> Optional[DigOutPlan]:
+    """Plan the rehandles needed to lift bin_id out of column cell.
+
+    Every bin above it is moved, topmost first, onto the best-scoring column
+    (see relocation_scores); heights are tracked as the plan grows so several
+    blockers spread correctly. avoid lists columns that must not be buried,
+    e.g. other bins of the same order. Returns None when there is not enough
+    free capacity to dig the bin out.
+    """
+    avoid = list(avoid)
+    heights = occupancy.column_heights.astype(np.float64)
+    relocations = []
+    for blocker in occupancy.bins_above(bin_id, *cell):
+        scores, distances = relocation_scores(occupancy, cell, heights, avoid, height_weight)
+        index = int(np.argmin(scores))
+        target = np.unravel_index(index, scores.shape)
+        if not np.isfinite(scores[target]):
+            return None
+        target = (int(target[0]), int(target[1]))
+        relocations.append(Relocation(blocker, cell, target, int(heights[target]), int(distances[target])))
+        heights[target] += 1
+    return DigOutPlan(bin_id, cell, relocations, avoid)
+
+def relocation_target(occupancy: OccupancyIndex, source: Cell, avoid: Iterable[Cell] = (),
+                      height_weight: float = HEIGHT_WEIGHT) -> Optional[Cell]:
+    """The best-scoring column to set down a bin carried from source, or None if no column has room.
+
+    Used to re-plan a single relocation whose planned column can no longer be used.
+    """
+    scores, _ = relocation_scores(occupancy, source, occupancy.column_heights, avoid, height_weight)
+    index = np.unravel_index(int(np.argmin(scores)), scores.shape)
+    if not np.isfinite(scores[index]):
+        return None
+    return int(index[0]), int(index[1])
+
+class RetrievalStats:
+    """Rehandle counts per order, to measure the retrieval cost of buried bins."""
+
+    def __init__(self, history: int = 100):
+        self.orders = 0
+        self.retrievals = 0
+        self.rehandles = 0
+        self.failed_digs = 0
+        self.recent: "deque[dict]" = deque(maxlen=history)
+
+    def record(self, order_id: int, retrievals: int, rehandles: int, failed_digs: int = 0):
+        self.orders += 1
+        self.retrievals += retrievals
+        self.rehandles += rehandles
+        self.failed_digs += failed_digs
+        self.recent.append({"order_id": order_id, "retrievals": retrievals, "rehandles": rehandles})
+
+    def status(self) -> dict:
+        return {
+            "orders": self.orders,
+            "retrievals": self.retrievals,
+            "rehandles": self.rehandles,
+            "failed_digs": self.failed_digs,
+            "rehandles_per_order": self.rehandles / self.orders if self.orders else 0.0,
+            "rehandles_per_retrieval": self.rehandles / self.retrievals if self.retrievals else 0.0,
+            "recent": list(self.recent),
+        }
+
+retrieval_stats = RetrievalStats()
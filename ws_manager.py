@@ -1,21 +1,135 @@
+import asyncio
+import json
+import logging
+from collections import deque
+from typing import Deque, Dict, Hashable, List, Optional
+
 from fastapi import WebSocket
-from typing import List
+
+logger = logging.getLogger(__name__)
+
+def coalesce_key(message: dict) -> Optional[Hashable]:
+    """Messages with the same key supersede each other while still queued (latest position wins)."""
+    event = message.get("event")
+    if event == "bot_move":
+        return (event, message.get("bot_id"))
+    if event == "bin_move":
+        return (event, message.get("bin_id"))
+    return None
+
+class ClientConnection:
+    """One subscriber: a bounded queue of pre-serialized messages drained by its own writer task."""
+
+    def __init__(self, websocket: WebSocket, max_queue: int):
+        self.websocket = websocket
+        self.max_queue = max_queue
+        self.queue: Deque[list] = deque()  # [key, text] slots, so coalescing can replace text in place
+        self.pending: Dict[Hashable, list] = {}  # {coalesce key: queued slot}
+        self.ready = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+
+    def enqueue(self, text: str, key: Optional[Hashable] = None):
+        if key is not None and key in self.pending:
+            self.pending[key][1] = text
+            self.coalesced += 1
+            return
+        if len(self.queue) >= self.max_queue:
+            # Slow consumer: drop the oldest message rather than stall the producer
+            old_key, _ = self.queue.popleft()
+            if old_key is not None:
+                self.pending.pop(old_key, None)
+            self.dropped += 1
+        slot = [key, text]
+        self.queue.append(slot)
+        if key is not None:
+            self.pending[key] = slot
+        self.ready.set()
 
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+    """WebSocket fan-out that never blocks the caller.
+
+    broadcast() serializes a message once and appends it to every client's
+    bounded queue; a writer task per client sends it. When a client falls
+    behind, queued moves for the same bot/bin are coalesced and then the oldest
+    messages are dropped. Clients whose socket fails are removed automatically.
+    """
+
+    def __init__(self, max_queue: int = 256):
+        self.max_queue = max_queue
+        self.clients: Dict[WebSocket, ClientConnection] = {}
+        self.dead_removed = 0
+
+    @property
+    def active_connections(self) -> List[WebSocket]:
+        return list(self.clients)
+
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        self.register(websocket)
+
+    def register(self, websocket: WebSocket):
+        """Start delivering broadcasts to an already accepted socket."""
+        if websocket in self.clients:
+            return
+        client = ClientConnection(websocket, self.max_queue)
+        client.task = asyncio.get_running_loop().create_task(self._writer(client))
+        self.clients[websocket] = client
+
     def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+        client = self.clients.pop(websocket, None)
+        if client is not None and client.task is not None and client.task is not asyncio.current_task():
+            client.task.cancel()
+
+    def is_connected(self, websocket: WebSocket) -> bool:
+        return websocket in self.clients
+
     async def broadcast(self, message: dict):
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except Exception:
-                pass
+        """Queue message for every client; returns without waiting for any socket."""
+        if not self.clients:
+            return
+        # Same encoding as WebSocket.send_json, done once for all clients
+        text = json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+        key = coalesce_key(message)
+        for client in self.clients.values():
+            client.enqueue(text, key)
+
+    async def send(self, websocket: WebSocket, message: dict):
+        """Queue message for one client, in order with its broadcasts."""
+        client = self.clients.get(websocket)
+        if client is not None:
+            client.enqueue(json.dumps(message, separators=(",", ":"), ensure_ascii=False))
+
+    async def _writer(self, client: ClientConnection):
+        try:
+            while True:
+                await client.ready.wait()
+                client.ready.clear()
+                while client.queue:
+                    key, text = client.queue.popleft()
+                    if key is not None:
+                        client.pending.pop(key, None)
+                    await client.websocket.send_text(text)
+                    client.sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.info(f"[WS] Removing dead connection after send failure: {type(e).__name__}: {e}")
+            self.dead_removed += 1
+            self.disconnect(client.websocket)
+
+    def metrics(self) -> dict:
+        clients = list(self.clients.values())
+        return {
+            "connections": len(clients),
+            "queued": sum(len(c.queue) for c in clients),
+            "sent": sum(c.sent for c in clients),
+            "dropped": sum(c.dropped for c in clients),
+            "coalesced": sum(c.coalesced for c in clients),
+            "dead_removed": self.dead_removed,
+        }
 
 bots_ws_manager = ConnectionManager()
-orders_ws_manager = ConnectionManager() 
\ No newline at end of file
+orders_ws_manager = ConnectionManager()